@@ -0,0 +1,219 @@
+"""
+CrateDig — end-to-end API benchmark
+Runs the real backend (uvicorn) against the offline YouTube stand-in
+(bench/mock_youtube.py) and a scratch Postgres, and measures /roll and
+/create-playlist latency and throughput at 5, 15 and 50 seeds.
+
+Every pushed playlist is read back from the mock to check its order.
+
+Run from backend/ against a throwaway database (drizzle migrations are
+applied if the tables are missing; caches are emptied unless --warm):
+  DATABASE_URL=postgresql://... python bench/bench_api.py [--seeds 5 15 50]
+      [--iterations 5] [--concurrency 4] [--latency-ms 80] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import asyncpg
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MIGRATIONS = os.path.join(BACKEND_DIR, "..", "drizzle", "*.sql")
+CACHE_TABLES = ("seed_resolutions", "radio_cache", "track_edges", "track_nodes")
+
+
+async def prepare_db(dsn: str, ssl: str, warm: bool):
+    conn = await asyncpg.connect(dsn, ssl=ssl)
+    try:
+        if await conn.fetchval("SELECT to_regclass('youtube_connections')") is None:
+            for path in sorted(glob.glob(MIGRATIONS)):
+                with open(path, encoding="utf-8") as f:
+                    await conn.execute(f.read())
+        # Expired on purpose: the first call exercises the refresh path
+        token = {
+            "access_token": "bench", "refresh_token": "bench", "token_type": "Bearer",
+            "client_id": "bench", "client_secret": "bench", "expires_at": 0,
+        }
+        await conn.execute("DELETE FROM youtube_connections")
+        await conn.execute(
+            "INSERT INTO youtube_connections (google_email, oauth_token) VALUES ($1, $2::jsonb)",
+            "bench@example.com", json.dumps(token),
+        )
+        if not warm:
+            for table in CACHE_TABLES:
+                if await conn.fetchval("SELECT to_regclass($1)", table) is not None:
+                    await conn.execute(f"TRUNCATE {table}")
+    finally:
+        await conn.close()
+
+
+def start(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with {proc.returncode}")
+        try:
+            if (await client.get(url)).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def random_seeds(n: int) -> list[dict]:
+    """Seeds nobody has rolled before, so every roll starts cold."""
+    tag = f"{random.getrandbits(32):08x}"
+    return [{"artist": f"Bench Artist {tag}-{i}", "title": f"Bench Song {i}"} for i in range(n)]
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+    return {
+        "n": len(samples),
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(p95, 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+async def timed(client: httpx.AsyncClient, path: str, body: dict) -> tuple[float, dict]:
+    t0 = time.perf_counter()
+    resp = await client.post(path, json=body)
+    elapsed = (time.perf_counter() - t0) * 1000
+    resp.raise_for_status()
+    return elapsed, resp.json()
+
+
+async def bench_seeds(api: httpx.AsyncClient, mock: httpx.AsyncClient, seeds: int, args) -> dict:
+    desired = math.ceil(seeds / 1.5 * 10)  # inverse of the frontend's calculateSeedCount
+    roll_ms, push_ms = [], []
+    last_roll = None
+
+    for _ in range(args.iterations):
+        ms, last_roll = await timed(api, "/roll", {"seeds": random_seeds(seeds), "desired_count": desired})
+        roll_ms.append(ms)
+
+    async def client_loop():
+        for _ in range(args.iterations):
+            await timed(api, "/roll", {"seeds": random_seeds(seeds), "desired_count": desired})
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+    rolls_per_s = args.concurrency * args.iterations / (time.perf_counter() - t0)
+
+    video_ids = [t["videoId"] for t in last_roll["tracks"]]
+    misordered = 0
+    for i in range(args.iterations):
+        ms, pushed = await timed(api, "/create-playlist", {"title": f"bench {seeds}/{i}", "video_ids": video_ids})
+        push_ms.append(ms)
+        stored = (await mock.get(f"/_mock/playlists/{pushed['playlist_id']}")).json()["videoIds"]
+        added = [it["videoId"] for it in pushed["items"] if it["status"] == "added"]
+        misordered += stored != added
+
+    return {
+        "seeds": seeds,
+        "tracks": len(video_ids),
+        "roll": {**summarize(roll_ms), "rolls_per_s": round(rolls_per_s, 2)},
+        "create_playlist": {**summarize(push_ms), "misordered": misordered},
+    }
+
+
+async def run(args) -> list[dict]:
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        sys.exit("DATABASE_URL must point at a scratch Postgres database")
+    ssl = os.environ.get("DATABASE_SSL", "disable")
+    await prepare_db(dsn, ssl, args.warm)
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    mock_args = [
+        sys.executable, "bench/mock_youtube.py", "--port", str(args.mock_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+    ]
+    env = {
+        "DATABASE_URL": dsn,
+        "DATABASE_SSL": ssl,
+        "YTMUSIC_MOCK_URL": f"{mock_url}/ytmusic",
+        "YOUTUBE_API_URL": f"{mock_url}/youtube/v3",
+        "GOOGLE_TOKEN_URL": f"{mock_url}/token",
+        "YOUTUBE_DAILY_QUOTA": "0",  # a full run spends well over a real day's quota
+    }
+    if not args.real_rates:
+        # Measure the pipeline, not the production pacing
+        for bucket in ("SEARCH", "WATCH", "PLAYLISTS", "PLAYLIST_ITEMS"):
+            env[f"RATE_{bucket}"] = env[f"BURST_{bucket}"] = "1000"
+
+    procs = [start(mock_args, {})]
+    try:
+        procs.append(start(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning"],
+            env,
+        ))
+        async with httpx.AsyncClient(base_url=api_url, timeout=300) as api, \
+                httpx.AsyncClient(base_url=mock_url, timeout=30) as mock:
+            await wait_ready(mock, "/_mock/stats", procs[0])
+            await wait_ready(api, "/health", procs[1])
+            results = [await bench_seeds(api, mock, n, args) for n in args.seeds]
+            calls = (await mock.get("/_mock/stats")).json()["calls"]
+        return results, calls
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[5, 15, 50])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--real-rates", action="store_true", help="keep the production RATE_*/BURST_* pacing")
+    parser.add_argument("--warm", action="store_true", help="keep seed/radio caches from earlier runs")
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--api-port", type=int, default=8766)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results, calls = asyncio.run(run(args))
+
+    print(f"{'seeds':>5} {'tracks':>6}  {'roll p50':>9} {'p95':>8} {'rolls/s':>8}  {'push p50':>9} {'p95':>8} {'order':>6}")
+    for r in results:
+        roll, push = r["roll"], r["create_playlist"]
+        print(
+            f"{r['seeds']:>5} {r['tracks']:>6}  {roll['p50_ms']:>7.0f}ms {roll['p95_ms']:>6.0f}ms "
+            f"{roll['rolls_per_s']:>8.2f}  {push['p50_ms']:>7.0f}ms {push['p95_ms']:>6.0f}ms "
+            f"{'ok' if not push['misordered'] else push['misordered']:>6}"
+        )
+    print("mock calls:", json.dumps(calls, sort_keys=True))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "mock_calls": calls}, f, indent=2)
+    if any(r["create_playlist"]["misordered"] for r in results):
+        sys.exit("playlist order check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+CrateDig — CSV parser benchmark
+Compares the old readlines()-based parse_csv with the streaming parser on
+synthetic WUDWUD-style exports, reporting wall time and peak memory.
+
+Run from backend/:
+  python bench/bench_csv.py [rows ...]
+"""
+
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from csvparse import iter_songs_from_path  # noqa: E402
+
+
+def legacy_parse_csv(path: str) -> list[dict]:
+    """poc.parse_csv as it was before the streaming parser (prints removed)."""
+    songs = []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    if not lines:
+        return songs
+    header = next(csv.reader(io.StringIO(lines[0].strip())))
+    header = [h.strip().lower() for h in header]
+    title_idx = artist_idx = genre_idx = None
+    for i, col in enumerate(header):
+        if col == "title":
+            title_idx = i
+        elif col == "artist":
+            artist_idx = i
+        elif col == "genre":
+            genre_idx = i
+    if title_idx is None or artist_idx is None:
+        return songs
+    for line in lines[1:]:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('"') and line.endswith('"'):
+            inner = line[1:-1].replace('""', '"')
+            try:
+                row = next(csv.reader(io.StringIO(inner)))
+            except StopIteration:
+                continue
+        else:
+            try:
+                row = next(csv.reader(io.StringIO(line)))
+            except StopIteration:
+                continue
+        if len(row) <= max(title_idx, artist_idx):
+            continue
+        title = row[title_idx].strip()
+        artist = row[artist_idx].strip()
+        genre = row[genre_idx].strip() if genre_idx is not None and genre_idx < len(row) else ""
+        if title and artist:
+            song = {"title": title, "artist": artist}
+            if genre:
+                song["genre"] = genre
+            songs.append(song)
+    return songs
+
+
+GENRES = ["Prechill", "Drum&Bass", "Deeper", "Hip-Hop", "House", ""]
+
+
+def write_export(path: str, rows: int, seed: int = 1):
+    """Synthetic DJ export: normal header, quote-wrapped data rows."""
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("#,Title,Artist,Album,Length,BPM,Genre,Label,Composer,Remixer,Year,File name\n")
+        for i in range(rows):
+            fields = [
+                str(i + 1),
+                f"Track {i} (Original Mix)",
+                f"Artist {rnd.randint(0, rows // 4)}, feat. Someone",
+                f"Album {rnd.randint(0, 999)}",
+                str(rnd.randint(120, 600)), "0", rnd.choice(GENRES),
+                "Label", "", "", "0", f"C:\\Music\\track_{i}.mp3",
+            ]
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator="").writerow(fields)
+            f.write('"' + buf.getvalue().replace('"', '""') + '"\n')
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(sizes: list[int]):
+    print(f"{'rows':>8} {'legacy s':>9} {'legacy MB':>10} {'stream s':>9} {'stream MB':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f"export_{rows}.csv")
+            write_export(path, rows)
+
+            legacy, t_legacy, m_legacy = measure(lambda: legacy_parse_csv(path))
+            count, t_stream, m_stream = measure(lambda: sum(1 for _ in iter_songs_from_path(path)))
+            assert count == len(legacy), (count, len(legacy))
+            assert list(iter_songs_from_path(path)) == legacy
+
+            print(
+                f"{rows:>8} {t_legacy:>9.3f} {m_legacy / 2**20:>10.1f} "
+                f"{t_stream:>9.3f} {m_stream / 2**20:>10.2f} {t_legacy / t_stream:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 50_000, 200_000])
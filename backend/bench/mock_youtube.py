@@ -0,0 +1,308 @@
+"""
+CrateDig — offline YouTube stand-in
+One local server for everything the backend calls out to:
+
+  /ytmusic/search, /ytmusic/watch   ytmusicapi search + get_watch_playlist
+                                    results (replayed from a fixtures file,
+                                    else from a deterministic synthetic catalog)
+  /youtube/v3/playlists             Data API v3 playlist create / list (mine)
+  /youtube/v3/playlistItems         insert / list / move / delete, with real positions
+  /token                            OAuth token refresh
+
+Latency, jitter, 5xx errors, throttling, a daily Data API quota and search
+misses are configurable on the command line or at runtime via
+POST /_mock/config. GET /_mock/stats counts calls per endpoint and the
+quota units used.
+
+Point the backend at it with
+  YTMUSIC_MOCK_URL=http://127.0.0.1:8765/ytmusic
+  YOUTUBE_API_URL=http://127.0.0.1:8765/youtube/v3
+  GOOGLE_TOKEN_URL=http://127.0.0.1:8765/token
+
+Run from backend/:
+  python bench/mock_youtube.py [--port 8765] [--latency-ms 80] [--throttle-rate 0.02] ...
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+import requests
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from ytmusicapi.exceptions import YTMusicServerError
+
+CATALOG_SIZE = 20000
+CATALOG_ARTISTS = 2500
+CLUSTERS = 200  # radio lists mostly stay inside a track's cluster, so seeds overlap
+WRITE_METHODS = ("POST", "PUT", "DELETE")  # 50 quota units each, reads 1
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0  # share of calls answered with a 503
+    throttle_rate: float = 0.0  # share answered 429 (ytmusic) / 403 rateLimitExceeded (Data API)
+    daily_quota: int = 0  # Data API units before 403 quotaExceeded (0 = unlimited)
+    miss_rate: float = 0.05  # share of searches with no results
+    radio_size: int = 25
+
+
+# ── Synthetic catalog ──
+
+
+def _stable(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def catalog_track(n: int) -> dict:
+    artist = n % CATALOG_ARTISTS
+    return {
+        "videoId": f"mock{n:07d}",
+        "title": f"Track {n}",
+        "artists": [{"name": f"Artist {artist}", "id": f"UCmock{artist:05d}"}],
+        "album": {"name": f"Album {n // 10}", "id": f"MPREmock{n // 10:06d}"},
+        "length": f"{3 + n % 4}:{n % 60:02d}",
+        "thumbnail": [
+            {"url": f"https://i.ytimg.com/vi/mock{n:07d}/sddefault.jpg", "width": 120, "height": 90},
+            {"url": f"https://i.ytimg.com/vi/mock{n:07d}/hqdefault.jpg", "width": 480, "height": 360},
+        ],
+    }
+
+
+def search_results(query: str, limit: int, miss_rate: float) -> list[dict]:
+    h = _stable(query)
+    if (h % 10000) / 10000 < miss_rate:
+        return []
+    results = []
+    for i in range(min(limit, 3)):
+        track = catalog_track((h + i * 7919) % CATALOG_SIZE)
+        track["duration"] = track.pop("length")
+        results.append({**track, "resultType": "song"})
+    return results
+
+
+def watch_playlist(video_id: str, size: int) -> dict:
+    h = _stable(video_id)
+    rnd = random.Random(h)
+    cluster = h % CLUSTERS
+    per_cluster = CATALOG_SIZE // CLUSTERS
+    tracks = [{"videoId": video_id, "title": "seed", "artists": [], "thumbnail": []}]
+    for _ in range(size):
+        if rnd.random() < 0.8:
+            n = cluster * per_cluster + rnd.randrange(per_cluster)
+        else:
+            n = rnd.randrange(CATALOG_SIZE)
+        tracks.append(catalog_track(n))
+    return {"tracks": tracks, "playlistId": f"RDAMVM{video_id}", "lyrics": None, "related": None}
+
+
+# ── Server ──
+
+
+def create_app(config: MockConfig | None = None, fixtures: dict | None = None) -> FastAPI:
+    """The mock server. `fixtures` = {"search": {query: [...]}, "watch": {videoId: {...}}}."""
+    app = FastAPI(title="CrateDig mock YouTube")
+    app.state.config = config or MockConfig()
+    app.state.calls = Counter()
+    app.state.quota_used = 0
+    fixtures = fixtures or {}
+    playlists: dict[str, list[dict]] = {}
+    snippets: dict[str, dict] = {}
+    item_seq = 0
+
+    @app.middleware("http")
+    async def faults(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/_mock"):
+            return await call_next(request)
+        cfg: MockConfig = app.state.config
+        app.state.calls[f"{request.method} {path}"] += 1
+        delay = cfg.latency_ms + random.uniform(0, cfg.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if path.startswith("/youtube/v3"):
+            cost = 50 if request.method in WRITE_METHODS else 1
+            if cfg.daily_quota and app.state.quota_used + cost > cfg.daily_quota:
+                app.state.calls["quota_exceeded"] += 1
+                return JSONResponse(
+                    {"error": {"code": 403, "errors": [{"reason": "quotaExceeded"}], "message": "quota"}},
+                    status_code=403,
+                )
+            app.state.quota_used += cost
+        roll = random.random()
+        if roll < cfg.throttle_rate:
+            app.state.calls["throttled"] += 1
+            if path.startswith("/ytmusic"):
+                return JSONResponse({"error": {"message": "Too Many Requests"}}, status_code=429)
+            return JSONResponse(
+                {"error": {"code": 403, "errors": [{"reason": "rateLimitExceeded"}], "message": "rate"}},
+                status_code=403,
+            )
+        if roll < cfg.throttle_rate + cfg.error_rate:
+            app.state.calls["errors"] += 1
+            return JSONResponse({"error": {"message": "Backend Error"}}, status_code=503)
+        return await call_next(request)
+
+    @app.post("/ytmusic/search")
+    async def search(body: dict):
+        query = body["query"]
+        if query in fixtures.get("search", {}):
+            return fixtures["search"][query]
+        return search_results(query, body.get("limit", 20), app.state.config.miss_rate)
+
+    @app.post("/ytmusic/watch")
+    async def watch(body: dict):
+        video_id = body["videoId"]
+        if video_id in fixtures.get("watch", {}):
+            return fixtures["watch"][video_id]
+        return watch_playlist(video_id, min(body.get("limit", 25), app.state.config.radio_size))
+
+    @app.post("/token")
+    async def token():
+        return {"access_token": f"mock-{random.getrandbits(64):x}", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.post("/youtube/v3/playlists")
+    async def create_playlist(body: dict):
+        playlist_id = f"PLmock{len(playlists):06d}"
+        playlists[playlist_id] = []
+        snippets[playlist_id] = body.get("snippet", {})
+        return {"id": playlist_id, "snippet": snippets[playlist_id]}
+
+    @app.get("/youtube/v3/playlists")
+    async def list_playlists(maxResults: int = 5, pageToken: str | None = None):
+        ids = list(playlists)
+        start = int(pageToken or 0)
+        data = {"items": [{"id": pid, "snippet": snippets[pid]} for pid in ids[start:start + maxResults]]}
+        if start + maxResults < len(ids):
+            data["nextPageToken"] = str(start + maxResults)
+        return data
+
+    @app.post("/youtube/v3/playlistItems")
+    async def insert_item(body: dict):
+        nonlocal item_seq
+        snippet = body["snippet"]
+        items = playlists.get(snippet["playlistId"])
+        if items is None:
+            return JSONResponse({"error": {"message": "playlistNotFound"}}, status_code=404)
+        item_seq += 1
+        item = {"id": f"UExmock{item_seq:08d}", "videoId": snippet["resourceId"]["videoId"]}
+        position = snippet.get("position")
+        items.insert(len(items) if position is None else position, item)
+        return {"id": item["id"], "snippet": snippet}
+
+    @app.get("/youtube/v3/playlistItems")
+    async def list_items(playlistId: str, maxResults: int = 5, pageToken: str | None = None):
+        items = playlists.get(playlistId)
+        if items is None:
+            return JSONResponse({"error": {"message": "playlistNotFound"}}, status_code=404)
+        start = int(pageToken or 0)
+        page = items[start:start + maxResults]
+        data = {"items": [
+            {"id": it["id"], "snippet": {"position": start + i, "resourceId": {"videoId": it["videoId"]}}}
+            for i, it in enumerate(page)
+        ]}
+        if start + maxResults < len(items):
+            data["nextPageToken"] = str(start + maxResults)
+        return data
+
+    @app.put("/youtube/v3/playlistItems")
+    async def move_item(body: dict):
+        snippet = body["snippet"]
+        items = playlists.get(snippet["playlistId"], [])
+        for i, it in enumerate(items):
+            if it["id"] == body["id"]:
+                items.insert(snippet["position"], items.pop(i))
+                return {"id": body["id"], "snippet": snippet}
+        return JSONResponse({"error": {"message": "playlistItemNotFound"}}, status_code=404)
+
+    @app.delete("/youtube/v3/playlistItems")
+    async def delete_item(id: str):
+        for items in playlists.values():
+            for i, it in enumerate(items):
+                if it["id"] == id:
+                    del items[i]
+                    return Response(status_code=204)
+        return JSONResponse({"error": {"message": "playlistItemNotFound"}}, status_code=404)
+
+    @app.get("/_mock/stats")
+    async def stats():
+        return {
+            "calls": dict(app.state.calls),
+            "playlists": len(playlists),
+            "quota_used": app.state.quota_used,
+            "config": asdict(app.state.config),
+        }
+
+    @app.post("/_mock/config")
+    async def set_config(body: dict):
+        app.state.config = MockConfig(**{**asdict(app.state.config), **body})
+        return asdict(app.state.config)
+
+    @app.post("/_mock/reset")
+    async def reset():
+        app.state.calls.clear()
+        app.state.quota_used = 0
+        playlists.clear()
+        snippets.clear()
+        return {"ok": True}
+
+    @app.get("/_mock/playlists/{playlist_id}")
+    async def playlist(playlist_id: str):
+        return {"videoIds": [it["videoId"] for it in playlists.get(playlist_id, [])]}
+
+    return app
+
+
+# ── Client ──
+
+
+class MockYTMusic:
+    """Stands in for YTMusic in the client pool: the two methods the
+    backend uses, answered by the mock server. Errors are raised like
+    ytmusicapi raises them, so rate-limit detection behaves the same."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def _post(self, path: str, body: dict):
+        resp = self.session.post(f"{self.base_url}/{path}", json=body, timeout=30)
+        if resp.status_code >= 400:
+            message = resp.json().get("error", {}).get("message", "")
+            raise YTMusicServerError(f"Server returned HTTP {resp.status_code}: {resp.reason}.\n{message}")
+        return resp.json()
+
+    def search(self, query: str, filter: str | None = None, limit: int = 20, **kwargs) -> list[dict]:
+        return self._post("search", {"query": query, "filter": filter, "limit": limit})
+
+    def get_watch_playlist(self, videoId: str, radio: bool = False, limit: int = 25, **kwargs) -> dict:
+        return self._post("watch", {"videoId": videoId, "radio": radio, "limit": limit})
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="JSON file with recorded search/watch responses")
+    for field, default in asdict(MockConfig()).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args()
+
+    fixtures = None
+    if args.fixtures:
+        with open(args.fixtures, encoding="utf-8") as f:
+            fixtures = json.load(f)
+    config = MockConfig(**{field: getattr(args, field) for field in asdict(MockConfig())})
+    uvicorn.run(create_app(config, fixtures), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+CrateDig — lookup caches
+In-process LRU layers backed by Postgres tables in the shared asyncpg pool.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import asyncpg
+
+
+# ── In-process LRU ───────────────────────────────────────────────────
+
+
+class LRUCache:
+    """Bounded LRU with a per-entry expiry time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[str, tuple[object, float]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[bool, object]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def put(self, key: str, value: object, ttl: float):
+        self._data[key] = (value, time.time() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ── In-flight coalescing ─────────────────────────────────────────────
+
+
+class SingleFlight:
+    """Concurrent calls for the same key share one in-flight call.
+
+    The first caller starts the call as a task; callers arriving before
+    it finishes await that task instead of making their own. Nothing is
+    kept afterwards (the caches handle reuse over time). The task is
+    shielded, so a cancelled caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller was cancelled
+
+    def stats(self) -> dict:
+        requests = self.calls + self.shared
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._inflight),
+            "coalesce_rate": round(self.shared / requests, 4) if requests else 0.0,
+        }
+
+
+# ── Seed resolution cache ────────────────────────────────────────────
+
+SEED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seed_resolutions (
+  key TEXT PRIMARY KEY,
+  artist TEXT NOT NULL,
+  title TEXT NOT NULL,
+  video_id TEXT,
+  resolved_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+
+class SeedCache:
+    """Normalized artist/title key → videoId, with misses stored as NULL.
+
+    Misses get a shorter TTL than hits so songs that appear on YouTube
+    Music later are retried eventually.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, max_size: int, ttl: float, miss_ttl: float):
+        self.pool = pool
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.lru = LRUCache(max_size)
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(SEED_SCHEMA)
+
+    async def get_many(self, keys: list[str]) -> dict[str, str | None]:
+        """Return cached resolutions for the keys that have one."""
+        found: dict[str, str | None] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            ok, video_id = self.lru.get(key)
+            if ok:
+                found[key] = video_id
+            else:
+                missing.append(key)
+        self.hits += len(found)
+
+        if missing:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT key, video_id, EXTRACT(EPOCH FROM NOW() - resolved_at) AS age
+                    FROM seed_resolutions
+                    WHERE key = ANY($1::text[])
+                      AND resolved_at > NOW() - make_interval(
+                        secs => CASE WHEN video_id IS NULL THEN $3::float8 ELSE $2::float8 END)
+                    """,
+                    missing, float(self.ttl), float(self.miss_ttl),
+                )
+            for row in rows:
+                ttl = self.miss_ttl if row["video_id"] is None else self.ttl
+                self.lru.put(row["key"], row["video_id"], ttl - float(row["age"]))
+                found[row["key"]] = row["video_id"]
+            self.db_hits += len(rows)
+            self.misses += len(missing) - len(rows)
+
+        return found
+
+    async def put(self, key: str, artist: str, title: str, video_id: str | None):
+        self.lru.put(key, video_id, self.miss_ttl if video_id is None else self.ttl)
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO seed_resolutions (key, artist, title, video_id, resolved_at)
+                VALUES ($1, $2, $3, $4, NOW())
+                ON CONFLICT (key) DO UPDATE
+                SET video_id = EXCLUDED.video_id, resolved_at = EXCLUDED.resolved_at
+                """,
+                key, artist, title, video_id,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.lru),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+        }
+
+
+# ── Radio (related tracks) cache ─────────────────────────────────────
+
+RADIO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS radio_cache (
+  video_id TEXT PRIMARY KEY,
+  tracks JSONB NOT NULL,
+  fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+_TRACK_FIELDS = ("videoId", "title", "artist", "thumbnail")
+
+
+def pack_tracks(tracks: list[dict]) -> tuple[tuple[str, ...], ...]:
+    """Store tracks as positional tuples instead of repeated-key dicts."""
+    return tuple(tuple(t[f] for f in _TRACK_FIELDS) for t in tracks)
+
+
+def unpack_tracks(packed) -> list[dict]:
+    return [dict(zip(_TRACK_FIELDS, row)) for row in packed]
+
+
+class RadioCache:
+    """Seed videoId → parsed related tracks, with stale-while-revalidate.
+
+    Entries younger than `ttl` are fresh. Entries up to `max_stale` old
+    are served immediately while a background refresh replaces them;
+    anything older counts as a miss.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, max_size: int, ttl: float, max_stale: float):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.lru = LRUCache(max_size)  # value: (fetched_at, packed tracks)
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(RADIO_SCHEMA)
+
+    async def get(self, video_id: str) -> tuple[list[dict] | None, bool]:
+        """Return (tracks, fresh). tracks is None on a miss."""
+        ok, entry = self.lru.get(video_id)
+        if not ok:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    """
+                    SELECT tracks, EXTRACT(EPOCH FROM fetched_at) AS fetched_at
+                    FROM radio_cache
+                    WHERE video_id = $1 AND fetched_at > NOW() - make_interval(secs => $2::float8)
+                    """,
+                    video_id, float(self.max_stale),
+                )
+            if row is None:
+                self.misses += 1
+                return None, False
+            packed = json.loads(row["tracks"])
+            entry = (float(row["fetched_at"]), tuple(tuple(t) for t in packed))
+            self.lru.put(video_id, entry, entry[0] + self.max_stale - time.time())
+
+        fetched_at, packed = entry
+        fresh = time.time() - fetched_at < self.ttl
+        if fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return unpack_tracks(packed), fresh
+
+    async def put(self, video_id: str, tracks: list[dict]):
+        packed = pack_tracks(tracks)
+        self.lru.put(video_id, (time.time(), packed), self.max_stale)
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO radio_cache (video_id, tracks, fetched_at)
+                VALUES ($1, $2::jsonb, NOW())
+                ON CONFLICT (video_id) DO UPDATE
+                SET tracks = EXCLUDED.tracks, fetched_at = EXCLUDED.fetched_at
+                """,
+                video_id, json.dumps(packed, separators=(",", ":")),
+            )
+
+    def revalidate(self, video_id: str, fetch: Callable[[], Awaitable[list[dict]]]):
+        """Refresh a stale entry in the background (at most one task per id).
+
+        `fetch` must fetch the radio and store it via `put`.
+        """
+        if video_id in self._refreshing:
+            return
+
+        async def run():
+            try:
+                await fetch()
+                self.refreshes += 1
+            except Exception as e:
+                print(f"Radio refresh failed for {video_id}: {e}")
+            finally:
+                self._refreshing.pop(video_id, None)
+
+        self._refreshing[video_id] = asyncio.create_task(run())
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.lru),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refreshing": len(self._refreshing),
+        }
@@ -0,0 +1,101 @@
+"""
+CrateDig — library CSV parsing
+Single-pass, streaming parser for DJ software exports and plain CSV.
+Standard library only, so poc.py can use it without the backend's deps.
+"""
+
+import csv
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple
+
+# Header aliases, in priority order (matches the frontend's PapaParse mapping)
+ARTIST_COLUMNS = ("artist", "artist_name", "performer")
+TITLE_COLUMNS = ("title", "track", "song", "name", "track_name")
+GENRE_COLUMNS = ("genre", "style")
+
+
+class ColumnMap(NamedTuple):
+    title: int
+    artist: int
+    genre: int | None
+
+
+def detect_delimiter(header_line: str) -> str:
+    """Pick the most frequent of comma, semicolon and tab in the header."""
+    return max((",", ";", "\t"), key=header_line.count)
+
+
+def detect_columns(header: list[str]) -> ColumnMap:
+    """Map title/artist/genre to column indices using the known aliases."""
+    names = [h.strip().lower() for h in header]
+
+    def find(aliases: tuple[str, ...]) -> int | None:
+        for alias in aliases:
+            if alias in names:
+                return names.index(alias)
+        return None
+
+    title, artist = find(TITLE_COLUMNS), find(ARTIST_COLUMNS)
+    if title is None or artist is None:
+        raise ValueError(f"Could not find title and artist columns in: {names}")
+    return ColumnMap(title, artist, find(GENRE_COLUMNS))
+
+
+def iter_songs(lines: Iterable[str]) -> Iterator[dict]:
+    """Yield {title, artist, genre?} for each usable row, one row at a time.
+
+    `lines` is any iterable of text lines, typically a file opened with
+    newline="". Handles two dialects in the same pass:
+
+    - plain CSV (comma, semicolon or tab separated)
+    - DJ software (WUDWUD etc.) exports, where each data row is wrapped in
+      outer double quotes with "" escaping inside. The CSV reader already
+      unwraps and unescapes those into one field holding a normal CSV row,
+      which is fed through a second, long-lived reader.
+    """
+    lines = iter(lines)
+    header_line = next(lines, "")
+    if not header_line.strip():
+        return
+    delimiter = detect_delimiter(header_line.lstrip("\ufeff"))
+    header = next(csv.reader([header_line.lstrip("\ufeff")], delimiter=delimiter))
+    cols = detect_columns(header)
+    min_len = max(cols.title, cols.artist) + 1
+
+    pending: deque[str] = deque()
+
+    def inner_reader():
+        return csv.reader(iter(pending.popleft, None), delimiter=delimiter)
+
+    inner = inner_reader()
+    for row in csv.reader(lines, delimiter=delimiter):
+        if len(row) == 1 and len(header) > 1:
+            if delimiter not in row[0]:
+                continue
+            pending.append(row[0])
+            try:
+                row = next(inner)
+            except (IndexError, csv.Error):
+                # Unbalanced quotes inside a wrapped row: drop it, reset reader
+                pending.clear()
+                inner = inner_reader()
+                continue
+        if len(row) < min_len:
+            continue
+
+        title = row[cols.title].strip()
+        artist = row[cols.artist].strip()
+        if not (title and artist):
+            continue
+
+        song = {"title": title, "artist": artist}
+        if cols.genre is not None and cols.genre < len(row):
+            genre = row[cols.genre].strip()
+            if genre:
+                song["genre"] = genre
+        yield song
+
+
+def iter_songs_from_path(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from iter_songs(f)
@@ -0,0 +1,87 @@
+"""
+CrateDig — fuzzy track matching
+Remix/edit/featuring-tolerant song matching: blocked by primary artist, with a
+character n-gram index inside each block.
+"""
+
+from collections import defaultdict
+from typing import Iterable
+
+from normalize import primary_artist, title_core
+
+NGRAM = 3
+THRESHOLD = 0.7  # minimum trigram Jaccard similarity of title cores
+
+
+def ngrams(text: str, n: int = NGRAM) -> frozenset[str]:
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset((padded,))
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class FuzzyIndex:
+    """Songs indexed for "is this the same song?" lookups.
+
+    Titles are reduced to their core (version tags and featured artists
+    dropped) and songs are blocked under their primary artist (featured
+    credits dropped), so a lookup only ever looks at songs by the same
+    lead artist. Same core is a
+    match outright; otherwise candidates come from the block's n-gram
+    postings and must reach `threshold` Jaccard similarity. No pairwise
+    pass over the whole index.
+    """
+
+    def __init__(self, threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self._cores: set[tuple[str, str]] = set()
+        self._grams: list[frozenset[str]] = []
+        # artist -> gram -> ids of that artist's songs containing the gram
+        self._blocks: dict[str, dict[str, list[int]]] = defaultdict(lambda: defaultdict(list))
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    @classmethod
+    def build(cls, songs: Iterable[tuple[str, str]], threshold: float = THRESHOLD) -> "FuzzyIndex":
+        index = cls(threshold)
+        for artist, title in songs:
+            index.add(artist, title)
+        return index
+
+    def add(self, artist: str, title: str):
+        core = title_core(title)
+        name = primary_artist(artist)
+        if (name, core) in self._cores:
+            return  # Same song already indexed
+        song_id = len(self._grams)
+        grams = ngrams(core)
+        self._grams.append(grams)
+        self._cores.add((name, core))
+        postings = self._blocks[name]
+        for gram in grams:
+            postings[gram].append(song_id)
+
+    def match(self, artist: str, title: str) -> bool:
+        core = title_core(title)
+        name = primary_artist(artist)
+        if (name, core) in self._cores:
+            return True
+        if name not in self._blocks:
+            return False
+
+        grams = ngrams(core)
+        # |A ∩ B| ≥ t·|A ∪ B| ≥ t·|A| bounds the overlap worth verifying
+        min_shared = self.threshold * len(grams)
+        shared: dict[int, int] = defaultdict(int)
+        postings = self._blocks[name]
+        for gram in grams:
+            for song_id in postings.get(gram, ()):
+                shared[song_id] += 1
+        for song_id, overlap in shared.items():
+            if overlap < min_shared:
+                continue
+            other = self._grams[song_id]
+            if overlap / (len(grams) + len(other) - overlap) >= self.threshold:
+                return True
+        return False
@@ -0,0 +1,139 @@
+"""
+CrateDig — related-track graph
+Every radio response is kept as videoId → related-videoId edges, so
+multi-hop digs can walk past results instead of calling the API again.
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable
+
+import asyncpg
+
+GRAPH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_nodes (
+  video_id TEXT PRIMARY KEY,
+  title TEXT,
+  artist TEXT,
+  thumbnail TEXT,
+  expanded_at TIMESTAMPTZ
+);
+CREATE TABLE IF NOT EXISTS track_edges (
+  source_id TEXT NOT NULL,
+  target_id TEXT NOT NULL,
+  rank SMALLINT NOT NULL,
+  PRIMARY KEY (source_id, target_id)
+);
+"""
+
+# Looks up neighbours for tracks the graph has no edges for yet; None = give up
+Expand = Callable[[str], Awaitable[list[dict] | None]]
+
+
+class TrackGraph:
+    """Persistent adjacency store of radio results.
+
+    A node is "expanded" once its radio list has been recorded; its
+    out-edges are then exactly that list, in radio order (`rank`).
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.recorded = 0
+        self.walks = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(GRAPH_SCHEMA)
+
+    async def record(self, source_id: str, tracks: list[dict]):
+        """Store `tracks` as the radio list of `source_id`, replacing any older one."""
+        nodes = {t["videoId"]: t for t in tracks if t["videoId"] != source_id}
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute(
+                """
+                INSERT INTO track_nodes (video_id, title, artist, thumbnail)
+                SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[])
+                ON CONFLICT (video_id) DO UPDATE SET
+                  title = EXCLUDED.title, artist = EXCLUDED.artist, thumbnail = EXCLUDED.thumbnail
+                """,
+                list(nodes),
+                [t["title"] for t in nodes.values()],
+                [t["artist"] for t in nodes.values()],
+                [t.get("thumbnail", "") for t in nodes.values()],
+            )
+            await conn.execute(
+                """
+                INSERT INTO track_nodes (video_id, expanded_at) VALUES ($1, NOW())
+                ON CONFLICT (video_id) DO UPDATE SET expanded_at = NOW()
+                """,
+                source_id,
+            )
+            await conn.execute("DELETE FROM track_edges WHERE source_id = $1", source_id)
+            await conn.execute(
+                """
+                INSERT INTO track_edges (source_id, target_id, rank)
+                SELECT $1, target_id, rank - 1
+                FROM unnest($2::text[]) WITH ORDINALITY AS e(target_id, rank)
+                """,
+                source_id, list(nodes),
+            )
+        self.recorded += 1
+
+    async def neighbors(self, video_ids: list[str]) -> dict[str, list[dict]]:
+        """Radio lists of the expanded nodes among `video_ids`, in one query."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT e.source_id, n.video_id, n.title, n.artist, n.thumbnail
+                FROM track_edges e
+                JOIN track_nodes n ON n.video_id = e.target_id
+                WHERE e.source_id = ANY($1::text[])
+                ORDER BY e.source_id, e.rank
+                """,
+                video_ids,
+            )
+        found: dict[str, list[dict]] = {}
+        for r in rows:
+            found.setdefault(r["source_id"], []).append({
+                "videoId": r["video_id"],
+                "title": r["title"],
+                "artist": r["artist"],
+                "thumbnail": r["thumbnail"] or "",
+            })
+        return found
+
+    async def walk(
+        self, start: list[str], hops: int, width: int, expand: Expand
+    ) -> list[list[dict]]:
+        """Breadth-first dig from `start`, up to `hops` hops out.
+
+        Returns one list per hop of the tracks first reached at that
+        distance. Each hop continues from at most `width` randomly chosen
+        tracks of the previous one. Edges come from the table; `expand`
+        is only asked about tracks that have none.
+        """
+        self.walks += 1
+        visited = set(start)
+        frontier = list(dict.fromkeys(start))
+        layers: list[list[dict]] = []
+        for _ in range(hops):
+            if not frontier:
+                break
+            lists = await self.neighbors(frontier)
+            missing = [v for v in frontier if v not in lists]
+            expanded = await asyncio.gather(*(expand(v) for v in missing))
+            lists.update((v, t) for v, t in zip(missing, expanded) if t)
+
+            layer = []
+            for video_id in frontier:
+                for track in lists.get(video_id, ()):
+                    if track["videoId"] not in visited:
+                        visited.add(track["videoId"])
+                        layer.append(track)
+            layers.append(layer)
+            frontier = [t["videoId"] for t in random.sample(layer, min(width, len(layer)))]
+        return layers
+
+    def stats(self) -> dict:
+        return {"recorded": self.recorded, "walks": self.walks}
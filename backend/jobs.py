@@ -0,0 +1,217 @@
+"""
+CrateDig — background jobs
+Rolls and playlist pushes run off the request, persisted in Postgres so
+they survive restarts, executed by a bounded pool of asyncio workers.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import asyncpg
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id UUID PRIMARY KEY,
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  payload JSONB NOT NULL,
+  progress JSONB,
+  result JSONB,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at);
+"""
+
+FINISHED = ("done", "failed")
+
+Progress = Callable[[dict], None]
+Handler = Callable[[dict, Progress], Awaitable[dict]]
+
+
+class JobQueue:
+    """Postgres-backed job queue with an in-process worker pool.
+
+    Status goes queued → running → done | failed. On startup, jobs left
+    queued or running by a previous process are picked up again.
+    Progress is pushed to live subscribers immediately and written to the
+    DB at most once per `progress_interval` seconds; the latest update is
+    written with the result.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        handlers: dict[str, Handler],
+        workers: int = 2,
+        progress_interval: float = 1.0,
+    ):
+        self.pool = pool
+        self.handlers = handlers
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._listeners: dict[str, set[asyncio.Queue]] = {}
+
+    async def start(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(JOBS_SCHEMA)
+            rows = await conn.fetch(
+                """
+                UPDATE jobs SET status = 'queued', started_at = NULL
+                WHERE status IN ('queued', 'running')
+                RETURNING id, created_at
+                """
+            )
+        for row in sorted(rows, key=lambda r: r["created_at"]):
+            self._queue.put_nowait(str(row["id"]))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, kind: str, payload: dict) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = str(uuid.uuid4())
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "INSERT INTO jobs (id, kind, payload) VALUES ($1, $2, $3::jsonb)",
+                uuid.UUID(job_id), kind, json.dumps(payload),
+            )
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> dict | None:
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id, kind, status, progress, result, error,
+                       created_at, started_at, finished_at
+                FROM jobs WHERE id = $1
+                """,
+                uuid.UUID(job_id),
+            )
+        if row is None:
+            return None
+        job = dict(row)
+        job["id"] = str(job["id"])
+        for key in ("progress", "result"):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        for key in ("created_at", "started_at", "finished_at"):
+            if job[key] is not None:
+                job[key] = job[key].isoformat()
+        return job
+
+    async def subscribe(self, job_id: str):
+        """Yield (event, data) for a job until it finishes."""
+        listener: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(listener)
+        try:
+            # Snapshot after registering, so no update falls in between
+            job = await self.get(job_id)
+            if job is None:
+                return
+            yield "status", {"status": job["status"], "progress": job["progress"]}
+            if job["status"] in FINISHED:
+                yield job["status"], {"result": job["result"], "error": job["error"]}
+                return
+            while True:
+                event, data = await listener.get()
+                yield event, data
+                if event in FINISHED:
+                    return
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def _publish(self, job_id: str, event: str, data: dict):
+        for listener in self._listeners.get(job_id, ()):
+            listener.put_nowait((event, data))
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Job {job_id} crashed the worker loop: {e}")
+
+    async def _run(self, job_id: str):
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE jobs SET status = 'running', started_at = NOW()
+                WHERE id = $1 AND status = 'queued'
+                RETURNING kind, payload
+                """,
+                uuid.UUID(job_id),
+            )
+        if row is None:
+            return  # Already taken or finished
+        self._publish(job_id, "status", {"status": "running", "progress": None})
+
+        last_write = 0.0
+        pending_write: asyncio.Task | None = None
+        latest: dict | None = None
+
+        def progress(data: dict):
+            nonlocal last_write, pending_write, latest
+            latest = data
+            self._publish(job_id, "progress", data)
+            now = time.monotonic()
+            if now - last_write >= self.progress_interval and (pending_write is None or pending_write.done()):
+                last_write = now
+                pending_write = asyncio.create_task(self._save_progress(job_id, data))
+
+        try:
+            result = await self.handlers[row["kind"]](json.loads(row["payload"]), progress)
+        except Exception as e:
+            # HTTPException carries its message in .detail
+            error = str(getattr(e, "detail", "") or e) or type(e).__name__
+            status, result = "failed", None
+        else:
+            status, error = "done", None
+        # A throttled write still in flight must not land after the terminal
+        # row; the terminal row carries the latest progress instead
+        if pending_write is not None:
+            await pending_write
+        await self._finish(job_id, status, result, error, latest)
+
+    async def _save_progress(self, job_id: str, data: dict):
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE jobs SET progress = $2::jsonb WHERE id = $1",
+                    uuid.UUID(job_id), json.dumps(data),
+                )
+        except Exception as e:
+            print(f"Job {job_id} progress write failed: {e}")
+
+    async def _finish(
+        self, job_id: str, status: str, result: dict | None, error: str | None, progress: dict | None
+    ):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE jobs
+                SET status = $2, result = $3::jsonb, error = $4, finished_at = NOW(),
+                    progress = COALESCE($5::jsonb, progress)
+                WHERE id = $1
+                """,
+                uuid.UUID(job_id), status, json.dumps(result) if result is not None else None, error,
+                json.dumps(progress) if progress is not None else None,
+            )
+        self._publish(job_id, status, {"result": result, "error": error})
@@ -0,0 +1,500 @@
+"""
+CrateDig — library storage
+The normalized library_songs table uploads are bulk-loaded into (parsed
+by csvparse), the seed index built alongside it, and the in-memory index
+of owned songs.
+"""
+
+import asyncio
+import bisect
+import itertools
+import json
+import random
+import uuid
+from typing import Iterable, Iterator
+
+import asyncpg
+import numpy as np
+
+from fuzzy import FuzzyIndex
+from normalize import key_hash, norm, song_key
+
+# ── Storage ──────────────────────────────────────────────────────────
+
+LIBRARY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS library_songs (
+  library_id UUID NOT NULL REFERENCES libraries(id) ON DELETE CASCADE,
+  position INTEGER NOT NULL,
+  artist TEXT NOT NULL,
+  title TEXT NOT NULL,
+  genre TEXT,
+  artist_key TEXT NOT NULL,
+  title_key TEXT NOT NULL,
+  PRIMARY KEY (library_id, position)
+);
+ALTER TABLE library_songs ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMPTZ;
+ALTER TABLE library_songs ADD COLUMN IF NOT EXISTS key_hash BIGINT;
+-- Set once a search for the song found nothing; dice draws skip these
+ALTER TABLE library_songs ADD COLUMN IF NOT EXISTS unresolvable BOOLEAN NOT NULL DEFAULT false;
+CREATE INDEX IF NOT EXISTS library_songs_artist_idx
+  ON library_songs (library_id, artist_key text_pattern_ops);
+CREATE INDEX IF NOT EXISTS library_songs_title_idx
+  ON library_songs (library_id, title_key text_pattern_ops);
+CREATE INDEX IF NOT EXISTS library_songs_genre_idx
+  ON library_songs (library_id, genre) WHERE genre IS NOT NULL;
+CREATE TABLE IF NOT EXISTS library_artists (
+  library_id UUID NOT NULL REFERENCES libraries(id) ON DELETE CASCADE,
+  artist_key TEXT NOT NULL,
+  song_count INTEGER NOT NULL,
+  PRIMARY KEY (library_id, artist_key)
+);
+CREATE TABLE IF NOT EXISTS library_pools (
+  library_id UUID NOT NULL REFERENCES libraries(id) ON DELETE CASCADE,
+  pool TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  PRIMARY KEY (library_id, pool)
+);
+-- Seed index format; libraries indexed by an older format are rebuilt on first use
+ALTER TABLE library_pools ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+CREATE TABLE IF NOT EXISTS library_seed_slots (
+  library_id UUID NOT NULL REFERENCES libraries(id) ON DELETE CASCADE,
+  pool TEXT NOT NULL,
+  rank INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  PRIMARY KEY (library_id, pool, rank)
+);
+"""
+
+SONG_COLUMNS = (
+    "library_id", "position", "artist", "title", "genre", "artist_key", "title_key", "key_hash",
+)
+COPY_BATCH = 2000
+DEEP_MAX_ARTIST_SONGS = 2  # "deep" = artists with at most this many songs
+INDEX_VERSION = 2  # bump whenever the pools below change meaning
+DRAW_ROUNDS = 8  # redraws to replace songs flagged unresolvable
+
+# Seed pools, each numbered 0..size-1 in library order via library_seed_slots:
+#   deep          songs by niche artists
+#   genre:<g>     songs tagged <g>
+#   deep:<g>      songs tagged <g> by artists niche within <g> (their <g> songs
+#                 counted, as the roll page did when it filtered by genre first)
+# The "all" pool has no slots: a song's rank is its position.
+_BUILD_INDEX = (
+    "DELETE FROM library_pools WHERE library_id = $1",
+    "DELETE FROM library_seed_slots WHERE library_id = $1",
+    "DELETE FROM library_artists WHERE library_id = $1",
+    """
+    INSERT INTO library_artists (library_id, artist_key, song_count)
+    SELECT library_id, artist_key, COUNT(*) FROM library_songs
+    WHERE library_id = $1 GROUP BY library_id, artist_key
+    """,
+    f"""
+    INSERT INTO library_seed_slots (library_id, pool, rank, position)
+    SELECT $1::uuid, pool, ROW_NUMBER() OVER (PARTITION BY pool ORDER BY position) - 1, position
+    FROM (
+      SELECT s.position, p.pool
+      FROM (
+        SELECT library_id, position, artist_key, genre,
+               COUNT(*) OVER (PARTITION BY artist_key, genre) AS genre_songs
+        FROM library_songs WHERE library_id = $1
+      ) s
+      JOIN library_artists a USING (library_id, artist_key)
+      CROSS JOIN LATERAL (VALUES
+        (CASE WHEN a.song_count <= {DEEP_MAX_ARTIST_SONGS} THEN 'deep' END),
+        ('genre:' || s.genre),
+        (CASE WHEN s.genre_songs <= {DEEP_MAX_ARTIST_SONGS} THEN 'deep:' || s.genre END)
+      ) AS p(pool)
+      WHERE p.pool IS NOT NULL
+    ) pools
+    """,
+    f"""
+    INSERT INTO library_pools (library_id, pool, size, version)
+    SELECT $1::uuid, 'all', COUNT(*), {INDEX_VERSION} FROM library_songs WHERE library_id = $1
+    UNION ALL
+    SELECT $1::uuid, pool, COUNT(*), {INDEX_VERSION} FROM library_seed_slots WHERE library_id = $1 GROUP BY pool
+    """,
+)
+
+# Legacy libraries.songs JSONB, rebuilt in SQL for the frontend
+_SONGS_JSON = """
+SELECT COALESCE(jsonb_agg(
+  jsonb_strip_nulls(jsonb_build_object('artist', artist, 'title', title, 'genre', genre))
+  ORDER BY position), '[]'::jsonb)
+FROM library_songs WHERE library_id = $1
+"""
+
+
+def seed_pools(mode: str, genres: list[str]) -> list[str]:
+    """Pools to draw from for a dice mode, optionally limited to genres."""
+    deep = mode == "deep"
+    if genres:
+        return [f"{'deep' if deep else 'genre'}:{g}" for g in genres]
+    return ["deep" if deep else "all"]
+
+
+def song_records(library_id: uuid.UUID, songs: Iterable[dict]) -> Iterator[tuple]:
+    for position, song in enumerate(songs):
+        artist_key, title_key = norm(song["artist"]), norm(song["title"])
+        yield (
+            library_id, position, song["artist"], song["title"], song.get("genre"),
+            artist_key, title_key, key_hash(f"{artist_key}|{title_key}"),
+        )
+
+
+class LibraryStore:
+    """The single-user library as one row per song.
+
+    The `libraries` row stays the library's identity (the frontend still
+    reads it); songs live in `library_songs`, keyed by its id, with
+    normalized artist/title keys. Libraries uploaded through the Next.js
+    route are copied into `library_songs` on first use.
+
+    Ingestion also builds the seed index: per-artist song counts and the
+    numbered seed pools, so a draw of k seeds costs k primary-key lookups
+    whatever the library size. Every library change replaces the
+    `libraries` row, and the index goes with it.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(LIBRARY_SCHEMA)
+
+    async def ingest(self, filename: str, songs: Iterator[dict]) -> dict:
+        """Replace the library with `songs`, streamed into Postgres via COPY.
+
+        Parsing runs in a worker thread, COPY_BATCH rows at a time.
+        Raises ValueError if the upload holds no usable songs.
+        """
+        library_id = uuid.uuid4()
+        records = song_records(library_id, songs)
+
+        async def batches():
+            while batch := await asyncio.to_thread(list, itertools.islice(records, COPY_BATCH)):
+                for record in batch:
+                    yield record
+
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute("DELETE FROM libraries")  # cascades to library_songs
+            await conn.execute(
+                """
+                INSERT INTO libraries (id, filename, songs, song_count, artist_count)
+                VALUES ($1, $2, '[]'::jsonb, 0, 0)
+                """,
+                library_id, filename,
+            )
+            await conn.copy_records_to_table("library_songs", records=batches(), columns=SONG_COLUMNS)
+            await self._build_index(conn, library_id)
+            meta = await self._refresh_meta(conn, library_id)
+            if meta["song_count"] == 0:
+                raise ValueError("No songs with both title and artist found")
+        return meta
+
+    async def _refresh_meta(self, conn: asyncpg.Connection, library_id: uuid.UUID) -> dict:
+        row = await conn.fetchrow(
+            f"""
+            UPDATE libraries SET
+              songs = ({_SONGS_JSON}),
+              song_count = (SELECT COUNT(*) FROM library_songs WHERE library_id = $1),
+              artist_count = (SELECT COUNT(*) FROM library_artists WHERE library_id = $1),
+              updated_at = NOW()
+            WHERE id = $1
+            RETURNING id, filename, song_count, artist_count, uploaded_at, updated_at
+            """,
+            library_id,
+        )
+        return self._meta(row)
+
+    async def _build_index(self, conn: asyncpg.Connection, library_id: uuid.UUID):
+        for statement in _BUILD_INDEX:
+            await conn.execute(statement, library_id)
+
+    @staticmethod
+    def _meta(row) -> dict:
+        meta = dict(row)
+        meta["id"] = str(meta["id"])
+        for key in ("uploaded_at", "updated_at"):
+            if meta[key] is not None:
+                meta[key] = meta[key].isoformat()
+        return meta
+
+    async def current(self) -> dict | None:
+        """Metadata of the current library, backfilling library_songs if needed."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT id, filename, song_count, artist_count, uploaded_at, updated_at,
+                       EXISTS (
+                         SELECT 1 FROM library_pools p WHERE p.library_id = l.id AND p.version = $1
+                       ) AS indexed
+                FROM libraries l LIMIT 1
+                """,
+                INDEX_VERSION,
+            )
+            if row is None:
+                return None
+            if not row["indexed"] and row["song_count"] > 0:
+                await self._backfill(conn, row["id"])
+        meta = self._meta(row)
+        del meta["indexed"]
+        return meta
+
+    async def _backfill(self, conn: asyncpg.Connection, library_id: uuid.UUID):
+        """Copy a frontend-uploaded libraries.songs blob into library_songs
+        and build (or rebuild an outdated) seed index."""
+        async with conn.transaction():
+            # Row lock so concurrent first reads don't both copy
+            songs = await conn.fetchval(
+                "SELECT songs FROM libraries WHERE id = $1 FOR UPDATE", library_id
+            )
+            if songs is None or await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM library_pools WHERE library_id = $1 AND version = $2)",
+                library_id, INDEX_VERSION,
+            ):
+                return
+            if not await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM library_songs WHERE library_id = $1)", library_id
+            ):
+                songs = json.loads(songs) if isinstance(songs, str) else songs
+                songs = [s for s in songs if s.get("artist") and s.get("title")]
+                await conn.copy_records_to_table(
+                    "library_songs", records=song_records(library_id, songs), columns=SONG_COLUMNS
+                )
+            await self._build_index(conn, library_id)
+
+    async def search(
+        self, library_id: str, q: str = "", genre: str | None = None, limit: int = 50, offset: int = 0
+    ) -> list[dict]:
+        """Songs whose artist or title starts with `q` (normalized), in library order."""
+        prefix = norm(q).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT artist, title, genre FROM library_songs
+                WHERE library_id = $1
+                  AND (artist_key LIKE $2 OR title_key LIKE $2)
+                  AND ($3::text IS NULL OR genre = $3)
+                ORDER BY position
+                LIMIT $4 OFFSET $5
+                """,
+                uuid.UUID(library_id), prefix, genre, limit, offset,
+            )
+        return [{k: v for k, v in dict(r).items() if v is not None} for r in rows]
+
+    async def genres(self, library_id: str) -> list[dict]:
+        """[{genre, count, deep}] from the seed index, most songs first."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT substr(g.pool, 7) AS genre, g.size AS count, COALESCE(d.size, 0) AS deep
+                FROM library_pools g
+                LEFT JOIN library_pools d
+                  ON d.library_id = g.library_id AND d.pool = 'deep:' || substr(g.pool, 7)
+                WHERE g.library_id = $1 AND g.pool LIKE 'genre:%'
+                ORDER BY g.size DESC, genre
+                """,
+                uuid.UUID(library_id),
+            )
+        return [dict(r) for r in rows]
+
+    async def draw_seeds(
+        self, library_id: str, count: int, mode: str = "random", genres: list[str] = ()
+    ) -> list[dict]:
+        """Up to `count` distinct random songs for a dice mode, in draw order.
+
+        Ranks are sampled across the chosen pools as if they were one
+        list, then resolved through the slot and song primary keys. Deep
+        mode falls back to random when the niche pools are too small.
+        Songs flagged unresolvable are dropped and redrawn (up to
+        DRAW_ROUNDS times). Each song carries its `position` so the draw
+        can be recorded.
+        """
+        library_id = uuid.UUID(library_id)
+        genres = list(dict.fromkeys(genres))
+        async with self.pool.acquire() as conn:
+            sizes = await self._pool_sizes(conn, library_id, seed_pools(mode, genres))
+            if mode == "deep" and sum(sizes.values()) < count:
+                sizes = await self._pool_sizes(conn, library_id, seed_pools("random", genres))
+            names = list(sizes)
+            ends = list(itertools.accumulate(sizes.values()))
+            total = ends[-1] if ends else 0
+
+            songs: list[dict] = []
+            seen: set[int] = set()
+            for _ in range(DRAW_ROUNDS):
+                want = min(count - len(songs), total - len(seen))
+                if want <= 0:
+                    break
+                # want + len(seen) distinct ranks hold at least `want` unseen ones
+                draws = [n for n in random.sample(range(total), want + len(seen)) if n not in seen][:want]
+                seen.update(draws)
+                songs.extend(await self._draw_round(conn, library_id, names, ends, draws))
+        return songs
+
+    @staticmethod
+    async def _draw_round(
+        conn: asyncpg.Connection, library_id: uuid.UUID, names: list[str], ends: list[int], draws: list[int]
+    ) -> list[dict]:
+        if names == ["all"]:
+            rows = await conn.fetch(
+                """
+                SELECT s.position, s.artist, s.title, s.genre
+                FROM unnest($2::int[]) WITH ORDINALITY AS d(position, ord)
+                JOIN library_songs s ON s.library_id = $1 AND s.position = d.position
+                WHERE NOT s.unresolvable
+                ORDER BY d.ord
+                """,
+                library_id, draws,
+            )
+        else:
+            pools, ranks = [], []
+            for n in draws:
+                i = bisect.bisect_right(ends, n)
+                pools.append(names[i])
+                ranks.append(n - (ends[i - 1] if i else 0))
+            rows = await conn.fetch(
+                """
+                SELECT s.position, s.artist, s.title, s.genre
+                FROM unnest($2::text[], $3::int[]) WITH ORDINALITY AS d(pool, rank, ord)
+                JOIN library_seed_slots x
+                  ON x.library_id = $1 AND x.pool = d.pool AND x.rank = d.rank
+                JOIN library_songs s ON s.library_id = $1 AND s.position = x.position
+                WHERE NOT s.unresolvable
+                ORDER BY d.ord
+                """,
+                library_id, pools, ranks,
+            )
+        return [{k: v for k, v in dict(r).items() if v is not None} for r in rows]
+
+    async def songs_at(self, library_id: str, positions: list[int]) -> list[dict]:
+        async with self.pool.acquire() as conn:
+            return await self._songs_at(conn, uuid.UUID(library_id), positions)
+
+    @staticmethod
+    async def _songs_at(conn: asyncpg.Connection, library_id: uuid.UUID, positions: list[int]) -> list[dict]:
+        rows = await conn.fetch(
+            """
+            SELECT s.position, s.artist, s.title, s.genre
+            FROM unnest($2::int[]) WITH ORDINALITY AS d(position, ord)
+            JOIN library_songs s ON s.library_id = $1 AND s.position = d.position
+            ORDER BY d.ord
+            """,
+            library_id, positions,
+        )
+        return [{k: v for k, v in dict(r).items() if v is not None} for r in rows]
+
+    async def columns(self, library_id: str) -> list[asyncpg.Record]:
+        """(artist_key, genre, last_used, unresolvable) for every song, in position order."""
+        async with self.pool.acquire() as conn:
+            return await conn.fetch(
+                """
+                SELECT artist_key, genre, EXTRACT(EPOCH FROM last_used_at)::float8 AS last_used,
+                       unresolvable
+                FROM library_songs WHERE library_id = $1 ORDER BY position
+                """,
+                uuid.UUID(library_id),
+            )
+
+    async def owned_songs(self, library_id: str) -> list[tuple[int, str, str]]:
+        """(key hash, artist, title) of every song; the hash is computed
+        for rows stored without one."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT key_hash, artist, title,
+                       CASE WHEN key_hash IS NULL THEN artist_key || '|' || title_key END AS key
+                FROM library_songs WHERE library_id = $1
+                """,
+                uuid.UUID(library_id),
+            )
+        return [
+            (r["key_hash"] if r["key"] is None else key_hash(r["key"]), r["artist"], r["title"])
+            for r in rows
+        ]
+
+    async def record_use(self, library_id: str, positions: list[int]):
+        """Stamp songs as just used as seeds (feeds recency weighting)."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE library_songs SET last_used_at = NOW() WHERE library_id = $1 AND position = ANY($2::int[])",
+                uuid.UUID(library_id), positions,
+            )
+
+    @staticmethod
+    async def _pool_sizes(conn: asyncpg.Connection, library_id: uuid.UUID, pools: list[str]) -> dict:
+        rows = await conn.fetch(
+            "SELECT pool, size FROM library_pools WHERE library_id = $1 AND pool = ANY($2)",
+            library_id, pools,
+        )
+        found = {r["pool"]: r["size"] for r in rows}
+        return {p: found[p] for p in pools if found.get(p)}
+
+
+# ── Owned songs ──────────────────────────────────────────────────────
+
+
+class OwnedSongs:
+    """A library's songs for membership tests.
+
+    Exact matches on the normalized song key go through a sorted array
+    of 64-bit hashes; the rest fall back to a FuzzyIndex, which catches
+    remixes, edits and featured-artist variants.
+    """
+
+    __slots__ = ("hashes", "fuzzy")
+
+    def __init__(self, songs: list[tuple[int, str, str]]):
+        self.hashes = np.sort(np.fromiter((h for h, _, _ in songs), dtype=np.int64, count=len(songs)))
+        self.fuzzy = FuzzyIndex.build((artist, title) for _, artist, title in songs)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def mask(self, songs: list[tuple[str, str]]) -> np.ndarray:
+        """True for each (artist, title) that is in the library."""
+        if not len(self.hashes) or not songs:
+            return np.zeros(len(songs), dtype=bool)
+        probe = np.fromiter(
+            (key_hash(song_key(artist, title)) for artist, title in songs),
+            dtype=np.int64, count=len(songs),
+        )
+        at = np.minimum(np.searchsorted(self.hashes, probe), len(self.hashes) - 1)
+        owned = self.hashes[at] == probe
+        for i in np.flatnonzero(~owned):
+            owned[i] = self.fuzzy.match(*songs[i])
+        return owned
+
+
+class OwnedIndex:
+    """OwnedSongs for the current library, loaded once per library id.
+
+    A re-upload gets a new id; `invalidate` also drops the old index
+    straight away.
+    """
+
+    def __init__(self, store: LibraryStore):
+        self.store = store
+        self.loads = 0
+        self._library_id: str | None = None
+        self._owned = OwnedSongs([])
+        self._lock = asyncio.Lock()
+
+    async def get(self, library_id: str | None) -> OwnedSongs:
+        if library_id is None:
+            return OwnedSongs([])
+        async with self._lock:
+            if self._library_id != library_id:
+                songs = await self.store.owned_songs(library_id)
+                self._owned = await asyncio.to_thread(OwnedSongs, songs)
+                self._library_id = library_id
+                self.loads += 1
+            return self._owned
+
+    def invalidate(self):
+        self._library_id = None
+        self._owned = OwnedSongs([])
+
+    def stats(self) -> dict:
+        return {"library_id": self._library_id, "songs": len(self._owned), "loads": self.loads}
@@ -4,42 +4,200 @@ Handles YouTube Music search/related + playlist creation.
 Reads OAuth tokens from Neon DB.
 """
 
+import asyncio
+import io
 import json
+import math
 import os
+import random
 import time
+import uuid
 from contextlib import asynccontextmanager
+from typing import Callable, Literal
 
 import asyncpg
-import requests
+import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-from ytmusicapi import YTMusic
-from ytmusicapi.auth.oauth import OAuthCredentials
+from cache import RadioCache, SeedCache, SingleFlight
+from csvparse import iter_songs
+from fuzzy import FuzzyIndex
+from graph import TrackGraph
+from jobs import JobQueue
+from library import LibraryStore, OwnedIndex, OwnedSongs
+from metrics import REGISTRY, REQUEST_SECONDS, MetricFamily, request_timings, server_timing, stage
+from normalize import song_key
+from playlists import DataAPIError, PlaylistWriter
+from pushes import PlaylistPusher
+from quota import QuotaLedger
+from ranking import top_tracks
+from ratelimit import default_limiter, is_rate_limit_error
+from resolver import LibraryResolver
+from sampling import SeedSampler
+from tokens import TokenManager
+from ytpool import YTMusicPool
 
 load_dotenv()
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
+DATABASE_SSL = os.environ.get("DATABASE_SSL", "require")  # "disable" for a local Postgres
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3005")
 
+# Seed fan-out: how many seeds are processed at once. Pacing is handled by
+# the shared rate limiter, not per-worker sleeps.
+ROLL_CONCURRENCY = int(os.environ.get("ROLL_CONCURRENCY", "4"))
+# Stop launching seeds once desired_count * (1 + overfetch) unique tracks are in.
+ROLL_OVERFETCH = float(os.environ.get("ROLL_OVERFETCH", "0.2"))
+# Most tracks one artist may place in a ranked roll (per-request artist_cap overrides).
+ROLL_ARTIST_CAP = int(os.environ.get("ROLL_ARTIST_CAP", "3"))
+RATE_LIMIT_RETRIES = int(os.environ.get("RATE_LIMIT_RETRIES", "2"))
+
+# Seed resolution cache (artist+title → videoId). TTLs in seconds.
+SEED_CACHE_SIZE = int(os.environ.get("SEED_CACHE_SIZE", "20000"))
+SEED_CACHE_TTL = float(os.environ.get("SEED_CACHE_TTL", str(30 * 86400)))
+SEED_MISS_TTL = float(os.environ.get("SEED_MISS_TTL", str(7 * 86400)))
+
+# Radio cache (seed videoId → related tracks). Served fresh up to TTL, then
+# served stale while refreshing in the background, up to RADIO_MAX_STALE.
+RADIO_CACHE_SIZE = int(os.environ.get("RADIO_CACHE_SIZE", "5000"))
+RADIO_CACHE_TTL = float(os.environ.get("RADIO_CACHE_TTL", str(3 * 86400)))
+RADIO_MAX_STALE = float(os.environ.get("RADIO_MAX_STALE", str(30 * 86400)))
+
+# OAuth token is refreshed this many seconds before it expires.
+GOOGLE_TOKEN_URL = os.environ.get("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+TOKEN_REFRESH_MARGIN = float(os.environ.get("TOKEN_REFRESH_MARGIN", "300"))
+
+# YTMusic clients kept warm; one is checked out per ytmusicapi call.
+YTMUSIC_POOL_SIZE = int(os.environ.get("YTMUSIC_POOL_SIZE", str(ROLL_CONCURRENCY)))
+# Offline runs: serve ytmusicapi calls from bench/mock_youtube.py instead of YouTube Music.
+YTMUSIC_MOCK_URL = os.environ.get("YTMUSIC_MOCK_URL", "")
+
+# Playlist pushes: parallel playlistItems inserts and retries per call.
+YOUTUBE_API_URL = os.environ.get("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+# Data API units per (Pacific) day; pushes pause once it is spent (0 = uncapped)
+YOUTUBE_DAILY_QUOTA = int(os.environ.get("YOUTUBE_DAILY_QUOTA", "10000"))
+# Parallel inserts are faster but land out of order, and each move back into
+# place costs another 50 units (~1 in 5 items at 4), so a capped quota inserts
+# serially unless this is set
+PLAYLIST_CONCURRENCY = int(
+    os.environ.get("PLAYLIST_CONCURRENCY", "1" if YOUTUBE_DAILY_QUOTA > 0 else "4")
+)
+PLAYLIST_RETRIES = int(os.environ.get("PLAYLIST_RETRIES", "4"))
+# How often paused/interrupted pushes are checked for resuming (0 = only on request)
+PUSH_RESUME_INTERVAL = float(os.environ.get("PUSH_RESUME_INTERVAL", "300"))
+
+# Multi-hop digs (RollRequest.hops > 1): tracks carried into each further hop,
+# and radio API calls a dig may spend on tracks the stored graph has no edges for.
+DIG_MAX_HOPS = int(os.environ.get("DIG_MAX_HOPS", "4"))
+DIG_WIDTH = int(os.environ.get("DIG_WIDTH", "30"))
+DIG_EXPAND_BUDGET = int(os.environ.get("DIG_EXPAND_BUDGET", "5"))
+
+# Batch rolls (/roll/batch): most rolls per request.
+ROLL_BATCH_MAX = int(os.environ.get("ROLL_BATCH_MAX", "10"))
+
+# Library pre-resolution: library songs searched in the background (one every
+# RESOLVE_INTERVAL s, once no roll has started for RESOLVE_IDLE_SECONDS), up to
+# RESOLVE_DAILY_BUDGET searches per UTC day. 0 turns the worker off.
+RESOLVE_DAILY_BUDGET = int(os.environ.get("RESOLVE_DAILY_BUDGET", "500"))
+RESOLVE_INTERVAL = float(os.environ.get("RESOLVE_INTERVAL", "30"))
+RESOLVE_IDLE_SECONDS = float(os.environ.get("RESOLVE_IDLE_SECONDS", "60"))
+
+# Background jobs (/jobs/*): rolls and pushes run concurrently in this many workers.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+limiter = default_limiter()
+# Identical searches / radio calls already in flight are shared, not repeated
+search_flight = SingleFlight()
+radio_flight = SingleFlight()
+if YTMUSIC_MOCK_URL:
+    from bench.mock_youtube import MockYTMusic
+
+    ytmusic_pool = YTMusicPool(YTMUSIC_POOL_SIZE, factory=lambda token: MockYTMusic(YTMUSIC_MOCK_URL))
+else:
+    ytmusic_pool = YTMusicPool(YTMUSIC_POOL_SIZE)
+
 # ── DB pool ──────────────────────────────────────────────────────────
 
 pool: asyncpg.Pool | None = None
+seed_cache: SeedCache | None = None
+radio_cache: RadioCache | None = None
+http: httpx.AsyncClient | None = None
+playlist_writer: PlaylistWriter | None = None
+job_queue: JobQueue | None = None
+token_manager: TokenManager | None = None
+library_store: LibraryStore | None = None
+seed_sampler: SeedSampler | None = None
+owned_index: OwnedIndex | None = None
+track_graph: TrackGraph | None = None
+library_resolver: LibraryResolver | None = None
+quota_ledger: QuotaLedger | None = None
+playlist_pusher: PlaylistPusher | None = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global pool
+    global pool, seed_cache, radio_cache, http, playlist_writer, job_queue, token_manager
+    global library_store, seed_sampler, owned_index, track_graph, library_resolver
+    global quota_ledger, playlist_pusher
     # Strip sslmode/channel_binding for asyncpg
     db_url = DATABASE_URL
     for param in ["sslmode=require", "channel_binding=disable", "channel_binding=prefer"]:
         db_url = db_url.replace(f"?{param}", "?").replace(f"&{param}", "")
     db_url = db_url.rstrip("?").rstrip("&")
 
-    pool = await asyncpg.create_pool(db_url, min_size=1, max_size=5, ssl="require")
+    pool = await asyncpg.create_pool(db_url, min_size=1, max_size=5, ssl=DATABASE_SSL)
+
+    seed_cache = SeedCache(pool, SEED_CACHE_SIZE, SEED_CACHE_TTL, SEED_MISS_TTL)
+    await seed_cache.ensure_table()
+    radio_cache = RadioCache(pool, RADIO_CACHE_SIZE, RADIO_CACHE_TTL, RADIO_MAX_STALE)
+    await radio_cache.ensure_table()
+    track_graph = TrackGraph(pool)
+    await track_graph.ensure_table()
+    library_store = LibraryStore(pool)
+    await library_store.ensure_table()
+    seed_sampler = SeedSampler(library_store)
+    owned_index = OwnedIndex(library_store)
+    library_resolver = LibraryResolver(
+        pool, library_store, seed_cache, resolve_library_song,
+        RESOLVE_DAILY_BUDGET, RESOLVE_INTERVAL, RESOLVE_IDLE_SECONDS,
+        on_flags=seed_sampler.set_unresolvable, ready=youtube_ready,
+    )
+    await library_resolver.ensure_table()
+
+    # One keep-alive connection pool for all Data API calls
+    http = httpx.AsyncClient(
+        base_url=YOUTUBE_API_URL,
+        timeout=httpx.Timeout(15.0, connect=5.0),
+        limits=httpx.Limits(max_connections=PLAYLIST_CONCURRENCY * 2),
+    )
+    quota_ledger = QuotaLedger(pool, YOUTUBE_DAILY_QUOTA)
+    await quota_ledger.ensure_table()
+    playlist_writer = PlaylistWriter(
+        http, limiter, PLAYLIST_CONCURRENCY, PLAYLIST_RETRIES, quota=quota_ledger
+    )
+    playlist_pusher = PlaylistPusher(pool, playlist_writer, data_api_headers, PUSH_RESUME_INTERVAL)
+    await playlist_pusher.ensure_table()
+    token_manager = TokenManager(pool, http, GOOGLE_TOKEN_URL, TOKEN_REFRESH_MARGIN)
+    await token_manager.start()
+    await library_resolver.start()
+    await playlist_pusher.start()
+
+    job_queue = JobQueue(
+        pool,
+        {"roll": roll_job, "roll_batch": roll_batch_job, "create_playlist": create_playlist_job},
+        JOB_WORKERS,
+    )
+    await job_queue.start()
     yield
+    await job_queue.stop()
+    await playlist_pusher.stop()
+    await library_resolver.stop()
+    await token_manager.stop()
+    await http.aclose()
     if pool:
         await pool.close()
 
@@ -61,70 +219,47 @@ app.add_middleware(
 )
 
 
-# ── Helpers ──────────────────────────────────────────────────────────
-
-
-async def get_youtube_token() -> dict:
-    """Load YouTube OAuth token from DB (single-user: first row)."""
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT oauth_token FROM youtube_connections LIMIT 1")
-    if not row:
-        raise HTTPException(status_code=401, detail="YouTube not connected")
-    token = row["oauth_token"]
-    if isinstance(token, str):
-        token = json.loads(token)
-    return token
-
-
-def refresh_token_if_needed(token: dict) -> dict:
-    """Refresh the access token if expired."""
-    if token.get("expires_at", 0) > time.time() + 60:
-        return token  # Still valid
-
-    resp = requests.post(
-        "https://oauth2.googleapis.com/token",
-        data={
-            "client_id": token["client_id"],
-            "client_secret": token["client_secret"],
-            "refresh_token": token["refresh_token"],
-            "grant_type": "refresh_token",
-        },
+@app.middleware("http")
+async def timing(request: Request, call_next):
+    """Server-Timing header (per-stage totals) and request latency histogram."""
+    t0 = time.perf_counter()
+    with request_timings() as timings:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    # Streamed responses only include stages finished before the headers went out
+    response.headers["Server-Timing"] = server_timing(timings, elapsed)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
     )
-    data = resp.json()
-    if "access_token" not in data:
-        raise HTTPException(status_code=401, detail="Token refresh failed")
+    return response
 
-    token["access_token"] = data["access_token"]
-    token["expires_at"] = int(time.time()) + data.get("expires_in", 3600)
-    return token
-
-
-async def update_token_in_db(token: dict):
-    """Update the stored token after refresh."""
-    async with pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE youtube_connections SET oauth_token = $1::jsonb, last_used_at = NOW()",
-            json.dumps(token),
-        )
 
+# ── Helpers ──────────────────────────────────────────────────────────
 
-def build_ytmusic(token: dict) -> YTMusic:
-    """Create a YTMusic instance from token dict."""
-    import tempfile
 
-    # Write token to temp file for ytmusicapi
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
-        json.dump(token, f)
-        tmp_path = f.name
+async def call_ytmusic(bucket: str, method: str, *args, **kwargs):
+    """Run a blocking YTMusic method on a pooled client in a worker thread.
 
-    try:
-        yt = YTMusic(tmp_path, oauth_credentials=OAuthCredentials(
-            client_id=token["client_id"],
-            client_secret=token["client_secret"],
-        ))
-        return yt
-    finally:
-        os.unlink(tmp_path)
+    Calls are paced by the rate limiter; throttling errors back the bucket
+    off and are retried a few times.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        token = await token_manager.get()
+        await limiter.acquire(bucket)
+        try:
+            async with ytmusic_pool.client(token, token_manager.generation) as yt:
+                result = await asyncio.to_thread(getattr(yt, method), *args, **kwargs)
+        except Exception as e:
+            if attempt < RATE_LIMIT_RETRIES and is_rate_limit_error(e):
+                limiter.throttled(bucket)
+                continue
+            raise
+        limiter.succeeded(bucket)
+        return result
 
 
 # ── Models ───────────────────────────────────────────────────────────
@@ -138,11 +273,34 @@ class Seed(BaseModel):
 class RollRequest(BaseModel):
     seeds: list[Seed]
     desired_count: int = 50
+    overfetch: float | None = None  # defaults to ROLL_OVERFETCH
+    exclude_library: bool = True  # drop tracks already in the uploaded library
+    hops: int = 1  # >1 digs further out through the related-track graph
+    artist_cap: int | None = None  # defaults to ROLL_ARTIST_CAP
+
+    def target_count(self) -> int:
+        """Unique tracks to collect before no more seeds are started."""
+        margin = ROLL_OVERFETCH if self.overfetch is None else self.overfetch
+        return math.ceil(self.desired_count * (1 + max(0.0, margin)))
 
 
 class CreatePlaylistRequest(BaseModel):
     title: str
     video_ids: list[str]
+    push_id: str | None = None  # client-chosen UUID; resending it resumes that push
+    playlist_id: str | None = None  # update this playlist in place instead of creating one
+
+
+class BatchRollRequest(BaseModel):
+    rolls: list[RollRequest]
+    cross_roll_dedup: bool = False  # a track goes to at most one roll (rolls short of their target first)
+
+
+class WeightedSeedRequest(BaseModel):
+    count: int = Field(ge=1, le=200)
+    genres: dict[str, float] = {}  # genre tag -> weight; others are excluded
+    rarity: float = 0.0  # exponent on 1 / artist song count
+    recency_days: float = Field(0.0, ge=0)  # half-life for de-weighting recently used seeds
 
 
 # ── Endpoints ────────────────────────────────────────────────────────
@@ -153,119 +311,818 @@ async def health():
     return {"status": "ok", "service": "cratedig-api"}
 
 
-@app.post("/roll")
-async def roll(req: RollRequest):
-    token = await get_youtube_token()
-    token = refresh_token_if_needed(token)
-    await update_token_in_db(token)
+@app.get("/rate-limits")
+async def rate_limits():
+    return limiter.stats()
 
-    yt = build_ytmusic(token)
 
-    all_tracks = []
-    seeds_found = 0
-    seeds_failed = 0
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        "seeds": seed_cache.stats(),
+        "radio": radio_cache.stats(),
+        "token": token_manager.stats(),
+        "ytmusic_pool": ytmusic_pool.stats(),
+        "sampler": seed_sampler.stats(),
+        "owned": owned_index.stats(),
+        "graph": track_graph.stats(),
+        "coalescing": {"search": search_flight.stats(), "radio": radio_flight.stats()},
+        "resolver": library_resolver.stats(),
+        "quota": quota_ledger.stats(),
+        "pushes": playlist_pusher.stats(),
+    }
 
-    for seed in req.seeds:
-        query = f"{seed.artist} {seed.title}"
-        try:
-            results = yt.search(query, filter="songs", limit=3)
-            time.sleep(1.5)  # Rate limiting
 
-            if not results:
-                seeds_failed += 1
+def component_metrics() -> list[MetricFamily]:
+    """Counters the caches, limiter and client pool already keep, read at scrape time."""
+    seeds, radio = seed_cache.stats(), radio_cache.stats()
+    buckets = limiter.stats()
+    return [
+        MetricFamily("cratedig_cache_lookups_total", "counter", "Cache lookups by result", [
+            ("", {"cache": "seeds", "result": "hit"}, seeds["hits"]),
+            ("", {"cache": "seeds", "result": "db_hit"}, seeds["db_hits"]),
+            ("", {"cache": "seeds", "result": "miss"}, seeds["misses"]),
+            ("", {"cache": "radio", "result": "hit"}, radio["hits"]),
+            ("", {"cache": "radio", "result": "stale_hit"}, radio["stale_hits"]),
+            ("", {"cache": "radio", "result": "miss"}, radio["misses"]),
+        ]),
+        MetricFamily("cratedig_cache_entries", "gauge", "In-process LRU entries", [
+            ("", {"cache": "seeds"}, seeds["size"]),
+            ("", {"cache": "radio"}, radio["size"]),
+        ]),
+        MetricFamily("cratedig_ratelimit_acquired_total", "counter", "Rate-limit tokens taken", [
+            ("", {"bucket": name}, b["acquired"]) for name, b in buckets.items()
+        ]),
+        MetricFamily("cratedig_ratelimit_throttled_total", "counter", "429/quota responses", [
+            ("", {"bucket": name}, b["throttled"]) for name, b in buckets.items()
+        ]),
+        MetricFamily("cratedig_ratelimit_rate", "gauge", "Current bucket rate (calls/s)", [
+            ("", {"bucket": name}, b["rate"]) for name, b in buckets.items()
+        ]),
+        MetricFamily("cratedig_coalesced_total", "counter", "YouTube Music requests: called vs shared", [
+            ("", {"call": call, "result": result}, flight.stats()[key])
+            for call, flight in (("search", search_flight), ("radio", radio_flight))
+            for result, key in (("called", "calls"), ("shared", "shared"))
+        ]),
+        MetricFamily("cratedig_ytmusic_clients", "gauge", "YTMusic clients created", [
+            ("", {}, ytmusic_pool.stats()["created"]),
+        ]),
+        MetricFamily("cratedig_token_refreshes_total", "counter", "OAuth token refreshes", [
+            ("", {}, token_manager.refreshes),
+        ]),
+        MetricFamily("cratedig_youtube_quota_units_total", "counter", "Data API quota units spent", [
+            ("", {}, quota_ledger.spent),
+        ]),
+    ]
+
+
+REGISTRY.collector(component_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def parse_watch_tracks(watch: dict) -> list[dict]:
+    """Extract track dicts from a get_watch_playlist response."""
+    tracks = []
+    for t in watch.get("tracks", [])[1:]:  # Skip first (seed song)
+        if t.get("videoId"):
+            thumbnail = ""
+            if isinstance(t.get("thumbnail"), list) and t["thumbnail"]:
+                thumbnail = t["thumbnail"][-1].get("url", "")
+
+            tracks.append({
+                "videoId": t["videoId"],
+                "title": t.get("title", "Unknown"),
+                "artist": t["artists"][0]["name"] if t.get("artists") else "Unknown",
+                "thumbnail": thumbnail,
+            })
+    return tracks
+
+
+async def resolve_seed(seed: Seed, cached: dict[str, str | None]) -> str | None:
+    """Find the seed's videoId, via the seed cache when possible."""
+    key = song_key(seed.artist, seed.title)
+    if key in cached:
+        return cached[key]
+    return await search_flight.do(key, lambda: search_seed(key, seed))
+
+
+async def search_seed(key: str, seed: Seed) -> str | None:
+    """Search YouTube Music for a seed and cache the resolution."""
+    with stage("search"):
+        results = await call_ytmusic(
+            "search", "search", f"{seed.artist} {seed.title}", filter="songs", limit=3
+        )
+    video_id = results[0].get("videoId") if results else None
+    try:
+        await seed_cache.put(key, seed.artist, seed.title, video_id)
+    except Exception as e:
+        print(f"Seed cache write failed for '{key}': {e}")
+    return video_id
+
+
+async def youtube_ready() -> bool:
+    """Whether YouTube is connected with a token that is (or can be made) valid."""
+    try:
+        await token_manager.get()
+    except HTTPException:
+        return False
+    return True
+
+
+async def resolve_library_song(artist: str, title: str) -> str | None:
+    """Search for a library song (background pre-resolution)."""
+    return await resolve_seed(Seed(artist=artist, title=title), {})
+
+
+async def fetch_radio(video_id: str) -> list[dict]:
+    """Radio for `video_id` from the API; concurrent callers share one call."""
+    return await radio_flight.do(video_id, lambda: load_radio(video_id))
+
+
+async def load_radio(video_id: str) -> list[dict]:
+    """Call get_watch_playlist for a seed and store the parsed tracks."""
+    with stage("radio"):
+        watch = await call_ytmusic(
+            "watch", "get_watch_playlist", videoId=video_id, radio=True, limit=25
+        )
+    tracks = parse_watch_tracks(watch)
+    try:
+        await radio_cache.put(video_id, tracks)
+    except Exception as e:
+        print(f"Radio cache write failed for {video_id}: {e}")
+    try:
+        await track_graph.record(video_id, tracks)
+    except Exception as e:
+        print(f"Graph write failed for {video_id}: {e}")
+    return tracks
+
+
+async def get_related(video_id: str) -> list[dict]:
+    """Related tracks for a seed, served from the radio cache when possible."""
+    try:
+        tracks, fresh = await radio_cache.get(video_id)
+    except Exception as e:
+        print(f"Radio cache read failed for {video_id}: {e}")
+        tracks, fresh = None, False
+
+    if tracks is None:
+        return await fetch_radio(video_id)
+    if not fresh:
+        radio_cache.revalidate(video_id, lambda: fetch_radio(video_id))
+    return tracks
+
+
+async def process_seed(
+    seed: Seed, cached: dict[str, str | None]
+) -> tuple[str | None, list[dict] | None]:
+    """Resolve one seed and fetch its radio.
+
+    Returns (videoId, tracks); tracks is None if the seed failed.
+    """
+    library_resolver.touch()
+    video_id = None
+    try:
+        video_id = await resolve_seed(seed, cached)
+        if not video_id:
+            return None, None
+
+        # Get related tracks via radio
+        return video_id, await get_related(video_id)
+
+    except Exception as e:
+        print(f"Error processing seed '{seed.artist} {seed.title}': {e}")
+        return video_id, None
+
+
+async def iter_seed_results(
+    seeds: list[Seed], cached: dict[str, str | None], enough: Callable[[], bool]
+):
+    """Yield (index, videoId, tracks) as seeds complete.
+
+    At most ROLL_CONCURRENCY seeds run at once (ytmusicapi calls go to
+    worker threads, the limiter paces them). No new seed is started once
+    `enough()` is true; seeds already running are left to finish unless
+    the consumer stops iterating, which cancels them.
+    """
+    pending: dict[asyncio.Task, int] = {}
+    next_index = 0
+    try:
+        while True:
+            while next_index < len(seeds) and len(pending) < ROLL_CONCURRENCY and not enough():
+                task = asyncio.create_task(process_seed(seeds[next_index], cached))
+                pending[task] = next_index
+                next_index += 1
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=pending.get):
+                index = pending.pop(task)
+                video_id, tracks = task.result()
+                yield index, video_id, tracks
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class TrackDeduper:
+    """Incremental dedup by videoId and by fuzzy artist/title (remixes,
+    edits, featured-artist variants), minus songs the user already owns."""
+
+    def __init__(self, owned: OwnedSongs | None = None):
+        self.owned = owned
+        self.seen_ids: set[str] = set()
+        self.variants = FuzzyIndex()
+        self.unique: list[dict] = []
+        self.raw_found = 0
+        self.owned_excluded = 0
+        self.near_duplicates = 0
+
+    def add(self, tracks: list[dict]) -> list[dict]:
+        """Add tracks; return the ones not seen before and not owned."""
+        self.raw_found += len(tracks)
+        new_tracks = []
+        for t in tracks:
+            if t["videoId"] not in self.seen_ids:
+                self.seen_ids.add(t["videoId"])
+                new_tracks.append(t)
+        if self.owned and new_tracks:
+            owned = self.owned.mask([(t["artist"], t["title"]) for t in new_tracks])
+            self.owned_excluded += int(owned.sum())
+            new_tracks = [t for t, own in zip(new_tracks, owned) if not own]
+
+        kept = []
+        for t in new_tracks:
+            if self.variants.match(t["artist"], t["title"]):
+                self.near_duplicates += 1
                 continue
+            self.variants.add(t["artist"], t["title"])
+            kept.append(t)
+        self.unique.extend(kept)
+        return kept
 
-            hit = results[0]
-            video_id = hit.get("videoId")
-            if not video_id:
+
+async def prepare_roll(req: RollRequest) -> tuple[dict[str, str | None], OwnedSongs | None]:
+    """Check YouTube is connected, look up cached seed resolutions and
+    load the owned-songs index."""
+    await token_manager.get()
+    cached = await seed_cache.get_many([song_key(s.artist, s.title) for s in req.seeds])
+    owned = None
+    if req.exclude_library:
+        library = await library_store.current()
+        owned = await owned_index.get(library["id"] if library else None)
+    return cached, owned
+
+
+def sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def run_roll(req: RollRequest, progress: Callable[[dict], None] | None = None) -> dict:
+    """The /roll pipeline. `progress` gets seed/track counts as seeds finish.
+
+    Candidates are ranked across seeds (see ranking.py) rather than kept
+    in seed order.
+    """
+    if req.hops > 1:
+        return await run_dig(req, progress)
+    cached, owned = await prepare_roll(req)
+    target = req.target_count()
+
+    # Merge results in seed order (not completion order) so the output is
+    # deterministic. The cutoff counts videoIds from every finished seed, so
+    # seeds done behind a slow earlier one still stop new launches.
+    deduper = TrackDeduper(owned)
+    lists: list[list[dict]] = []
+    finished: dict[int, list[dict] | None] = {}
+    found: set[str] = set()
+    merged = 0
+    seeds_found = 0
+    seeds_failed = 0
+
+    async for index, _, tracks in iter_seed_results(
+        req.seeds, cached, lambda: len(found) >= target
+    ):
+        finished[index] = tracks
+        found.update(t["videoId"] for t in tracks or ())
+        while merged in finished:
+            tracks = finished.pop(merged)
+            merged += 1
+            if tracks is None:
                 seeds_failed += 1
                 continue
-
             seeds_found += 1
+            lists.append(tracks)
+            with stage("dedup"):
+                deduper.add(tracks)
+        if progress:
+            progress({
+                "seeds_done": seeds_found + seeds_failed,
+                "seeds_total": len(req.seeds),
+                "tracks_found": len(deduper.unique),
+            })
 
-            # Get related tracks via radio
-            watch = yt.get_watch_playlist(videoId=video_id, radio=True, limit=25)
-            time.sleep(1.5)
+    artist_cap = ROLL_ARTIST_CAP if req.artist_cap is None else req.artist_cap
+    with stage("rank"):
+        tracks = top_tracks(deduper.unique, lists, req.desired_count, artist_cap)
+    return {
+        "tracks": tracks,
+        "seeds_used": seeds_found,
+        "seeds_failed": seeds_failed,
+        "seeds_skipped": len(req.seeds) - seeds_found - seeds_failed,
+        "raw_found": deduper.raw_found,
+        "owned_excluded": deduper.owned_excluded,
+        "near_duplicates": deduper.near_duplicates,
+        "after_dedup": len(deduper.unique),
+    }
 
-            for t in watch.get("tracks", [])[1:]:  # Skip first (seed song)
-                if t.get("videoId"):
-                    thumbnail = ""
-                    if isinstance(t.get("thumbnail"), list) and t["thumbnail"]:
-                        thumbnail = t["thumbnail"][-1].get("url", "")
 
-                    all_tracks.append({
-                        "videoId": t["videoId"],
-                        "title": t.get("title", "Unknown"),
-                        "artist": t["artists"][0]["name"] if t.get("artists") else "Unknown",
-                        "thumbnail": thumbnail,
-                    })
+async def run_dig(req: RollRequest, progress: Callable[[dict], None] | None = None) -> dict:
+    """A multi-hop roll: resolve every seed, then walk the related-track
+    graph `hops` hops out and prefer the tracks found farthest away."""
+    cached, owned = await prepare_roll(req)
+    hops = min(req.hops, DIG_MAX_HOPS)
 
-        except Exception as e:
-            print(f"Error processing seed '{query}': {e}")
+    start: list[str] = []
+    seeds_failed = 0
+    async for _, video_id, tracks in iter_seed_results(req.seeds, cached, lambda: False):
+        if tracks is None:
             seeds_failed += 1
+        else:
+            start.append(video_id)
+        if progress:
+            progress({
+                "seeds_done": len(start) + seeds_failed,
+                "seeds_total": len(req.seeds),
+                "tracks_found": 0,
+            })
 
-    # Deduplicate by videoId
-    seen_ids: set[str] = set()
-    unique_tracks = []
-    for t in all_tracks:
-        if t["videoId"] not in seen_ids:
-            seen_ids.add(t["videoId"])
-            unique_tracks.append(t)
+    # Tracks without stored edges: radio cache first, then the API while budget lasts
+    budget = DIG_EXPAND_BUDGET
+    api_expansions = 0
+
+    async def expand(video_id: str) -> list[dict] | None:
+        nonlocal budget, api_expansions
+        try:
+            tracks, _ = await radio_cache.get(video_id)
+            if tracks is not None:
+                await track_graph.record(video_id, tracks)
+                return tracks
+            if budget <= 0:
+                return None
+            budget -= 1
+            api_expansions += 1
+            return await fetch_radio(video_id)
+        except Exception as e:
+            print(f"Dig expansion failed for {video_id}: {e}")
+            return None
+
+    layers = await track_graph.walk(start, hops, DIG_WIDTH, expand)
+
+    deduper = TrackDeduper(owned)
+    with stage("dedup"):
+        for layer in reversed(layers):
+            deduper.add(random.sample(layer, len(layer)))
+    if progress:
+        progress({
+            "seeds_done": len(start) + seeds_failed,
+            "seeds_total": len(req.seeds),
+            "tracks_found": len(deduper.unique),
+        })
 
     return {
-        "tracks": unique_tracks[:req.desired_count],
-        "seeds_used": seeds_found,
+        "tracks": deduper.unique[:req.desired_count],
+        "seeds_used": len(start),
         "seeds_failed": seeds_failed,
-        "raw_found": len(all_tracks),
-        "after_dedup": len(unique_tracks),
+        "seeds_skipped": 0,
+        "raw_found": deduper.raw_found,
+        "owned_excluded": deduper.owned_excluded,
+        "near_duplicates": deduper.near_duplicates,
+        "after_dedup": len(deduper.unique),
+        "hops": hops,
+        "found_per_hop": [len(layer) for layer in layers],
+        "api_expansions": api_expansions,
     }
 
 
-@app.post("/create-playlist")
-async def create_playlist(req: CreatePlaylistRequest):
-    token = await get_youtube_token()
-    token = refresh_token_if_needed(token)
-    await update_token_in_db(token)
-
-    access_token = token["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-
-    # Step 1: Create empty playlist via YouTube Data API v3
-    resp = requests.post(
-        "https://www.googleapis.com/youtube/v3/playlists?part=snippet,status",
-        headers=headers,
-        json={
-            "snippet": {"title": req.title, "description": "Auto-generated by CrateDig"},
-            "status": {"privacyStatus": "private"},
-        },
-    )
+def check_batch(req: BatchRollRequest):
+    if not 1 <= len(req.rolls) <= ROLL_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"A batch holds 1 to {ROLL_BATCH_MAX} rolls")
+    if any(r.hops > 1 for r in req.rolls):
+        raise HTTPException(status_code=400, detail="Multi-hop digs cannot be batched")
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"Playlist creation failed: {resp.text[:200]}")
 
-    playlist_id = resp.json()["id"]
+async def run_roll_batch(
+    req: BatchRollRequest, progress: Callable[[dict], None] | None = None
+) -> dict:
+    """Several rolls in one pass.
 
-    # Step 2: Add videos one by one
-    added = 0
-    for vid in req.video_ids:
-        try:
-            r = requests.post(
-                "https://www.googleapis.com/youtube/v3/playlistItems?part=snippet",
-                headers=headers,
-                json={
-                    "snippet": {
-                        "playlistId": playlist_id,
-                        "resourceId": {"kind": "youtube#video", "videoId": vid},
-                    }
-                },
-            )
-            if r.status_code == 200:
-                added += 1
-        except Exception:
-            pass
+    The union of all seeds is resolved and radio-fetched once; each seed's
+    tracks then go to every roll that listed it, and each roll is deduped
+    and ranked on its own. Seeds are interleaved across rolls so all of
+    them fill up evenly, and no new seed starts once every roll has its
+    target. With `cross_roll_dedup`, each new track (or variant of one
+    already handed out) goes to exactly one of the rolls that found it,
+    as results come in: the first that is still short of its target, else
+    the first. Targets count only those tracks, so a roll sharing its seeds
+    with others keeps starting seeds until it has enough of its own.
+    """
+    check_batch(req)
+    await token_manager.get()
+
+    seeds: list[Seed] = []
+    owners: list[list[int]] = []  # union index -> rolls listing that seed
+    slot: dict[str, int] = {}
+    roll_keys = [[song_key(s.artist, s.title) for s in r.seeds] for r in req.rolls]
+    for i in range(max(len(keys) for keys in roll_keys)):
+        for r, keys in enumerate(roll_keys):
+            if i >= len(keys):
+                continue
+            if keys[i] not in slot:
+                slot[keys[i]] = len(seeds)
+                seeds.append(req.rolls[r].seeds[i])
+                owners.append([])
+            if r not in owners[slot[keys[i]]]:
+                owners[slot[keys[i]]].append(r)
+
+    cached = await seed_cache.get_many(list(slot))
+    owned = None
+    if any(r.exclude_library for r in req.rolls):
+        library = await library_store.current()
+        owned = await owned_index.get(library["id"] if library else None)
+
+    dedupers = [TrackDeduper(owned if r.exclude_library else None) for r in req.rolls]
+    lists: list[list[list[dict]]] = [[] for _ in req.rolls]
+    targets = [r.target_count() for r in req.rolls]
+    outcome: list[bool | None] = [None] * len(seeds)  # None = never started
+    # Per roll, the tracks it may rank: its own unique tracks, or with
+    # cross_roll_dedup only those handed to it
+    candidates = [[] for _ in req.rolls] if req.cross_roll_dedup else [d.unique for d in dedupers]
+    claimed_ids: set[str] = set()
+    claimed = FuzzyIndex()
+
+    def claim(new: dict[int, list[dict]]):
+        """Hand each track in `new` (roll -> its new tracks) to one of those rolls."""
+        finders: dict[str, list[int]] = {}
+        found: dict[str, dict] = {}
+        for r, tracks in new.items():
+            for t in tracks:
+                finders.setdefault(t["videoId"], []).append(r)
+                found[t["videoId"]] = t
+        for video_id, rolls in finders.items():
+            t = found[video_id]
+            if video_id in claimed_ids or claimed.match(t["artist"], t["title"]):
+                continue
+            short = [r for r in rolls if len(candidates[r]) < targets[r]]
+            candidates[(short or rolls)[0]].append(t)
+            claimed_ids.add(video_id)
+            claimed.add(t["artist"], t["title"])
+
+    # Merged in union order, as in run_roll, so results are deterministic
+    finished: dict[int, list[dict] | None] = {}
+    merged = 0
+    async for index, _, tracks in iter_seed_results(
+        seeds, cached, lambda: all(len(c) >= t for c, t in zip(candidates, targets))
+    ):
+        finished[index] = tracks
+        while merged in finished:
+            tracks = finished.pop(merged)
+            outcome[merged] = tracks is not None
+            if tracks is not None:
+                new = {}
+                for r in owners[merged]:
+                    lists[r].append(tracks)
+                    with stage("dedup"):
+                        new[r] = dedupers[r].add(tracks)
+                if req.cross_roll_dedup:
+                    with stage("dedup"):
+                        claim(new)
+            merged += 1
+        if progress:
+            progress({
+                "seeds_done": merged,
+                "seeds_total": len(seeds),
+                "tracks_found": [len(c) for c in candidates],
+            })
+
+    results = []
+    for r, roll in enumerate(req.rolls):
+        deduper = dedupers[r]
+        artist_cap = ROLL_ARTIST_CAP if roll.artist_cap is None else roll.artist_cap
+        with stage("rank"):
+            tracks = top_tracks(candidates[r], lists[r], roll.desired_count, artist_cap)
+
+        used = [outcome[slot[key]] for key in roll_keys[r]]
+        results.append({
+            "tracks": tracks,
+            "seeds_used": used.count(True),
+            "seeds_failed": used.count(False),
+            "seeds_skipped": used.count(None),
+            "raw_found": deduper.raw_found,
+            "owned_excluded": deduper.owned_excluded,
+            "near_duplicates": deduper.near_duplicates,
+            "after_dedup": len(deduper.unique),
+            "cross_roll_excluded": len(deduper.unique) - len(candidates[r]),
+        })
 
     return {
-        "playlist_id": playlist_id,
-        "url": f"https://music.youtube.com/playlist?list={playlist_id}",
-        "track_count": added,
+        "rolls": results,
+        "seeds_total": sum(len(keys) for keys in roll_keys),
+        "seeds_unique": len(seeds),
+        "seeds_run": len(seeds) - outcome.count(None),
     }
+
+
+@app.post("/roll")
+async def roll(req: RollRequest):
+    return await run_roll(req)
+
+
+@app.post("/roll/batch")
+async def roll_batch(req: BatchRollRequest):
+    return await run_roll_batch(req)
+
+
+@app.post("/roll/stream")
+async def roll_stream(req: RollRequest):
+    """Same as /roll, but streams results as Server-Sent Events.
+
+    Events, in completion order:
+      seed   — {index, artist, title, videoId, ok}
+      tracks — {index, tracks}  (only videoIds not sent before)
+      done   — the /roll stats, without the track list
+    """
+    if req.hops > 1:
+        raise HTTPException(status_code=400, detail="Multi-hop digs are not streamed; use /roll or /jobs/roll")
+    cached, owned = await prepare_roll(req)
+    target = req.target_count()
+
+    async def events():
+        deduper = TrackDeduper(owned)
+        sent = seeds_found = seeds_failed = 0
+        results = iter_seed_results(req.seeds, cached, lambda: len(deduper.unique) >= target)
+        try:
+            async for index, video_id, tracks in results:
+                seed = req.seeds[index]
+                ok = tracks is not None
+                if ok:
+                    seeds_found += 1
+                else:
+                    seeds_failed += 1
+                yield sse("seed", {
+                    "index": index, "artist": seed.artist, "title": seed.title,
+                    "videoId": video_id, "ok": ok,
+                })
+                if not ok:
+                    continue
+
+                with stage("dedup"):
+                    new_tracks = deduper.add(tracks)[:max(0, req.desired_count - sent)]
+                sent += len(new_tracks)
+                if new_tracks:
+                    yield sse("tracks", {"index": index, "tracks": new_tracks})
+                if sent >= req.desired_count:
+                    break  # Cancels seeds still in flight
+        finally:
+            await results.aclose()
+
+        yield sse("done", {
+            "seeds_used": seeds_found,
+            "seeds_failed": seeds_failed,
+            "seeds_skipped": len(req.seeds) - seeds_found - seeds_failed,
+            "raw_found": deduper.raw_found,
+            "owned_excluded": deduper.owned_excluded,
+            "near_duplicates": deduper.near_duplicates,
+            "after_dedup": len(deduper.unique),
+            "track_count": sent,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def data_api_headers() -> dict:
+    token = await token_manager.get()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def parse_push_id(push_id: str) -> str:
+    try:
+        return str(uuid.UUID(push_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Push not found")
+
+
+async def run_create_playlist(
+    req: CreatePlaylistRequest, progress: Callable[[dict], None] | None = None
+) -> dict:
+    """The /create-playlist pipeline. `progress` gets item counts as inserts finish.
+
+    The push is stored as a plan first, so it can be resumed (by resending
+    the same push_id, POST /pushes/{id}/resume, or automatically after a
+    quota pause) without creating the playlist or any item twice. With
+    `playlist_id`, that playlist is diffed against `video_ids` and only
+    the needed inserts, deletes and moves are sent.
+    """
+    if req.push_id:
+        try:
+            push_id = str(uuid.UUID(req.push_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="push_id must be a UUID")
+    else:
+        push_id = str(uuid.uuid4())
+    await playlist_pusher.create(push_id, req.title, req.video_ids, req.playlist_id)
+    return await run_push(push_id, progress)
+
+
+async def run_push(push_id: str, progress: Callable[[dict], None] | None = None) -> dict:
+    try:
+        return await playlist_pusher.run(push_id, progress)
+    except DataAPIError as e:
+        raise HTTPException(status_code=502, detail=f"Playlist push {push_id} failed: {e}")
+
+
+def push_status(report: dict, response: Response) -> dict:
+    """A push that paused on quota or left items unadded answers 202, not
+    200: the playlist is incomplete until POST /pushes/{id}/resume finishes it."""
+    if report["status"] != "done":
+        response.status_code = 202
+    return report
+
+
+@app.post("/create-playlist")
+async def create_playlist(req: CreatePlaylistRequest, response: Response):
+    return push_status(await run_create_playlist(req), response)
+
+
+@app.get("/pushes/{push_id}")
+async def get_push(push_id: str):
+    push = await playlist_pusher.get(parse_push_id(push_id))
+    if push is None:
+        raise HTTPException(status_code=404, detail="Push not found")
+    return push
+
+
+@app.post("/pushes/{push_id}/resume")
+async def resume_push(push_id: str, response: Response):
+    """Continue a paused or failed push now (a done push is returned as is)."""
+    push_id = parse_push_id(push_id)
+    if await playlist_pusher.get(push_id) is None:
+        raise HTTPException(status_code=404, detail="Push not found")
+    return push_status(await run_push(push_id), response)
+
+
+# ── Library ──────────────────────────────────────────────────────────
+
+
+@app.post("/library/upload")
+async def upload_library(file: UploadFile = File(...)):
+    """Replace the library from a CSV export, streamed straight into Postgres."""
+    filename = file.filename or "library.csv"
+    # UTF-8 first (BOM tolerated), Latin-1 for older DJ software exports
+    for encoding in ("utf-8-sig", "latin-1"):
+        await file.seek(0)
+        text = io.TextIOWrapper(file.file, encoding=encoding, newline="")
+        try:
+            library = await library_store.ingest(filename, iter_songs(text))
+            owned_index.invalidate()
+            return {"library": library}
+        except UnicodeDecodeError:
+            continue
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            text.detach()
+
+
+@app.get("/library")
+async def get_library():
+    return {"library": await library_store.current()}
+
+
+async def current_library() -> dict:
+    library = await library_store.current()
+    if library is None:
+        raise HTTPException(status_code=404, detail="No library uploaded")
+    return library
+
+
+@app.get("/library/songs")
+async def library_songs(
+    q: str = "",
+    genre: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    library = await current_library()
+    songs = await library_store.search(library["id"], q, genre, limit, offset)
+    return {"songs": songs}
+
+
+@app.get("/library/genres")
+async def library_genres():
+    library = await current_library()
+    return {"genres": await library_store.genres(library["id"])}
+
+
+@app.get("/library/seeds")
+async def library_seeds(
+    count: int = Query(..., ge=1, le=200),
+    mode: Literal["random", "deep"] = "random",
+    genre: list[str] = Query(default=[]),
+):
+    """Draw `count` seeds from the library's seed index (repeat `genre` to filter).
+
+    With genres, "deep" means niche within each genre: an artist with at
+    most two songs tagged <g> counts as niche for <g> even if they have
+    more songs in other selected genres (not across the selection as a whole).
+    """
+    library = await current_library()
+    seeds = await library_store.draw_seeds(library["id"], count, mode, genre)
+    await seed_sampler.record_use(library["id"], [s.pop("position") for s in seeds])
+    return {"seeds": seeds}
+
+
+@app.post("/library/seeds/weighted")
+async def library_seeds_weighted(req: WeightedSeedRequest):
+    """Draw seeds weighted by genre, artist rarity and time since last use."""
+    library = await current_library()
+    seeds = await seed_sampler.draw(
+        library["id"], req.count, req.genres, req.rarity, req.recency_days * 86400
+    )
+    return {"seeds": seeds}
+
+
+# ── Jobs ─────────────────────────────────────────────────────────────
+
+
+async def roll_job(payload: dict, progress: Callable[[dict], None]) -> dict:
+    return await run_roll(RollRequest(**payload), progress)
+
+
+async def roll_batch_job(payload: dict, progress: Callable[[dict], None]) -> dict:
+    return await run_roll_batch(BatchRollRequest(**payload), progress)
+
+
+async def create_playlist_job(payload: dict, progress: Callable[[dict], None]) -> dict:
+    return await run_create_playlist(CreatePlaylistRequest(**payload), progress)
+
+
+@app.post("/jobs/roll", status_code=202)
+async def submit_roll(req: RollRequest):
+    return {"job_id": await job_queue.submit("roll", req.model_dump())}
+
+
+@app.post("/jobs/roll/batch", status_code=202)
+async def submit_roll_batch(req: BatchRollRequest):
+    check_batch(req)
+    return {"job_id": await job_queue.submit("roll_batch", req.model_dump())}
+
+
+@app.post("/jobs/create-playlist", status_code=202)
+async def submit_create_playlist(req: CreatePlaylistRequest):
+    # Fixed now, so a rerun after a restart resumes the same push
+    payload = {**req.model_dump(), "push_id": req.push_id or str(uuid.uuid4())}
+    return {"job_id": await job_queue.submit("create_playlist", payload)}
+
+
+def parse_job_id(job_id: str) -> str:
+    try:
+        return str(uuid.UUID(job_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(parse_job_id(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Job status/progress as Server-Sent Events, ending with done or failed."""
+    job_id = parse_job_id(job_id)
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for event, data in job_queue.subscribe(job_id):
+            yield sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
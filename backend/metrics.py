@@ -0,0 +1,224 @@
+"""
+CrateDig — metrics
+Latency histograms and counters for the hot path, exported in the
+Prometheus text format (/metrics) and per request as Server-Timing.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+# Seconds; covers cache hits (~ms) up to throttled Data API retries
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+@dataclass
+class MetricFamily:
+    """One metric as collected at scrape time.
+
+    Samples are (suffix, labels, value); suffix is "" except for the
+    _bucket/_sum/_count series of a histogram.
+    """
+
+    name: str
+    kind: str  # "counter" | "gauge" | "histogram"
+    help: str
+    samples: list[tuple[str, dict, float]] = field(default_factory=list)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list[MetricFamily]:
+        with self._lock:
+            samples = [("", dict(zip(self.labelnames, k)), v) for k, v in self._values.items()]
+        return [MetricFamily(self.name, "counter", self.help, samples)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple = BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self) -> list[MetricFamily]:
+        family = MetricFamily(self.name, "histogram", self.help)
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for key, series in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, series):
+                family.samples.append(("_bucket", {**labels, "le": _value(float(bound))}, count))
+            family.samples.append(("_bucket", {**labels, "le": "+Inf"}, series[-1]))
+            family.samples.append(("_sum", labels, series[-2]))
+            family.samples.append(("_count", labels, series[-1]))
+        return [family]
+
+
+class Registry:
+    """Metrics owned here plus collectors that read other components'
+    existing counters (cache, limiter, pool stats) at scrape time."""
+
+    def __init__(self):
+        self._metrics: list[Counter | Histogram] = []
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[MetricFamily]]):
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        families = [f for m in self._metrics for f in m.collect()]
+        for fn in self._collectors:
+            try:
+                families.extend(fn())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        lines = []
+        for f in families:
+            lines.append(f"# HELP {f.name} {f.help}")
+            lines.append(f"# TYPE {f.name} {f.kind}")
+            for suffix, labels, value in f.samples:
+                lines.append(f"{f.name}{suffix}{_labels(labels)} {_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "cratedig_stage_seconds", "Time spent in each hot-path stage", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "cratedig_stage_errors_total", "Stage calls that raised", ("stage",)
+)
+RATELIMIT_WAIT = REGISTRY.histogram(
+    "cratedig_ratelimit_wait_seconds", "Time spent waiting for a rate-limit token", ("bucket",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "cratedig_http_request_seconds", "HTTP request latency (to response headers)",
+    ("method", "route", "status"),
+)
+
+
+# ── Per-request timings ──────────────────────────────────────────────
+
+# stage -> [total seconds, calls] for the request being served, if any.
+# Tasks and worker threads started by the request inherit the same dict.
+_request_timings: ContextVar[dict[str, list] | None] = ContextVar("request_timings", default=None)
+
+
+def _add_timing(name: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def observe(stage_name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage_name)
+    _add_timing(stage_name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name`; failures are counted too."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        observe(name, time.perf_counter() - t0)
+
+
+def observe_wait(bucket: str, seconds: float):
+    """Record a rate-limiter wait (zero waits count towards the histogram only)."""
+    RATELIMIT_WAIT.observe(seconds, bucket=bucket)
+    if seconds > 0:
+        _add_timing("ratelimit", seconds)
+
+
+@contextmanager
+def request_timings():
+    """Collect stage timings for the current request; yields the dict."""
+    timings: dict[str, list] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: dict[str, list], total: float) -> str:
+    """Server-Timing header value: summed duration and call count per stage.
+
+    Stages that ran concurrently (seeds, inserts) can add up to more than
+    `total`.
+    """
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{calls}x"'
+        for name, (seconds, calls) in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
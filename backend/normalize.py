@@ -0,0 +1,67 @@
+"""
+CrateDig — text normalization
+Canonical artist/title keys shared by caches, library indexes and dedup.
+"""
+
+import hashlib
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+# Words that mark a bracketed or " - " suffix as a version tag, not part of the title
+_VERSION_WORDS = (
+    r"mix|remix|edit|version|rework|bootleg|dub|vip|remaster(?:ed)?|live|extended|radio|"
+    r"original|instrumental|acoustic|club|mono|stereo|explicit|clean|feat|ft|featuring|prod"
+)
+_VERSION_BRACKET = re.compile(rf"[(\[][^)\]]*\b(?:{_VERSION_WORDS})\b[^)\]]*[)\]]", re.IGNORECASE)
+_VERSION_DASH = re.compile(rf"\s+-\s+[^-]*\b(?:{_VERSION_WORDS})\b.*$", re.IGNORECASE)
+_FEATURING = re.compile(r"\s+(?:feat|ft|featuring)\b\.?.*$", re.IGNORECASE)
+_FEATURED = re.compile(r"[\s(\[]*\b(?:feat|ft|featuring)\b\.?", re.IGNORECASE)
+_FEATURED_SPLIT = re.compile(r"\s*(?:,|&)\s*")
+
+
+def norm(text: str) -> str:
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text.casefold())
+    return _SPACES.sub(" ", text).strip()
+
+
+def title_core(title: str) -> str:
+    """Normalized title without version tags: "(Original Mix)", "[X Remix]",
+    "- Radio Edit", "feat. Y". Falls back to the full title if nothing is left."""
+    core = _VERSION_BRACKET.sub(" ", title)
+    core = _VERSION_DASH.sub("", core)
+    core = _FEATURING.sub("", core)
+    return norm(core) or norm(title)
+
+
+def artist_names(artist: str) -> list[str]:
+    """Primary artist, then featured ones, normalized: "A feat. B & C" ->
+    ["a", "b", "c"]. Only a featuring clause is split; "Simon & Garfunkel"
+    or "Malcolm X" stay one artist."""
+    primary, *featured = _FEATURED.split(artist, maxsplit=1)
+    parts = [primary, *(_FEATURED_SPLIT.split(featured[0]) if featured else [])]
+    names = [norm(part) for part in parts]
+    if not names[0]:
+        return [norm(artist)]
+    return list(dict.fromkeys(n for n in names if n))
+
+
+def primary_artist(artist: str) -> str:
+    """The normalized lead artist, without featured credits."""
+    return artist_names(artist)[0]
+
+
+def song_key(artist: str, title: str) -> str:
+    """Stable lookup key for an artist/title pair."""
+    return f"{norm(artist)}|{norm(title)}"
+
+
+def key_hash(key: str) -> int:
+    """64-bit hash of a song key, as a signed int (fits BIGINT and int64)."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
@@ -0,0 +1,237 @@
+"""
+CrateDig — playlist writer
+YouTube Data API v3 playlist creation/population over a pooled async client.
+"""
+
+import asyncio
+import random
+
+import httpx
+
+from metrics import stage
+from quota import COSTS, QuotaExhausted, QuotaLedger
+from ratelimit import RateLimiter, is_quota_exceeded_response, is_rate_limit_response
+
+# 409 is what the Data API returns for concurrent writes to the same playlist
+TRANSIENT_STATUS = {409, 500, 502, 503, 504}
+
+
+class DataAPIError(Exception):
+    def __init__(self, status_code: int, body: str, attempts: int = 1):
+        super().__init__(f"HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.body = body
+        self.attempts = attempts
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class PlaylistWriter:
+    """Creates playlists and inserts items with bounded concurrency.
+
+    Every call is paced by the shared rate limiter and retried with
+    exponential back-off on network errors, 409/5xx and throttling.
+    With a quota ledger, each attempt is charged to the daily budget and
+    QuotaExhausted is raised once it (or the API's own quota) runs out.
+    With concurrency above 1, items are appended in parallel, so once they
+    are in, one paged list call per 50 items checks the order and the
+    misplaced items are moved into position. That trades quota for speed:
+    every move is another 50-unit update, and at 4 in flight about one
+    insert in five lands out of place. Under a daily budget, use 1 —
+    strictly serial inserts land in order and need no reorder pass.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        limiter: RateLimiter,
+        concurrency: int = 1,
+        retries: int = 4,
+        backoff: float = 0.5,
+        quota: QuotaLedger | None = None,
+    ):
+        self.client = client
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.quota = quota
+
+    # ── Transport ──
+
+    async def request(
+        self, bucket: str, method: str, path: str, headers: dict, **kwargs
+    ) -> tuple[dict, int]:
+        """Send one Data API call. Returns (json body, attempts used)."""
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.quota:
+                await self.quota.spend(COSTS.get((bucket, method), 1))
+            await self.limiter.acquire(bucket)
+            try:
+                resp = await self.client.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                if attempt > self.retries:
+                    raise DataAPIError(0, str(e), attempt) from e
+                await self._sleep(attempt)
+                continue
+
+            if resp.is_success:
+                self.limiter.succeeded(bucket)
+                return (resp.json() if resp.content else {}), attempt
+
+            if is_quota_exceeded_response(resp.status_code, resp.text):
+                # Retrying won't help until the daily reset
+                if self.quota:
+                    await self.quota.exhaust()
+                raise QuotaExhausted("YouTube Data API daily quota exceeded")
+            throttled = is_rate_limit_response(resp.status_code, resp.text)
+            if throttled:
+                self.limiter.throttled(bucket, _retry_after(resp))
+            if attempt > self.retries or not (throttled or resp.status_code in TRANSIENT_STATUS):
+                raise DataAPIError(resp.status_code, resp.text, attempt)
+            await self._sleep(attempt)
+
+    async def _sleep(self, attempt: int):
+        delay = self.backoff * 2 ** (attempt - 1)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    # ── Playlists ──
+
+    async def create_playlist(
+        self, headers: dict, title: str, description: str, privacy: str = "private"
+    ) -> str:
+        data, _ = await self.request(
+            "playlists", "POST", "/playlists", headers,
+            params={"part": "snippet,status"},
+            json={
+                "snippet": {"title": title, "description": description},
+                "status": {"privacyStatus": privacy},
+            },
+        )
+        return data["id"]
+
+    async def find_playlist(self, headers: dict, marker: str) -> str | None:
+        """Id of the user's first playlist whose description contains `marker`."""
+        page_token = None
+        while True:
+            params = {"part": "snippet", "mine": "true", "maxResults": 50}
+            if page_token:
+                params["pageToken"] = page_token
+            data, _ = await self.request("playlists", "GET", "/playlists", headers, params=params)
+            for playlist in data.get("items", []):
+                if marker in playlist["snippet"].get("description", ""):
+                    return playlist["id"]
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return None
+
+    # ── Items ──
+
+    async def insert_item(
+        self, headers: dict, playlist_id: str, video_id: str, position: int | None = None
+    ) -> tuple[dict, int]:
+        snippet = {
+            "playlistId": playlist_id,
+            "resourceId": {"kind": "youtube#video", "videoId": video_id},
+        }
+        if position is not None:
+            snippet["position"] = position
+        with stage("playlist_insert"):
+            return await self.request(
+                "playlist_items", "POST", "/playlistItems", headers,
+                params={"part": "snippet"}, json={"snippet": snippet},
+            )
+
+    async def move_item(
+        self, headers: dict, playlist_id: str, item_id: str, video_id: str, position: int
+    ):
+        await self.request(
+            "playlist_items", "PUT", "/playlistItems", headers,
+            params={"part": "snippet"},
+            json={
+                "id": item_id,
+                "snippet": {
+                    "playlistId": playlist_id,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                    "position": position,
+                },
+            },
+        )
+
+    async def delete_item(self, headers: dict, item_id: str):
+        await self.request("playlist_items", "DELETE", "/playlistItems", headers, params={"id": item_id})
+
+    async def list_items(self, headers: dict, playlist_id: str) -> list[dict]:
+        """All items in playlist order: [{id, videoId}]."""
+        items = []
+        page_token = None
+        while True:
+            params = {"part": "snippet", "playlistId": playlist_id, "maxResults": 50}
+            if page_token:
+                params["pageToken"] = page_token
+            data, _ = await self.request("playlist_items", "GET", "/playlistItems", headers, params=params)
+            for item in data.get("items", []):
+                items.append({
+                    "id": item["id"],
+                    "videoId": item["snippet"]["resourceId"]["videoId"],
+                })
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return items
+
+    async def reorder(self, headers: dict, playlist_id: str, item_ids: list[str]) -> int:
+        """Move items so they appear in `item_ids` order. Returns moves made.
+
+        Items on the longest already-ordered run stay put; every other
+        item is moved right after its predecessor.
+        """
+        current = await self.list_items(headers, playlist_id)
+        video_of = {item["id"]: item["videoId"] for item in current}
+        item_ids = [i for i in item_ids if i in video_of]
+        rank = {item_id: r for r, item_id in enumerate(item_ids)}
+        order = [item["id"] for item in current]
+
+        keep = set(longest_increasing_run([i for i in order if i in rank], rank))
+        moves = 0
+        for r, item_id in enumerate(item_ids):
+            if item_id in keep:
+                continue
+            order.remove(item_id)
+            position = order.index(item_ids[r - 1]) + 1 if r > 0 else 0
+            order.insert(position, item_id)
+            await self.move_item(headers, playlist_id, item_id, video_of[item_id], position)
+            moves += 1
+        return moves
+
+
+def longest_increasing_run(order: list[str], rank: dict[str, int]) -> list[str]:
+    """Longest subsequence of `order` whose ranks increase (patience sorting)."""
+    tails: list[int] = []  # index into order of the smallest tail per length
+    prev = [-1] * len(order)
+    for i, item in enumerate(order):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rank[order[tails[mid]]] < rank[item]:
+                lo = mid + 1
+            else:
+                hi = mid
+        prev[i] = tails[lo - 1] if lo > 0 else -1
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+
+    run = []
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        run.append(order[i])
+        i = prev[i]
+    return run[::-1]
@@ -0,0 +1,591 @@
+"""
+CrateDig — resumable playlist pushes
+Every /create-playlist push is a plan in Postgres: the target playlist,
+then one row per track, checkpointed as each insert lands. A push that
+runs out of Data API quota (or dies with the process) picks up where it
+stopped, on request or automatically once the quota resets. A push into
+an existing playlist (sync) only sends the inserts, deletes and moves
+that turn its current items into the new list.
+"""
+
+import asyncio
+import uuid
+from collections import defaultdict, deque
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from cache import SingleFlight
+from metrics import stage
+from playlists import DataAPIError, PlaylistWriter, longest_increasing_run
+from quota import NEXT_RESET, QuotaExhausted, tally
+
+PUSH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlist_pushes (
+  id UUID PRIMARY KEY,
+  title TEXT NOT NULL,
+  playlist_id TEXT,
+  status TEXT NOT NULL DEFAULT 'pending',
+  runs INTEGER NOT NULL DEFAULT 0,
+  quota_used INTEGER NOT NULL DEFAULT 0,
+  reordered INTEGER,
+  error TEXT,
+  resume_after TIMESTAMPTZ,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS playlist_pushes_status_idx ON playlist_pushes (status, resume_after);
+CREATE TABLE IF NOT EXISTS playlist_push_items (
+  push_id UUID NOT NULL REFERENCES playlist_pushes(id) ON DELETE CASCADE,
+  position INTEGER NOT NULL,
+  video_id TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  item_id TEXT,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  PRIMARY KEY (push_id, position)
+);
+-- Sync pushes update playlist_id in place instead of creating a playlist
+ALTER TABLE playlist_pushes ADD COLUMN IF NOT EXISTS sync BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE playlist_pushes ADD COLUMN IF NOT EXISTS deleted INTEGER NOT NULL DEFAULT 0;
+"""
+
+# Any push not yet done can be (re)run; a second claim counts as a resume.
+# A sync counts its moves from the first run on, like its deletes
+_CLAIM = """
+UPDATE playlist_pushes
+SET status = 'running', runs = runs + 1, error = NULL, resume_after = NULL, updated_at = NOW(),
+    reordered = CASE WHEN sync THEN COALESCE(reordered, 0) ELSE reordered END
+WHERE id = $1 AND status <> 'done'
+RETURNING title, playlist_id, sync, runs, reordered
+"""
+
+# Items that failed last time are tried again on every run; retried
+# items land at the end of a created playlist, so it is reordered again
+_RETRY = """
+WITH retried AS (
+  UPDATE playlist_push_items SET status = 'pending', error = NULL
+  WHERE push_id = $1 AND status = 'failed'
+  RETURNING 1
+), reorder AS (
+  UPDATE playlist_pushes SET reordered = NULL
+  WHERE id = $1 AND NOT sync AND EXISTS (SELECT 1 FROM retried)
+)
+SELECT COUNT(*) FROM retried
+"""
+
+_CHECKPOINT = """
+WITH item AS (
+  UPDATE playlist_push_items SET status = $3, item_id = $4, attempts = attempts + $5, error = $6
+  WHERE push_id = $1 AND position = $2
+)
+UPDATE playlist_pushes SET quota_used = quota_used + $7, updated_at = NOW() WHERE id = $1
+"""
+
+_PAUSE = f"""
+UPDATE playlist_pushes
+SET status = 'paused', error = $2, quota_used = quota_used + $3,
+    resume_after = {NEXT_RESET}, updated_at = NOW()
+WHERE id = $1
+"""
+
+# Progress callback: {push_id, playlist_id, items_done, items_total}
+Progress = Callable[[dict], None]
+# Authorization headers for Data API calls
+Auth = Callable[[], Awaitable[dict]]
+
+MARKER = "push {}"
+
+
+class PlaylistPusher:
+    """Runs push plans: create the playlist once, insert, reorder.
+
+    A push is created once per id (`create` ignores ids it has seen) and
+    run through `run`, which can be called again at any time: runs of the
+    same push share one task, and a rerun does only what is left. A push
+    that runs out of quota is paused until the next quota day; with
+    `resume_interval` > 0 a background loop resumes it then, as well as
+    pushes a previous process left running. A run that leaves items it
+    could not add ends as 'failed'; the next run tries them again.
+
+    Two steps can't be checkpointed before the API call returns, so a
+    rerun reconciles them first: the playlist is found again by the push
+    id in its description, and items inserted but not yet recorded are
+    adopted from a list of the playlist instead of being inserted twice.
+    Sync pushes reconcile the same way on every run, which is also how
+    they diff against the playlist's current items.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        writer: PlaylistWriter,
+        auth: Auth,
+        resume_interval: float = 0,
+    ):
+        self.pool = pool
+        self.writer = writer
+        self.auth = auth
+        self.resume_interval = resume_interval
+        self._flight = SingleFlight()
+        self._task: asyncio.Task | None = None
+        self.paused = 0
+        self.resumed = 0
+        self.adopted = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(PUSH_SCHEMA)
+
+    async def start(self):
+        if self.resume_interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _loop(self):
+        # Pushes left running by a previous process are due straight away
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE playlist_pushes SET status = 'paused', resume_after = NOW()
+                WHERE status IN ('pending', 'running')
+                """
+            )
+        while True:
+            try:
+                await self.resume_due()
+            except Exception as e:
+                print(f"Resuming paused pushes failed: {e}")
+            await asyncio.sleep(self.resume_interval)
+
+    async def resume_due(self):
+        """Run paused pushes whose quota day has come round, oldest first."""
+        async with self.pool.acquire() as conn:
+            due = await conn.fetch(
+                """
+                SELECT id FROM playlist_pushes
+                WHERE status = 'paused' AND resume_after <= NOW()
+                ORDER BY created_at
+                """
+            )
+        for row in due:
+            try:
+                result = await self.run(str(row["id"]))
+            except Exception as e:
+                print(f"Resuming push {row['id']} failed: {getattr(e, 'detail', e)}")
+                continue
+            self.resumed += 1
+            if result["status"] == "paused":
+                return  # Still no quota; the rest wait for the reset too
+
+    # ── Plans ──
+
+    async def create(
+        self, push_id: str, title: str, video_ids: list[str], playlist_id: str | None = None
+    ) -> bool:
+        """Store a new plan. False if `push_id` already exists (it is left as is).
+
+        With `playlist_id`, the push syncs that playlist to `video_ids`.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                created = await conn.fetchval(
+                    """
+                    INSERT INTO playlist_pushes (id, title, playlist_id, sync) VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING true
+                    """,
+                    uuid.UUID(push_id), title, playlist_id, playlist_id is not None,
+                )
+                if created:
+                    await conn.execute(
+                        """
+                        INSERT INTO playlist_push_items (push_id, position, video_id)
+                        SELECT $1, p - 1, v FROM unnest($2::text[]) WITH ORDINALITY AS t(v, p)
+                        """,
+                        uuid.UUID(push_id), video_ids,
+                    )
+        return bool(created)
+
+    async def get(self, push_id: str) -> dict | None:
+        """The push as /create-playlist reports it, or None if unknown."""
+        async with self.pool.acquire() as conn:
+            push = await conn.fetchrow(
+                """
+                SELECT playlist_id, sync, status, runs, quota_used, reordered, deleted, error, resume_after
+                FROM playlist_pushes WHERE id = $1
+                """,
+                uuid.UUID(push_id),
+            )
+            if push is None:
+                return None
+            rows = await conn.fetch(
+                """
+                SELECT position, video_id, status, item_id, attempts, error
+                FROM playlist_push_items WHERE push_id = $1 ORDER BY position
+                """,
+                uuid.UUID(push_id),
+            )
+
+        items = []
+        for row in rows:
+            item = {"index": row["position"], "videoId": row["video_id"], "status": row["status"]}
+            if row["status"] == "added":
+                item.update(itemId=row["item_id"], attempts=row["attempts"])
+            elif row["status"] == "failed":
+                item.update(error=row["error"], attempts=row["attempts"])
+            items.append(item)
+        added = sum(item["status"] == "added" for item in items)
+        failed = sum(item["status"] == "failed" for item in items)
+        playlist_id = push["playlist_id"]
+        return {
+            "push_id": push_id,
+            "status": push["status"],
+            "mode": "sync" if push["sync"] else "create",
+            "playlist_id": playlist_id,
+            "url": f"https://music.youtube.com/playlist?list={playlist_id}" if playlist_id else None,
+            "track_count": added,
+            "failed_count": failed,
+            "pending_count": len(items) - added - failed,
+            "reordered": push["reordered"],
+            "deleted": push["deleted"],
+            "runs": push["runs"],
+            "quota_used": push["quota_used"],
+            "error": push["error"],
+            "resume_after": push["resume_after"].isoformat() if push["resume_after"] else None,
+            "items": items,
+        }
+
+    # ── Running ──
+
+    async def run(self, push_id: str, progress: Progress | None = None) -> dict:
+        """Run (or resume) a push; returns its report. Done pushes return as is."""
+        return await self._flight.do(push_id, lambda: self._run(push_id, progress))
+
+    async def _run(self, push_id: str, progress: Progress | None) -> dict:
+        async with self.pool.acquire() as conn:
+            push = await conn.fetchrow(_CLAIM, uuid.UUID(push_id))
+            if push is None:
+                return await self.get(push_id)
+            push = dict(push)
+            if await conn.fetchval(_RETRY, uuid.UUID(push_id)):
+                push["reordered"] = None
+
+        with tally() as spent:
+            try:
+                await self._push(push_id, push, spent, progress)
+            except QuotaExhausted as e:
+                self.paused += 1
+                async with self.pool.acquire() as conn:
+                    await conn.execute(_PAUSE, uuid.UUID(push_id), str(e), self._take(spent))
+            except Exception as e:
+                # HTTPException carries its message in .detail
+                error = str(getattr(e, "detail", "") or e) or type(e).__name__
+                await self._finish(push_id, "failed", self._take(spent), error)
+                raise
+        return await self.get(push_id)
+
+    async def _push(self, push_id: str, push: dict, spent: list[int], progress: Progress | None):
+        headers = await self.auth()
+        if push["sync"]:
+            await self._sync(push_id, headers, push["playlist_id"], spent, progress)
+            await self._complete(push_id, spent)
+            return
+        resuming = push["runs"] > 1
+
+        # Step 1: The playlist, created at most once
+        playlist_id = push["playlist_id"]
+        if playlist_id is None:
+            marker = MARKER.format(push_id)
+            if resuming:
+                playlist_id = await self.writer.find_playlist(headers, marker)
+            if playlist_id is None:
+                playlist_id = await self.writer.create_playlist(
+                    headers, push["title"], f"Auto-generated by CrateDig ({marker})"
+                )
+            async with self.pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE playlist_pushes SET playlist_id = $2, quota_used = quota_used + $3, updated_at = NOW()
+                    WHERE id = $1
+                    """,
+                    uuid.UUID(push_id), playlist_id, self._take(spent),
+                )
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT position, video_id, status, item_id
+                FROM playlist_push_items WHERE push_id = $1 ORDER BY position
+                """,
+                uuid.UUID(push_id),
+            )
+        pending = [r for r in rows if r["status"] == "pending"]
+        total = len(rows)
+        done = total - len(pending)
+
+        # Step 2: Adopt items a previous run inserted but never recorded
+        if resuming and pending:
+            current = await self.writer.list_items(headers, playlist_id)
+            adopted = await self._adopt(push_id, current, rows, spent)
+            pending = [r for r in pending if r["position"] not in adopted]
+            done = total - len(pending)
+
+        # Step 3: Insert what is left, checkpointing each item
+        out_of_quota: QuotaExhausted | None = None
+        sem = asyncio.Semaphore(self.writer.concurrency)
+
+        async def add(row: asyncpg.Record):
+            nonlocal done, out_of_quota
+            async with sem:
+                if out_of_quota:
+                    return
+                try:
+                    data, attempts = await self.writer.insert_item(headers, playlist_id, row["video_id"])
+                    outcome = ("added", data.get("id"), attempts, None)
+                except QuotaExhausted as e:
+                    out_of_quota = e
+                    return
+                except DataAPIError as e:
+                    outcome = ("failed", None, e.attempts, str(e))
+                async with self.pool.acquire() as conn:
+                    await conn.execute(
+                        _CHECKPOINT, uuid.UUID(push_id), row["position"], *outcome, self._take(spent)
+                    )
+            done += 1
+            if progress:
+                progress({"push_id": push_id, "playlist_id": playlist_id, "items_done": done, "items_total": total})
+
+        await asyncio.gather(*(add(row) for row in pending))
+        if out_of_quota:
+            raise out_of_quota
+
+        # Step 4: Fix up any out-of-order items
+        reordered = push["reordered"]
+        if reordered is None:
+            async with self.pool.acquire() as conn:
+                added = await conn.fetch(
+                    """
+                    SELECT item_id FROM playlist_push_items
+                    WHERE push_id = $1 AND status = 'added' ORDER BY position
+                    """,
+                    uuid.UUID(push_id),
+                )
+            reordered = 0
+            # Sequential first runs insert in order; reruns may have retried items
+            if (self.writer.concurrency > 1 or resuming) and len(added) > 1:
+                try:
+                    with stage("playlist_reorder"):
+                        reordered = await self.writer.reorder(
+                            headers, playlist_id, [r["item_id"] for r in added]
+                        )
+                except DataAPIError as e:
+                    print(f"Reorder failed for playlist {playlist_id}: {e}")
+                    reordered = None
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE playlist_pushes SET reordered = $2 WHERE id = $1", uuid.UUID(push_id), reordered
+            )
+        await self._complete(push_id, spent)
+
+    async def _sync(
+        self, push_id: str, headers: dict, playlist_id: str, spent: list[int], progress: Progress | None
+    ):
+        """Turn the playlist's current items into the planned list.
+
+        Current items are matched to rows by videoId (recorded item ids
+        first), unmatched items are deleted, and the rows are then placed
+        in order: each missing one is inserted right after its predecessor,
+        and of the matched ones only those off the longest already-ordered
+        run are moved. Everything is re-derived from the live playlist, so
+        a rerun repeats nothing that already happened. Rows that failed on
+        an earlier run are pending again by now, so an insert that landed
+        despite its error is adopted rather than deleted.
+        """
+        current = await self.writer.list_items(headers, playlist_id)
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT position, video_id, status, item_id
+                FROM playlist_push_items WHERE push_id = $1 ORDER BY position
+                """,
+                uuid.UUID(push_id),
+            )
+            # Recorded items someone removed from the playlist since are due again
+            present = [item["id"] for item in current]
+            await conn.execute(
+                """
+                UPDATE playlist_push_items SET status = 'pending', item_id = NULL
+                WHERE push_id = $1 AND status = 'added' AND NOT item_id = ANY($2::text[])
+                """,
+                uuid.UUID(push_id), present,
+            )
+        present = set(present)
+        rows = [
+            {**r, "status": "pending", "item_id": None}
+            if r["status"] == "added" and r["item_id"] not in present else dict(r)
+            for r in rows
+        ]
+        adopted = await self._adopt(push_id, current, rows, spent)
+        total = len(rows)
+        done = sum(r["status"] != "pending" for r in rows) + len(adopted)
+        if progress:
+            progress({"push_id": push_id, "playlist_id": playlist_id, "items_done": done, "items_total": total})
+
+        # Deletes: whatever no row claims
+        wanted = {r["item_id"] for r in rows if r["item_id"]} | set(adopted.values())
+        extra = [item["id"] for item in current if item["id"] not in wanted]
+        failure: Exception | None = None
+        sem = asyncio.Semaphore(self.writer.concurrency)
+
+        async def delete(item_id: str):
+            nonlocal failure
+            async with sem:
+                if failure:
+                    return
+                try:
+                    await self.writer.delete_item(headers, item_id)
+                except (DataAPIError, QuotaExhausted) as e:
+                    # 404: already gone (an earlier attempt landed after all)
+                    if getattr(e, "status_code", None) != 404:
+                        failure = e
+                        return
+                await self._count(push_id, "deleted", self._take(spent))
+
+        await asyncio.gather(*(delete(item_id) for item_id in extra))
+        if failure:
+            # Placement assumes the deletes happened
+            raise failure
+
+        # Placement: one ordered pass over the rows
+        item_of = {r["position"]: r["item_id"] for r in rows if r["item_id"]}
+        item_of.update(adopted)
+        video_of = {item["id"]: item["videoId"] for item in current}
+        order = [item["id"] for item in current if item["id"] in wanted]
+        rank = {item_id: position for position, item_id in item_of.items()}
+        keep = set(longest_increasing_run(order, rank))
+        prev = None
+        for row in rows:
+            position = order.index(prev) + 1 if prev else 0
+            item_id = item_of.get(row["position"])
+            if item_id is None:
+                try:
+                    data, attempts = await self.writer.insert_item(
+                        headers, playlist_id, row["video_id"], position
+                    )
+                    outcome = ("added", data.get("id"), attempts, None)
+                except DataAPIError as e:
+                    outcome = ("failed", None, e.attempts, str(e))
+                async with self.pool.acquire() as conn:
+                    await conn.execute(
+                        _CHECKPOINT, uuid.UUID(push_id), row["position"], *outcome, self._take(spent)
+                    )
+                done += 1
+                if progress:
+                    progress({"push_id": push_id, "playlist_id": playlist_id, "items_done": done, "items_total": total})
+                item_id = outcome[1]
+                if item_id is None:
+                    continue
+                order.insert(position, item_id)
+            elif item_id not in keep:
+                order.remove(item_id)
+                position = order.index(prev) + 1 if prev else 0
+                order.insert(position, item_id)
+                await self.writer.move_item(headers, playlist_id, item_id, video_of[item_id], position)
+                await self._count(push_id, "reordered", self._take(spent))
+            prev = item_id
+
+    async def _adopt(
+        self, push_id: str, current: list[dict], rows: list, spent: list[int]
+    ) -> dict[int, str]:
+        """Match unrecorded items of `current` (the listed playlist) to rows
+        not yet added (pending, or failed though the insert landed) by
+        videoId and record them as added. Returns {position: item id}.
+        """
+        known = {r["item_id"] for r in rows if r["item_id"]}
+        spare: dict[str, deque[str]] = defaultdict(deque)
+        for item in current:
+            if item["id"] not in known:
+                spare[item["videoId"]].append(item["id"])
+
+        adopted = {
+            row["position"]: spare[row["video_id"]].popleft()
+            for row in rows
+            if row["status"] != "added" and spare.get(row["video_id"])
+        }
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE playlist_push_items i SET status = 'added', item_id = a.item_id
+                FROM unnest($2::int[], $3::text[]) AS a(position, item_id)
+                WHERE i.push_id = $1 AND i.position = a.position
+                """,
+                uuid.UUID(push_id), list(adopted), list(adopted.values()),
+            )
+            await conn.execute(
+                "UPDATE playlist_pushes SET quota_used = quota_used + $2 WHERE id = $1",
+                uuid.UUID(push_id), self._take(spent),
+            )
+        self.adopted += len(adopted)
+        return adopted
+
+    async def _count(self, push_id: str, column: str, units: int):
+        """Add one to a push's `deleted` or `reordered` count."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                f"""
+                UPDATE playlist_pushes
+                SET {column} = COALESCE({column}, 0) + 1, quota_used = quota_used + $2, updated_at = NOW()
+                WHERE id = $1
+                """,
+                uuid.UUID(push_id), units,
+            )
+
+    @staticmethod
+    def _take(spent: list[int]) -> int:
+        """Units spent since the last write, for the next quota_used update."""
+        units, spent[0] = spent[0], 0
+        return units
+
+    async def _complete(self, push_id: str, spent: list[int]):
+        """End a run that got through its plan: done, or failed if some items
+        could not be added (a rerun retries them)."""
+        async with self.pool.acquire() as conn:
+            failed, total = await conn.fetchrow(
+                """
+                SELECT COUNT(*) FILTER (WHERE status = 'failed'), COUNT(*)
+                FROM playlist_push_items WHERE push_id = $1
+                """,
+                uuid.UUID(push_id),
+            )
+        if failed:
+            await self._finish(
+                push_id, "failed", self._take(spent), f"{failed} of {total} items failed; resume to retry"
+            )
+        else:
+            await self._finish(push_id, "done", self._take(spent), None)
+
+    async def _finish(self, push_id: str, status: str, units: int, error: str | None):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE playlist_pushes
+                SET status = $2, quota_used = quota_used + $3, error = $4, updated_at = NOW()
+                WHERE id = $1
+                """,
+                uuid.UUID(push_id), status, units, error,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "running": self._flight.stats()["in_flight"],
+            "auto_resume": self._task is not None and not self._task.done(),
+            "paused": self.paused,
+            "resumed": self.resumed,
+            "adopted_items": self.adopted,
+        }
@@ -0,0 +1,110 @@
+"""
+CrateDig — Data API quota
+Daily YouTube Data API v3 quota units spent by playlist writes, counted in
+Postgres so every push (and every restart) draws on the same budget.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import asyncpg
+
+QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS youtube_quota (
+  day DATE PRIMARY KEY,
+  units INTEGER NOT NULL
+)
+"""
+
+# Quota units per call, by (rate-limit bucket, method); reads cost 1
+COSTS = {
+    ("playlists", "POST"): 50,
+    ("playlist_items", "POST"): 50,
+    ("playlist_items", "PUT"): 50,
+    ("playlist_items", "DELETE"): 50,
+}
+
+# The quota day, and when the next one starts (midnight Pacific Time)
+QUOTA_DAY = "(NOW() AT TIME ZONE 'America/Los_Angeles')::date"
+NEXT_RESET = f"(({QUOTA_DAY} + 1)::timestamp AT TIME ZONE 'America/Los_Angeles')"
+
+# Take units from today's budget; no row back = not enough left
+_SPEND = f"""
+INSERT INTO youtube_quota (day, units) VALUES ({QUOTA_DAY}, $2)
+ON CONFLICT (day) DO UPDATE SET units = youtube_quota.units + $2
+WHERE $1 <= 0 OR youtube_quota.units + $2 <= $1
+RETURNING units
+"""
+
+# The API said the day's quota is gone (other clients share the project)
+_EXHAUST = f"""
+INSERT INTO youtube_quota (day, units) VALUES ({QUOTA_DAY}, $1)
+ON CONFLICT (day) DO UPDATE SET units = GREATEST(youtube_quota.units, $1)
+"""
+
+
+class QuotaExhausted(Exception):
+    """The day's Data API quota is spent; writes can resume after the reset."""
+
+
+# Units spent by the current push, if any. Tasks it starts share the list.
+_tally: ContextVar[list[int] | None] = ContextVar("quota_tally", default=None)
+
+
+@contextmanager
+def tally():
+    """Count the units spent inside the block; yields a one-item list."""
+    spent = [0]
+    token = _tally.set(spent)
+    try:
+        yield spent
+    finally:
+        _tally.reset(token)
+
+
+class QuotaLedger:
+    """Per-day quota budget (`daily_units`, 0 = uncapped).
+
+    Units are taken before each call is sent, retries included, since
+    the API charges for failed requests too.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, daily_units: int):
+        self.pool = pool
+        self.daily_units = daily_units
+        self.used_today = 0
+        self.spent = 0
+        self.refused = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(QUOTA_SCHEMA)
+
+    async def spend(self, units: int):
+        async with self.pool.acquire() as conn:
+            used = await conn.fetchval(_SPEND, self.daily_units, units)
+        if used is None:
+            self.refused += 1
+            self.used_today = self.daily_units
+            raise QuotaExhausted(f"Daily Data API quota of {self.daily_units} units is spent")
+        self.used_today = used
+        self.spent += units
+        spent = _tally.get()
+        if spent is not None:
+            spent[0] += units
+
+    async def exhaust(self):
+        """Mark today's budget as spent after a quotaExceeded response."""
+        self.refused += 1
+        if self.daily_units > 0:
+            async with self.pool.acquire() as conn:
+                await conn.execute(_EXHAUST, self.daily_units)
+            self.used_today = self.daily_units
+
+    def stats(self) -> dict:
+        return {
+            "budget": self.daily_units,
+            "used_today": self.used_today,
+            "spent": self.spent,
+            "refused": self.refused,
+        }
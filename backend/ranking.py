@@ -0,0 +1,65 @@
+"""
+CrateDig — candidate ranking
+Scores roll candidates across all seeds' radio lists and picks the top N
+with a per-artist cap.
+"""
+
+import numpy as np
+
+from normalize import norm
+
+# Score = COOC_WEIGHT · seeds recommending the track
+#       + POSITION_WEIGHT · mean position credit (1 at the top of a radio list, →0 at the bottom)
+#       + DIVERSITY_WEIGHT / candidates by the same artist
+COOC_WEIGHT = 1.0
+POSITION_WEIGHT = 0.5
+DIVERSITY_WEIGHT = 0.25
+
+
+def score_tracks(candidates: list[dict], lists: list[list[dict]]) -> tuple[np.ndarray, np.ndarray]:
+    """(scores, artist codes) for `candidates`, from every radio list they appear in."""
+    index = {t["videoId"]: i for i, t in enumerate(candidates)}
+    ids, credit = [], []
+    for tracks in lists:
+        for rank, t in enumerate(tracks):
+            i = index.get(t["videoId"])
+            if i is not None:
+                ids.append(i)
+                credit.append(1.0 - rank / len(tracks))
+
+    n = len(candidates)
+    ids = np.array(ids, dtype=np.intp)
+    cooc = np.bincount(ids, minlength=n).astype(np.float64)
+    position = np.bincount(ids, weights=np.array(credit, dtype=np.float64), minlength=n)
+    position = np.divide(position, cooc, out=np.zeros(n), where=cooc > 0)
+
+    _, artist = np.unique(np.array([norm(t["artist"]) for t in candidates], dtype=str), return_inverse=True)
+    by_artist = np.bincount(artist, minlength=n)[artist]
+
+    scores = COOC_WEIGHT * cooc + POSITION_WEIGHT * position + DIVERSITY_WEIGHT / np.maximum(by_artist, 1)
+    return scores, artist
+
+
+def top_tracks(
+    candidates: list[dict], lists: list[list[dict]], limit: int, artist_cap: int
+) -> list[dict]:
+    """The `limit` best candidates, at most `artist_cap` per artist.
+
+    Ties keep candidate order. The cap is only relaxed when there are
+    not enough other tracks to reach `limit`.
+    """
+    if not candidates:
+        return []
+    scores, artist = score_tracks(candidates, lists)
+    n = len(candidates)
+
+    # Rank within each artist: group by artist, best score first
+    by_artist = np.lexsort((np.arange(n), -scores, artist))
+    sorted_artist = artist[by_artist]
+    starts = np.flatnonzero(np.r_[True, sorted_artist[1:] != sorted_artist[:-1]])
+    group_rank = np.empty(n, dtype=np.intp)
+    group_rank[by_artist] = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+
+    # Within the cap first, then the overflow; best score first in each
+    order = np.lexsort((np.arange(n), -scores, group_rank >= max(artist_cap, 1)))
+    return [candidates[i] for i in order[:limit]]
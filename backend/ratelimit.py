@@ -0,0 +1,166 @@
+"""
+CrateDig — outbound rate limiting
+Token buckets per Google endpoint, with adaptive back-off on 429/quota errors.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from metrics import observe_wait
+
+
+# ── Error classification ─────────────────────────────────────────────
+
+_QUOTA_REASONS = ("quotaExceeded", "rateLimitExceeded", "userRateLimitExceeded")
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True if a ytmusicapi/requests exception looks like throttling."""
+    msg = str(exc)
+    return "429" in msg or "quota" in msg.lower() or "rate limit" in msg.lower()
+
+
+def is_rate_limit_response(status_code: int, body: str) -> bool:
+    """True if a YouTube Data API response signals throttling or quota exhaustion."""
+    if status_code == 429:
+        return True
+    return status_code == 403 and any(r in body for r in _QUOTA_REASONS)
+
+
+def is_quota_exceeded_response(status_code: int, body: str) -> bool:
+    """True if the project's daily Data API quota is spent (not just throttled)."""
+    return status_code == 403 and "quotaExceeded" in body
+
+
+# ── Token bucket ─────────────────────────────────────────────────────
+
+
+class TokenBucket:
+    """Reservation-style token bucket.
+
+    `reserve()` always takes a token and returns how long the caller must
+    wait for it, so waiters are served in arrival order without polling.
+    The refill rate halves on every throttle signal and creeps back up on
+    successes (AIMD), never going above the configured rate.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, min_rate: float | None = None):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token; return seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate, self.blocked_until - now)
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+            return wait
+
+    def penalize(self, retry_after: float | None = None):
+        """Back off after a 429/quota error."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+    def reward(self):
+        """Recover rate after a successful call."""
+        with self._lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "base_rate": self.base_rate,
+                "burst": self.burst,
+                "tokens": round(self.tokens, 2),
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "throttled": self.throttled,
+            }
+
+
+# ── Limiter ──────────────────────────────────────────────────────────
+
+
+class RateLimiter:
+    """Named token buckets shared by every outbound call in the process."""
+
+    def __init__(self, buckets: dict[str, TokenBucket]):
+        self.buckets = buckets
+
+    async def acquire(self, name: str) -> float:
+        """Wait (without blocking the loop) for a token; return seconds waited."""
+        wait = self.buckets[name].reserve()
+        observe_wait(name, wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def acquire_sync(self, name: str) -> float:
+        """Blocking variant for scripts and worker threads."""
+        wait = self.buckets[name].reserve()
+        observe_wait(name, wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self, name: str, retry_after: float | None = None):
+        self.buckets[name].penalize(retry_after)
+
+    def succeeded(self, name: str):
+        self.buckets[name].reward()
+
+    def stats(self) -> dict:
+        return {name: b.stats() for name, b in self.buckets.items()}
+
+
+def bucket_from_env(name: str, rate: float, burst: int) -> TokenBucket:
+    """Build a bucket, overridable via RATE_<NAME> (calls/s) and BURST_<NAME>."""
+    key = name.upper()
+    return TokenBucket(
+        name,
+        rate=float(os.environ.get(f"RATE_{key}", rate)),
+        burst=int(os.environ.get(f"BURST_{key}", burst)),
+    )
+
+
+def default_limiter() -> RateLimiter:
+    """Buckets for the YouTube Music and Data API endpoints CrateDig calls."""
+    return RateLimiter({
+        "search": bucket_from_env("search", rate=2.0, burst=4),
+        "watch": bucket_from_env("watch", rate=2.0, burst=4),
+        "playlists": bucket_from_env("playlists", rate=1.0, burst=2),
+        "playlist_items": bucket_from_env("playlist_items", rate=5.0, burst=10),
+    })
@@ -0,0 +1,254 @@
+"""
+CrateDig — library pre-resolution
+Background worker that resolves library songs to videoIds between rolls,
+so a roll finds its seeds in the seed cache and only needs the radio call.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from cache import SeedCache
+from library import LibraryStore
+from normalize import song_key
+
+RESOLVER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolver_usage (
+  day DATE PRIMARY KEY,
+  searches INTEGER NOT NULL
+)
+"""
+
+# Songs without a live seed_resolutions entry (none, or past its TTL), in library order
+_PENDING = """
+SELECT s.position, s.artist, s.title
+FROM library_songs s
+LEFT JOIN seed_resolutions r ON r.key = s.artist_key || '|' || s.title_key
+WHERE s.library_id = $1
+  AND (r.key IS NULL OR r.resolved_at <= NOW() - make_interval(
+    secs => CASE WHEN r.video_id IS NULL THEN $3::float8 ELSE $2::float8 END))
+ORDER BY s.position
+LIMIT $4
+"""
+
+# Align unresolvable flags with the seed cache, including misses found by rolls
+_SYNC_FLAGS = """
+UPDATE library_songs s SET unresolvable = (r.video_id IS NULL)
+FROM seed_resolutions r
+WHERE s.library_id = $1 AND r.key = s.artist_key || '|' || s.title_key
+  AND s.unresolvable IS DISTINCT FROM (r.video_id IS NULL)
+RETURNING s.position, s.unresolvable
+"""
+
+_COUNTS = """
+SELECT COUNT(*) AS songs,
+       COUNT(r.video_id) AS resolved,
+       COUNT(*) FILTER (WHERE s.unresolvable) AS unresolvable
+FROM library_songs s
+LEFT JOIN seed_resolutions r ON r.key = s.artist_key || '|' || s.title_key
+WHERE s.library_id = $1
+"""
+
+_USED = """
+SELECT COALESCE((SELECT searches FROM resolver_usage WHERE day = (NOW() AT TIME ZONE 'UTC')::date), 0)
+"""
+
+# Count one search against today's budget (UTC day)
+_SPEND = """
+INSERT INTO resolver_usage (day, searches) VALUES ((NOW() AT TIME ZONE 'UTC')::date, 1)
+ON CONFLICT (day) DO UPDATE SET searches = resolver_usage.searches + 1
+RETURNING searches
+"""
+
+# Longest wait before a song whose search failed is tried again
+MAX_BACKOFF = 86400
+
+# Searches YouTube Music for (artist, title) and records the result in the seed cache
+Search = Callable[[str, str], Awaitable[str | None]]
+# Whether YouTube is connected with a usable token
+Ready = Callable[[], Awaitable[bool]]
+# (library id, positions, flags) for songs whose unresolvable flag changed
+OnFlags = Callable[[str, list[int], list[bool]], None]
+
+
+class LibraryResolver:
+    """Resolves the current library's songs to videoIds in the background.
+
+    At most one song every `interval` seconds, only once no roll has
+    started for `idle_after` seconds, and at most `daily_budget` searches
+    per UTC day (counted in Postgres, so restarts don't reset it).
+
+    Progress needs no bookkeeping of its own: the next songs are always
+    those without a live seed cache entry, so a restart picks up where
+    the last run stopped and expired entries come round again. Songs the
+    search finds nothing for are flagged unresolvable for dice draws.
+
+    Nothing is searched (or charged) while `ready()` is false. A search
+    that raises still counts against the budget; its song is set aside
+    for `interval` * 2^attempts seconds (up to MAX_BACKOFF) so it does
+    not block the songs behind it.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        store: LibraryStore,
+        seed_cache: SeedCache,
+        search: Search,
+        daily_budget: int,
+        interval: float,
+        idle_after: float,
+        on_flags: OnFlags | None = None,
+        ready: Ready | None = None,
+        batch: int = 50,
+    ):
+        self.pool = pool
+        self.store = store
+        self.seed_cache = seed_cache
+        self.search = search
+        self.daily_budget = daily_budget
+        self.interval = interval
+        self.idle_after = idle_after
+        self.on_flags = on_flags
+        self.ready = ready
+        self.batch = batch
+        self._library_id: str | None = None
+        self._queue: deque[asyncpg.Record] = deque()
+        # song key -> (failed attempts, monotonic time it may be retried)
+        self._backoff: dict[str, tuple[int, float]] = {}
+        self._last_activity = 0.0
+        self._task: asyncio.Task | None = None
+        self.counts: dict = {}
+        self.used_today = 0
+        self.searched = 0
+        self.not_found = 0
+        self.cache_hits = 0
+        self.deferred = 0
+        self.failed = 0
+        self.not_ready = 0
+
+    async def ensure_table(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute(RESOLVER_SCHEMA)
+
+    async def start(self):
+        if self.daily_budget > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def touch(self):
+        """Note foreground activity; the worker stays off the API for `idle_after` seconds."""
+        self._last_activity = time.monotonic()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.monotonic() - self._last_activity < self.idle_after:
+                self.deferred += 1
+                continue
+            try:
+                await self.step()
+            except Exception as e:
+                print(f"Library pre-resolution failed: {getattr(e, 'detail', e)}")
+
+    async def step(self) -> bool:
+        """Resolve the next song. False if there is none, the budget is
+        spent or YouTube is not connected."""
+        library = await self.store.current()
+        if library is None:
+            return False
+        if library["id"] != self._library_id or not self._queue:
+            await self._refill(library["id"])
+        if not self._queue:
+            return False
+
+        song = self._queue[0]
+        key = song_key(song["artist"], song["title"])
+        cached = await self.seed_cache.get_many([key])
+        if key in cached:
+            self.cache_hits += 1
+            video_id = cached[key]
+        else:
+            async with self.pool.acquire() as conn:
+                self.used_today = await conn.fetchval(_USED)
+            if self.used_today >= self.daily_budget:
+                return False
+            if self.ready and not await self.ready():
+                self.not_ready += 1
+                return False
+            try:
+                video_id = await self.search(song["artist"], song["title"])
+            except Exception:
+                self.failed += 1
+                self._queue.popleft()
+                attempts = self._backoff.get(key, (0, 0.0))[0] + 1
+                delay = min(self.interval * 2 ** attempts, MAX_BACKOFF)
+                self._backoff[key] = (attempts, time.monotonic() + delay)
+                raise
+            finally:
+                async with self.pool.acquire() as conn:
+                    self.used_today = await conn.fetchval(_SPEND)
+            self.searched += 1
+            if video_id is None:
+                self.not_found += 1
+        self._queue.popleft()
+        self._backoff.pop(key, None)
+
+        async with self.pool.acquire() as conn:
+            changed = await conn.fetchval(
+                """
+                UPDATE library_songs SET unresolvable = $3
+                WHERE library_id = $1 AND position = $2 AND unresolvable <> $3
+                RETURNING true
+                """,
+                uuid.UUID(self._library_id), song["position"], video_id is None,
+            )
+        if changed and self.on_flags:
+            self.on_flags(self._library_id, [song["position"]], [video_id is None])
+        return True
+
+    async def _refill(self, library_id: str):
+        """Sync flags with the seed cache and queue the next unresolved songs."""
+        if library_id != self._library_id:
+            self._backoff.clear()
+        now = time.monotonic()
+        waiting = {k for k, (_, retry_at) in self._backoff.items() if retry_at > now}
+        async with self.pool.acquire() as conn:
+            changed = await conn.fetch(_SYNC_FLAGS, uuid.UUID(library_id))
+            rows = await conn.fetch(
+                _PENDING, uuid.UUID(library_id),
+                float(self.seed_cache.ttl), float(self.seed_cache.miss_ttl),
+                self.batch + len(waiting),
+            )
+            self.counts = dict(await conn.fetchrow(_COUNTS, uuid.UUID(library_id)))
+        self._library_id = library_id
+        self._queue = deque(
+            r for r in rows if song_key(r["artist"], r["title"]) not in waiting
+        )
+        if changed and self.on_flags:
+            self.on_flags(library_id, [r["position"] for r in changed], [r["unresolvable"] for r in changed])
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "library_id": self._library_id,
+            **self.counts,
+            "queued": len(self._queue),
+            "searched": self.searched,
+            "not_found": self.not_found,
+            "cache_hits": self.cache_hits,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "failing": len(self._backoff),
+            "not_ready": self.not_ready,
+            "budget": self.daily_budget,
+            "used_today": self.used_today,
+        }
@@ -0,0 +1,159 @@
+"""
+CrateDig — weighted seed sampling
+The library as integer-coded NumPy columns, and weighted draws over them.
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+from library import LibraryStore
+
+NO_GENRE = -1
+
+
+class SongArrays:
+    """Compact, position-indexed columns of one library.
+
+    `artist` and `genre` are integer codes (NO_GENRE for untagged songs),
+    `artist_songs` is the song count per artist code, `last_used`
+    the epoch seconds each song was last drawn as a seed (0 = never) and
+    `unresolvable` marks songs YouTube Music has no match for.
+    """
+
+    __slots__ = ("artist", "genre", "genres", "genre_code", "artist_songs", "last_used", "unresolvable")
+
+    def __init__(
+        self,
+        artist_keys: list[str],
+        genres: list[str | None],
+        last_used: list[float | None],
+        unresolvable: list[bool] | None = None,
+    ):
+        _, codes = np.unique(np.array(artist_keys), return_inverse=True)
+        self.artist = codes.astype(np.int32)
+        self.artist_songs = np.bincount(self.artist).astype(np.int32)
+
+        self.genres = sorted({g for g in genres if g is not None})
+        self.genre_code = {g: i for i, g in enumerate(self.genres)}
+        self.genre = np.fromiter(
+            (NO_GENRE if g is None else self.genre_code[g] for g in genres),
+            dtype=np.int32, count=len(genres),
+        )
+        self.last_used = np.array([t or 0.0 for t in last_used], dtype=np.float64)
+        self.unresolvable = np.zeros(len(artist_keys), dtype=bool)
+        if unresolvable is not None:
+            self.unresolvable[:] = unresolvable
+
+    def __len__(self) -> int:
+        return len(self.artist)
+
+    def weights(
+        self,
+        genres: dict[str, float] | None = None,
+        rarity: float = 0.0,
+        recency: float = 0.0,
+        now: float | None = None,
+    ) -> np.ndarray:
+        """Per-song draw weight; unresolvable songs always get 0.
+
+        - genres: weight per genre tag; when given, every other song
+          (including untagged ones) gets weight 0
+        - rarity: exponent on 1 / artist song count (0 = off, 1 = every
+          artist equally likely, >1 favours niche artists)
+        - recency: half-life in seconds for songs recently used as seeds
+          (<= 0 = off); a song drawn just now has weight ~0
+        """
+        w = (~self.unresolvable).astype(np.float64)
+        if genres:
+            # Last slot is what NO_GENRE (-1) indexes
+            by_code = np.zeros(len(self.genres) + 1, dtype=np.float64)
+            for name, weight in genres.items():
+                if name in self.genre_code:
+                    by_code[self.genre_code[name]] = max(weight, 0.0)
+            w *= by_code[self.genre]
+        if rarity:
+            w *= self.artist_songs[self.artist].astype(np.float64) ** -rarity
+        if recency > 0:
+            age = (time.time() if now is None else now) - self.last_used
+            w *= -np.expm1(-np.log(2) * np.maximum(age, 0.0) / recency)
+        return w
+
+
+def weighted_sample(weights: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k distinct indices drawn with probability proportional to weight.
+
+    Exponential-key sampling (Efraimidis–Spirakis): each index gets
+    Exp(1) / weight and the k smallest keys win, in key order.
+    Zero-weight indices are never drawn.
+    """
+    k = min(k, int(np.count_nonzero(weights)))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    with np.errstate(divide="ignore"):
+        keys = rng.standard_exponential(weights.size) / weights
+    picked = np.argpartition(keys, k - 1)[:k]
+    return picked[np.argsort(keys[picked])]
+
+
+class SeedSampler:
+    """Weighted seed draws over the current library's SongArrays.
+
+    The arrays are loaded once per library id; a re-upload gets a new id,
+    which replaces them. Seeds drawn here or through the uniform seed
+    index are stamped in both the DB and the loaded arrays.
+    """
+
+    def __init__(self, store: LibraryStore, seed: int | None = None):
+        self.store = store
+        self.rng = np.random.default_rng(seed)
+        self._library_id: str | None = None
+        self._arrays: SongArrays | None = None
+        self._lock = asyncio.Lock()
+
+    async def arrays(self, library_id: str) -> SongArrays:
+        async with self._lock:
+            if self._library_id != library_id:
+                rows = await self.store.columns(library_id)
+                self._arrays = await asyncio.to_thread(
+                    SongArrays,
+                    [r["artist_key"] for r in rows],
+                    [r["genre"] for r in rows],
+                    [r["last_used"] for r in rows],
+                    [r["unresolvable"] for r in rows],
+                )
+                self._library_id = library_id
+            return self._arrays
+
+    async def draw(
+        self,
+        library_id: str,
+        count: int,
+        genres: dict[str, float] | None = None,
+        rarity: float = 0.0,
+        recency: float = 0.0,
+    ) -> list[dict]:
+        arrays = await self.arrays(library_id)
+        positions = weighted_sample(arrays.weights(genres, rarity, recency), count, self.rng)
+        songs = await self.store.songs_at(library_id, positions.tolist())
+        await self.record_use(library_id, [s.pop("position") for s in songs])
+        return songs
+
+    async def record_use(self, library_id: str, positions: list[int]):
+        await self.store.record_use(library_id, positions)
+        if self._library_id == library_id and positions:
+            self._arrays.last_used[positions] = time.time()
+
+    def set_unresolvable(self, library_id: str, positions: list[int], flags: list[bool]):
+        """Mirror unresolvable flags changed in the DB into the loaded arrays."""
+        if self._library_id == library_id and positions:
+            self._arrays.unresolvable[positions] = flags
+
+    def stats(self) -> dict:
+        return {
+            "library_id": self._library_id,
+            "songs": len(self._arrays) if self._arrays is not None else 0,
+            "artists": len(self._arrays.artist_songs) if self._arrays is not None else 0,
+            "genres": len(self._arrays.genres) if self._arrays is not None else 0,
+        }
@@ -0,0 +1,48 @@
+import asyncio
+import glob
+import os
+import sys
+import uuid
+
+import asyncpg
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(BACKEND_DIR, "..", "drizzle", "*.sql")
+
+# Backend modules import each other by bare name (`from cache import ...`)
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+async def _run(statements: list[str]):
+    conn = await asyncpg.connect(TEST_DATABASE_URL, ssl=False)
+    try:
+        for statement in statements:
+            await conn.execute(statement)
+    finally:
+        await conn.close()
+
+
+@pytest.fixture
+def make_pool():
+    """Async factory for asyncpg pools on a throwaway schema holding the
+    drizzle tables. Skips the test unless TEST_DATABASE_URL is set."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    migrations = []
+    for path in sorted(glob.glob(MIGRATIONS)):
+        with open(path, encoding="utf-8") as f:
+            migrations.append(f.read())
+    asyncio.run(_run([f"CREATE SCHEMA {schema}", f"SET search_path TO {schema}", *migrations]))
+
+    async def make():
+        return await asyncpg.create_pool(
+            TEST_DATABASE_URL, ssl=False, min_size=1, max_size=8,
+            server_settings={"search_path": schema},
+        )
+
+    yield make
+    asyncio.run(_run([f"DROP SCHEMA {schema} CASCADE"]))
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from csvparse import iter_songs
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_plain_csv_with_aliases():
+    lines = ["﻿Track;Performer;Style\n", "One;A;House\n", "Two;B;\n", ";C;Techno\n"]
+    assert list(iter_songs(lines)) == [
+        {"title": "One", "artist": "A", "genre": "House"},
+        {"title": "Two", "artist": "B"},
+    ]
+
+
+def test_wrapped_dj_software_rows():
+    lines = [
+        "Title,Artist,Genre\n",
+        '"One,""A, B"",Disco"\n',
+        '"Two,C,"\n',
+    ]
+    assert list(iter_songs(lines)) == [
+        {"title": "One", "artist": "A, B", "genre": "Disco"},
+        {"title": "Two", "artist": "C"},
+    ]
+
+
+def test_poc_modules_need_no_backend_deps():
+    # poc.py borrows these; only ytmusicapi is in the root requirements.txt
+    code = (
+        "import sys\n"
+        "for m in ('asyncpg', 'numpy', 'fastapi', 'httpx', 'pydantic'): sys.modules[m] = None\n"
+        "import csvparse, fuzzy, ratelimit\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=BACKEND_DIR)
@@ -0,0 +1,49 @@
+import pytest
+
+from fuzzy import FuzzyIndex
+from normalize import artist_names
+
+
+@pytest.mark.parametrize(
+    ("artist", "names"),
+    [
+        ("A feat. B & C", ["a", "b", "c"]),
+        ("Daft Punk (feat. Pharrell Williams, Nile Rodgers)", ["daft punk", "pharrell williams", "nile rodgers"]),
+        ("Drake ft Rihanna", ["drake", "rihanna"]),
+        ("Simon & Garfunkel", ["simon garfunkel"]),
+        ("Simon and Garfunkel", ["simon and garfunkel"]),
+        ("Malcolm X", ["malcolm x"]),
+        ("Earth, Wind & Fire", ["earth wind fire"]),
+        ("Chase & Status vs. Plan B", ["chase status vs plan b"]),
+    ],
+)
+def test_artist_names_split_only_featuring_credits(artist, names):
+    assert artist_names(artist) == names
+
+
+@pytest.mark.parametrize(
+    ("indexed", "lookup"),
+    [
+        ([("Simon", "The Boxer"), ("Garfunkel", "The Boxer")], ("Simon and Garfunkel", "The Boxer")),
+        ([("Simon", "The Boxer")], ("Simon & Garfunkel", "The Boxer")),
+        ([("Malcolm", "Speech")], ("Malcolm X", "Speech")),
+        ([("Wind", "September"), ("Fire", "September")], ("Earth, Wind & Fire", "September")),
+        ([("Rihanna", "Take Care")], ("Drake feat. Rihanna", "Take Care")),
+    ],
+)
+def test_different_artists_do_not_match(indexed, lookup):
+    assert not FuzzyIndex.build(indexed).match(*lookup)
+
+
+@pytest.mark.parametrize(
+    ("indexed", "lookup"),
+    [
+        (("Earth, Wind & Fire", "September"), ("Earth, Wind & Fire", "September (Remastered)")),
+        (("Drake", "Take Care"), ("Drake feat. Rihanna", "Take Care")),
+        (("Drake feat. Rihanna", "Take Care"), ("Drake", "Take Care - Radio Edit")),
+        (("Daft Punk", "Get Lucky"), ("Daft Punk (feat. Pharrell Williams)", "Get Lucky (Radio Edit)")),
+        (("Fred again..", "Delilah (pull me out of this)"), ("Fred Again", "Delilah pull me out of this")),
+    ],
+)
+def test_variants_by_the_same_artist_match(indexed, lookup):
+    assert FuzzyIndex.build([indexed]).match(*lookup)
@@ -0,0 +1,32 @@
+import asyncio
+
+from jobs import JobQueue
+
+
+def test_finished_job_keeps_its_last_progress(make_pool):
+    # Every update is due for a write, but the first is still in flight when
+    # the handler returns; the terminal row must hold the last update
+    async def handler(payload, progress):
+        for n in range(1, 4):
+            progress({"n": n})
+        return {"ok": True}
+
+    async def main():
+        pool = await make_pool()
+        jobs = JobQueue(pool, {"count": handler}, workers=1, progress_interval=0)
+        try:
+            await jobs.start()
+            job_id = await jobs.submit("count", {})
+            async for event, _ in jobs.subscribe(job_id):
+                if event == "done":
+                    break
+            await asyncio.sleep(0.05)  # a stray write would land by now
+            job = await jobs.get(job_id)
+            assert job["status"] == "done"
+            assert job["result"] == {"ok": True}
+            assert job["progress"] == {"n": 3}
+        finally:
+            await jobs.stop()
+            await pool.close()
+
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from library import LibraryStore
+
+# "Big" has four songs overall but only one tagged house
+SONGS = [
+    {"artist": "Big", "title": "One", "genre": "house"},
+    {"artist": "Big", "title": "Two", "genre": "techno"},
+    {"artist": "Big", "title": "Three", "genre": "techno"},
+    {"artist": "Big", "title": "Four", "genre": "techno"},
+    {"artist": "Small", "title": "Five", "genre": "house"},
+    {"artist": "Small", "title": "Six"},
+]
+
+
+def run_library(make_pool, test):
+    async def main():
+        pool = await make_pool()
+        try:
+            store = LibraryStore(pool)
+            await store.ensure_table()
+            meta = await store.ingest("library.csv", iter(SONGS))
+            await test(store, pool, str(meta["id"]))
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+async def pools(pool, library_id: str) -> dict[str, list[int]]:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT pool, position FROM library_seed_slots WHERE library_id = $1 ORDER BY pool, rank",
+            uuid.UUID(library_id),
+        )
+    out: dict[str, list[int]] = {}
+    for row in rows:
+        out.setdefault(row["pool"], []).append(row["position"])
+    return out
+
+
+def test_deep_genre_pools_count_artist_songs_within_the_genre(make_pool):
+    async def test(store, pool, library_id):
+        assert await pools(pool, library_id) == {
+            "deep": [4, 5],
+            "deep:house": [0, 4],
+            "genre:house": [0, 4],
+            "genre:techno": [1, 2, 3],
+        }
+        genres = {g["genre"]: g for g in await store.genres(library_id)}
+        assert (genres["house"]["count"], genres["house"]["deep"]) == (2, 2)
+        assert (genres["techno"]["count"], genres["techno"]["deep"]) == (3, 0)
+
+    run_library(make_pool, test)
+
+
+def test_outdated_index_is_rebuilt(make_pool):
+    async def test(store, pool, library_id):
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM library_seed_slots WHERE pool = 'deep:house'")
+            await conn.execute("UPDATE library_pools SET version = 1")
+        await store.current()
+        assert (await pools(pool, library_id))["deep:house"] == [0, 4]
+
+    run_library(make_pool, test)
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": 501}, {"limit": -1}, {"offset": -1}])
+def test_song_search_rejects_out_of_range_paging(params):
+    response = TestClient(main.app).get("/library/songs", params=params)
+    assert response.status_code == 422
@@ -0,0 +1,343 @@
+import asyncio
+import uuid
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from bench.mock_youtube import MockConfig, create_app
+from playlists import DataAPIError, PlaylistWriter
+from pushes import PlaylistPusher
+from quota import NEXT_RESET, QuotaLedger
+from ratelimit import RateLimiter, TokenBucket
+
+INSERTS = "POST /youtube/v3/playlistItems"
+MOVES = "PUT /youtube/v3/playlistItems"
+DELETES = "DELETE /youtube/v3/playlistItems"
+IDS = [f"vid{i:03d}" for i in range(12)]
+
+
+class Crash(BaseException):
+    """The process dying mid-push: not an Exception, so nothing records it."""
+
+
+class FlakyWriter(PlaylistWriter):
+    """Crashes after `crash_after` inserts have landed (or right after the
+    playlist is created), fails inserts of the videos in `fail` and reports
+    those of `lose` as failed after they land."""
+
+    def __init__(
+        self, *args, crash_after: int | None = None, crash_on_create=False, fail=(), lose=(), **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.crash_after = crash_after
+        self.crash_on_create = crash_on_create
+        self.fail = set(fail)
+        self.lose = set(lose)
+        self.inserted = 0
+        self.crashed = False
+
+    async def create_playlist(self, *args, **kwargs):
+        playlist_id = await super().create_playlist(*args, **kwargs)
+        if self.crash_on_create:
+            self.crashed = True
+            raise Crash()
+        return playlist_id
+
+    async def insert_item(self, headers, playlist_id, video_id, position=None):
+        if self.crashed:
+            raise Crash()
+        if video_id in self.fail:
+            raise DataAPIError(503, "backendError", self.retries + 1)
+        result = await super().insert_item(headers, playlist_id, video_id, position)
+        if video_id in self.lose:
+            raise DataAPIError(0, "timed out", self.retries + 1)
+        self.inserted += 1
+        if self.crash_after is not None and self.inserted >= self.crash_after:
+            self.crashed = True
+            raise Crash()
+        return result
+
+
+class Mock:
+    """The mock YouTube server, served in-process, and pushers against it."""
+
+    def __init__(self, pool, daily_units: int = 0):
+        self.pool = pool
+        self.app = create_app(MockConfig())
+        self.http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url="http://mock/youtube/v3"
+        )
+        self.limiter = RateLimiter({
+            name: TokenBucket(name, rate=10_000, burst=10_000)
+            for name in ("playlists", "playlist_items")
+        })
+        self.ledger = QuotaLedger(pool, daily_units)
+
+    async def pusher(self, concurrency: int = 4, **flaky) -> PlaylistPusher:
+        writer = FlakyWriter(
+            self.http, self.limiter, concurrency, retries=0, backoff=0, quota=self.ledger, **flaky
+        )
+        pusher = PlaylistPusher(self.pool, writer, self.auth)
+        await self.ledger.ensure_table()
+        await pusher.ensure_table()
+        return pusher
+
+    @staticmethod
+    async def auth() -> dict:
+        return {"Authorization": "Bearer test"}
+
+    def calls(self, name: str) -> int:
+        return self.app.state.calls[name]
+
+    async def video_ids(self, playlist_id: str) -> list[str]:
+        resp = await self.http.get(f"http://mock/_mock/playlists/{playlist_id}")
+        return resp.json()["videoIds"]
+
+    async def playlists(self) -> int:
+        return (await self.http.get("http://mock/_mock/stats")).json()["playlists"]
+
+
+def run(make_pool, test, **mock):
+    async def main():
+        pool = await make_pool()
+        try:
+            await test(Mock(pool, **mock))
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+async def crash(pusher: PlaylistPusher, push_id: str):
+    try:
+        await pusher.run(push_id)
+    except Crash:
+        pass
+    await asyncio.sleep(0.05)  # let in-flight inserts land or crash too
+    report = await pusher.get(push_id)
+    assert report["status"] == "running"
+
+
+def test_resume_after_crash_mid_plan(make_pool):
+    async def test(mock: Mock):
+        first = await mock.pusher(crash_after=5)
+        push_id = str(uuid.uuid4())
+        await first.create(push_id, "Crash", IDS)
+        await crash(first, push_id)
+        landed = mock.calls(INSERTS)
+        assert 5 <= landed < len(IDS)
+
+        report = await (await mock.pusher()).run(push_id)
+        assert report["status"] == "done"
+        assert report["track_count"] == len(IDS)
+        assert await mock.video_ids(report["playlist_id"]) == IDS
+        # Items that landed before the crash were adopted, not inserted twice
+        assert mock.calls(INSERTS) == len(IDS)
+        assert await mock.playlists() == 1
+
+    run(make_pool, test)
+
+
+def test_resume_after_crash_before_playlist_recorded(make_pool):
+    async def test(mock: Mock):
+        push_id = str(uuid.uuid4())
+        first = await mock.pusher(crash_on_create=True)
+        await first.create(push_id, "Crash", IDS)
+        await crash(first, push_id)
+        assert (await first.get(push_id))["playlist_id"] is None
+
+        report = await (await mock.pusher()).run(push_id)
+        assert report["status"] == "done"
+        assert await mock.playlists() == 1  # found again by its marker
+        assert await mock.video_ids(report["playlist_id"]) == IDS
+
+    run(make_pool, test)
+
+
+def test_quota_pause_and_resume_next_day(make_pool):
+    # The playlist and five inserts, then the ledger runs dry; the other
+    # five and two list calls fit the next day's budget
+    ids = IDS[:10]
+
+    async def test(mock: Mock):
+        pusher = await mock.pusher(concurrency=1)
+        push_id = str(uuid.uuid4())
+        await pusher.create(push_id, "Quota", ids)
+        report = await pusher.run(push_id)
+        assert report["status"] == "paused"
+        assert report["track_count"] == 5
+        assert report["quota_used"] == 300
+        async with mock.pool.acquire() as conn:
+            resume_after = await conn.fetchval(
+                f"SELECT resume_after = {NEXT_RESET} FROM playlist_pushes WHERE id = $1",
+                uuid.UUID(push_id),
+            )
+            assert resume_after
+
+            # Not due yet: nothing happens
+            await pusher.resume_due()
+            assert (await pusher.get(push_id))["status"] == "paused"
+
+            # The next Pacific day: yesterday's spend no longer counts
+            await conn.execute("UPDATE youtube_quota SET day = day - 1")
+            await conn.execute("UPDATE playlist_pushes SET resume_after = NOW()")
+        await pusher.resume_due()
+
+        report = await pusher.get(push_id)
+        assert report["status"] == "done"
+        assert report["runs"] == 2
+        assert await mock.video_ids(report["playlist_id"]) == ids
+        assert mock.calls(INSERTS) == len(ids)
+
+    run(make_pool, test, daily_units=300)
+
+
+def test_failed_items_are_retried(make_pool):
+    async def test(mock: Mock):
+        push_id = str(uuid.uuid4())
+        first = await mock.pusher(fail={IDS[2], IDS[7]})
+        await first.create(push_id, "Flaky", IDS)
+        report = await first.run(push_id)
+        assert report["status"] == "failed"
+        assert report["failed_count"] == 2
+        assert report["error"] == "2 of 12 items failed; resume to retry"
+
+        report = await (await mock.pusher()).run(push_id)
+        assert report["status"] == "done"
+        assert report["failed_count"] == 0
+        assert await mock.video_ids(report["playlist_id"]) == IDS
+        assert mock.calls(INSERTS) == len(IDS)
+
+    run(make_pool, test)
+
+
+class StubPusher:
+    """Answers every push with a fixed status, for the HTTP layer alone."""
+
+    def __init__(self, status: str):
+        self.status = status
+
+    async def create(self, *args):
+        pass
+
+    async def get(self, push_id):
+        return {"push_id": push_id, "status": self.status}
+
+    async def run(self, push_id, progress=None):
+        return await self.get(push_id)
+
+
+def test_incomplete_push_answers_202(monkeypatch):
+    client = TestClient(main.app)
+    for status, code in (("done", 200), ("paused", 202), ("failed", 202)):
+        monkeypatch.setattr(main, "playlist_pusher", StubPusher(status))
+        response = client.post("/create-playlist", json={"title": "T", "video_ids": IDS})
+        assert response.status_code == code
+        assert response.json()["status"] == status
+        push_id = response.json()["push_id"]
+        assert client.post(f"/pushes/{push_id}/resume").status_code == code
+
+
+# ── Sync ──
+
+
+async def existing_playlist(mock: Mock, video_ids: list[str]) -> str:
+    pusher = await mock.pusher()
+    push_id = str(uuid.uuid4())
+    await pusher.create(push_id, "Existing", video_ids)
+    report = await pusher.run(push_id)
+    assert await mock.video_ids(report["playlist_id"]) == video_ids
+    mock.app.state.calls.clear()
+    return report["playlist_id"]
+
+
+async def sync(mock: Mock, playlist_id: str, video_ids: list[str], **flaky) -> dict:
+    pusher = await mock.pusher(**flaky)
+    push_id = str(uuid.uuid4())
+    await pusher.create(push_id, "Synced", video_ids, playlist_id)
+    return await pusher.run(push_id)
+
+
+def test_sync_adds_removes_and_reorders(make_pool):
+    async def test(mock: Mock):
+        playlist_id = await existing_playlist(mock, IDS[:10])
+        wanted = [IDS[9], *IDS[:3], "new1", IDS[4], IDS[5], "new2", IDS[7], IDS[8]]
+
+        report = await sync(mock, playlist_id, wanted)
+        assert report["status"] == "done"
+        assert report["mode"] == "sync"
+        assert await mock.video_ids(playlist_id) == wanted
+        assert (mock.calls(INSERTS), mock.calls(DELETES), mock.calls(MOVES)) == (2, 2, 1)
+        assert (report["deleted"], report["reordered"]) == (2, 1)
+        assert report["quota_used"] == 5 * 50 + 1
+
+    run(make_pool, test)
+
+
+def test_sync_to_same_list_writes_nothing(make_pool):
+    async def test(mock: Mock):
+        playlist_id = await existing_playlist(mock, IDS)
+        report = await sync(mock, playlist_id, IDS)
+        assert report["status"] == "done"
+        assert report["quota_used"] == 1
+        assert (report["deleted"], report["reordered"]) == (0, 0)
+        assert mock.calls(INSERTS) + mock.calls(DELETES) + mock.calls(MOVES) == 0
+
+    run(make_pool, test)
+
+
+def test_sync_duplicates_and_reverse(make_pool):
+    async def test(mock: Mock):
+        playlist_id = await existing_playlist(mock, IDS[:6])
+        wanted = [IDS[3], IDS[3], *reversed(IDS[:3])]
+
+        report = await sync(mock, playlist_id, wanted)
+        assert report["status"] == "done"
+        assert await mock.video_ids(playlist_id) == wanted
+        assert mock.calls(INSERTS) == 1
+        assert mock.calls(DELETES) == 2
+
+    run(make_pool, test)
+
+
+def test_sync_keeps_items_whose_insert_failed(make_pool):
+    # The insert of "new1" lands but reports an error; the rerun must adopt
+    # it, not delete it as an item nothing asked for
+    async def test(mock: Mock):
+        playlist_id = await existing_playlist(mock, IDS[:5])
+        wanted = [IDS[0], "new1", *IDS[1:5]]
+        pusher = await mock.pusher(lose={"new1"})
+        push_id = str(uuid.uuid4())
+        await pusher.create(push_id, "Synced", wanted, playlist_id)
+        report = await pusher.run(push_id)
+        assert report["status"] == "failed"
+        assert report["failed_count"] == 1
+
+        report = await (await mock.pusher()).run(push_id)
+        assert report["status"] == "done"
+        assert await mock.video_ids(playlist_id) == wanted
+        assert mock.calls(INSERTS) == 1
+        assert mock.calls(DELETES) == 0
+
+    run(make_pool, test)
+
+
+def test_sync_retries_failed_inserts(make_pool):
+    async def test(mock: Mock):
+        playlist_id = await existing_playlist(mock, IDS[:5])
+        wanted = [*IDS[:3], "new1", *IDS[3:5], "new2"]
+        pusher = await mock.pusher(fail={"new1"})
+        push_id = str(uuid.uuid4())
+        await pusher.create(push_id, "Synced", wanted, playlist_id)
+        report = await pusher.run(push_id)
+        assert report["status"] == "failed"
+        assert await mock.video_ids(playlist_id) == [x for x in wanted if x != "new1"]
+
+        report = await (await mock.pusher()).run(push_id)
+        assert report["status"] == "done"
+        assert await mock.video_ids(playlist_id) == wanted
+        assert mock.calls(INSERTS) == 2
+        assert mock.calls(DELETES) == 0
+
+    run(make_pool, test)
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from cache import SeedCache
+from library import LibraryStore
+from normalize import song_key
+from resolver import LibraryResolver
+
+SONGS = [{"artist": f"Artist {i}", "title": f"Song {i}"} for i in range(5)]
+
+
+def run_resolver(make_pool, test, *, budget=100, ready=True, failing=()):
+    """Run `test(resolver, searched)` against a fresh library of SONGS."""
+
+    async def main():
+        pool = await make_pool()
+        try:
+            store = LibraryStore(pool)
+            await store.ensure_table()
+            await store.ingest("library.csv", iter(SONGS))
+            seed_cache = SeedCache(pool, 100, 3600, 3600)
+            await seed_cache.ensure_table()
+            searched = []
+
+            async def search(artist, title):
+                searched.append(title)
+                if title in failing:
+                    raise RuntimeError("search failed")
+                await seed_cache.put(song_key(artist, title), artist, title, f"v-{title}")
+                return f"v-{title}"
+
+            async def is_ready():
+                return ready
+
+            resolver = LibraryResolver(
+                pool, store, seed_cache, search, budget, interval=10, idle_after=0, ready=is_ready,
+            )
+            await resolver.ensure_table()
+            await test(resolver, searched)
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_not_ready_spends_nothing(make_pool):
+    async def test(resolver, searched):
+        assert not await resolver.step()
+        assert searched == []
+        assert resolver.used_today == 0
+        assert resolver.stats()["not_ready"] == 1
+
+    run_resolver(make_pool, test, ready=False)
+
+
+def test_budget_is_charged_per_search(make_pool):
+    async def test(resolver, searched):
+        assert await resolver.step()
+        assert await resolver.step()
+        assert not await resolver.step()
+        assert searched == ["Song 0", "Song 1"]
+        assert resolver.used_today == 2
+
+    run_resolver(make_pool, test, budget=2)
+
+
+def test_failing_song_backs_off(make_pool):
+    async def test(resolver, searched):
+        with pytest.raises(RuntimeError):
+            await resolver.step()
+        assert resolver.used_today == 1  # the failed attempt still counts
+        while await resolver.step():
+            pass
+        # Song 0 is set aside; the rest are resolved, each searched once
+        assert searched == [f"Song {i}" for i in range(5)]
+        assert resolver.stats()["failing"] == 1
+
+        # Due again once its backoff is over
+        attempts, _ = resolver._backoff[song_key("Artist 0", "Song 0")]
+        resolver._backoff[song_key("Artist 0", "Song 0")] = (attempts, 0.0)
+        resolver._queue.clear()
+        with pytest.raises(RuntimeError):
+            await resolver.step()
+        assert resolver._backoff[song_key("Artist 0", "Song 0")][0] == 2
+        assert resolver.used_today == 6
+
+    run_resolver(make_pool, test, failing={"Song 0"})
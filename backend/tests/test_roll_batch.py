@@ -0,0 +1,105 @@
+import asyncio
+
+import main
+from main import BatchRollRequest, RollRequest, Seed
+
+
+class Token:
+    async def get(self):
+        return "token"
+
+
+class Seeds:
+    async def get_many(self, keys):
+        return {}
+
+
+def radio(seed: Seed) -> list[dict]:
+    """Ten tracks per seed, each by its own artist; "Remix" seeds return
+    remixes of seed 0's tracks under new videoIds."""
+    n = seed.title.split()[-1]
+    if seed.artist == "Remix":
+        return [
+            {"videoId": f"r{n}-{i}", "artist": f"Artist 0-{i}", "title": f"Track 0-{i} (Remix)"}
+            for i in range(10)
+        ]
+    return [
+        {"videoId": f"v{n}-{i}", "artist": f"Artist {n}-{i}", "title": f"Track {n}-{i}"}
+        for i in range(10)
+    ]
+
+
+def roll_batch(monkeypatch, req: BatchRollRequest) -> tuple[dict, list[Seed]]:
+    started = []
+
+    async def process_seed(seed, cached):
+        started.append(seed)
+        await asyncio.sleep(0)
+        return f"seed-{seed.title}", radio(seed)
+
+    monkeypatch.setattr(main, "token_manager", Token())
+    monkeypatch.setattr(main, "seed_cache", Seeds())
+    monkeypatch.setattr(main, "process_seed", process_seed)
+    return asyncio.run(main.run_roll_batch(req)), started
+
+
+def test_cross_roll_dedup_fills_every_roll(monkeypatch):
+    seeds = [Seed(artist=f"Seed Artist {i}", title=f"Seed {i}") for i in range(20)]
+    roll = RollRequest(seeds=seeds, desired_count=30, overfetch=0, exclude_library=False)
+    result, started = roll_batch(
+        monkeypatch, BatchRollRequest(rolls=[roll, roll], cross_roll_dedup=True)
+    )
+
+    first, second = (r["tracks"] for r in result["rolls"])
+    assert len(first) == 30
+    assert len(second) == 30
+    assert not {t["videoId"] for t in first} & {t["videoId"] for t in second}
+    # Six seeds cover both rolls; the rest of the union is never started
+    assert 6 <= result["seeds_run"] < 20
+    assert len(started) == result["seeds_run"]
+
+
+def test_cross_roll_dedup_drops_variants(monkeypatch):
+    a = RollRequest(seeds=[Seed(artist="A", title="Seed 0")], desired_count=10, exclude_library=False)
+    b = RollRequest(seeds=[Seed(artist="Remix", title="Seed 1")], desired_count=10, exclude_library=False)
+    result, _ = roll_batch(monkeypatch, BatchRollRequest(rolls=[a, b], cross_roll_dedup=True))
+
+    first, second = result["rolls"]
+    assert len(first["tracks"]) == 10
+    assert second["tracks"] == []
+    assert second["cross_roll_excluded"] == 10
+
+
+def test_without_cross_roll_dedup_rolls_share_tracks(monkeypatch):
+    seeds = [Seed(artist=f"Seed Artist {i}", title=f"Seed {i}") for i in range(20)]
+    roll = RollRequest(seeds=seeds, desired_count=30, overfetch=0, exclude_library=False)
+    result, _ = roll_batch(monkeypatch, BatchRollRequest(rolls=[roll, roll]))
+
+    first, second = (r["tracks"] for r in result["rolls"])
+    assert first == second
+    assert len(first) == 30
+
+
+def test_roll_cutoff_counts_seeds_finished_out_of_order(monkeypatch):
+    # Seed 0 is slow; the seeds behind it already hold enough tracks, so no
+    # further seeds start while it runs
+    seeds = [Seed(artist=f"Seed Artist {i}", title=f"Seed {i}") for i in range(20)]
+    started = []
+
+    async def process_seed(seed, cached):
+        started.append(seed)
+        await asyncio.sleep(0.05 if seed is seeds[0] else 0)
+        return f"seed-{seed.title}", radio(seed)
+
+    monkeypatch.setattr(main, "token_manager", Token())
+    monkeypatch.setattr(main, "seed_cache", Seeds())
+    monkeypatch.setattr(main, "process_seed", process_seed)
+    monkeypatch.setattr(main, "ROLL_CONCURRENCY", 4)
+    req = RollRequest(seeds=seeds, desired_count=30, overfetch=0, exclude_library=False)
+    result = asyncio.run(main.run_roll(req))
+
+    assert len(started) <= 5
+    assert result["seeds_used"] == len(started)
+    assert len(result["tracks"]) == 30
+    # Merged in seed order: seed 0's tracks come through despite finishing last
+    assert any(t["videoId"].startswith("v0-") for t in result["tracks"])
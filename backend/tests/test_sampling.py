@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from sampling import SongArrays
+
+
+def songs() -> SongArrays:
+    now = 1_000_000_000.0
+    return SongArrays(
+        ["a", "a", "b", "c"],
+        ["house", None, "house", "techno"],
+        [None, now - 60, now - 86400 * 30, None],
+    )
+
+
+def test_recency_favours_songs_not_used_lately():
+    w = songs().weights(recency=86400 * 7, now=1_000_000_000.0)
+    assert w[0] == pytest.approx(1.0)  # never used
+    assert 0 < w[1] < w[2] < 1.0
+
+
+@pytest.mark.parametrize("recency", [0.0, -86400.0])
+def test_recency_off_unless_positive(recency):
+    w = songs().weights(recency=recency, now=1_000_000_000.0)
+    assert np.array_equal(w, np.ones(4))
+
+
+def test_weights_never_negative():
+    w = songs().weights({"house": 2.0, "techno": -1.0}, rarity=1.0, recency=-1.0, now=1_000_000_000.0)
+    assert (w >= 0).all()
+    assert w[3] == 0
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"count": 0},
+        {"count": 201},
+        {"count": 10, "recency_days": -1},
+    ],
+)
+def test_weighted_seed_request_rejects_out_of_range(body):
+    response = TestClient(main.app).post("/library/seeds/weighted", json=body)
+    assert response.status_code == 422
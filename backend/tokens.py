@@ -0,0 +1,156 @@
+"""
+CrateDig — YouTube OAuth token manager
+Keeps the decoded token in memory and refreshes it ahead of expiry.
+"""
+
+import asyncio
+import json
+import time
+
+import asyncpg
+import httpx
+from fastapi import HTTPException
+
+from metrics import stage
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+
+class TokenManager:
+    """Single-user token cache.
+
+    The token is read from `youtube_connections` once and then served from
+    memory. A background task refreshes it `refresh_margin` seconds before
+    expiry; callers that still find it missing or expired share one
+    in-flight load or refresh. The DB is written only after a real
+    refresh, and re-read every `reload_interval` seconds so a reconnect
+    from the frontend is picked up. `generation` increases whenever the
+    access token changes.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        http: httpx.AsyncClient,
+        token_url: str = GOOGLE_TOKEN_URL,
+        refresh_margin: float = 300,
+        reload_interval: float = 600,
+    ):
+        self.pool = pool
+        self.http = http
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.reload_interval = reload_interval
+        self.generation = 0
+        self.refreshes = 0
+        self._token: dict | None = None
+        self._loading: asyncio.Task | None = None
+        self._refreshing: asyncio.Task | None = None
+        self._loop_task: asyncio.Task | None = None
+
+    async def start(self):
+        self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+
+    async def get(self) -> dict:
+        """Return a valid token (a shared dict — do not mutate)."""
+        if self._token is None:
+            if self._loading is None or self._loading.done():
+                self._loading = asyncio.create_task(self.reload())
+            await asyncio.shield(self._loading)
+        if self._token["expires_at"] <= time.time() + 60:
+            await self.refresh()
+        return self._token
+
+    async def reload(self):
+        """Re-read the token row; adopt it if it is newer than ours."""
+        with stage("token_load"):
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow("SELECT oauth_token FROM youtube_connections LIMIT 1")
+        if not row:
+            self._token = None
+            raise HTTPException(status_code=401, detail="YouTube not connected")
+        token = row["oauth_token"]
+        if isinstance(token, str):
+            token = json.loads(token)
+        token.setdefault("expires_at", 0)
+
+        current = self._token
+        if (
+            current is None
+            or token.get("refresh_token") != current.get("refresh_token")
+            or token["expires_at"] > current["expires_at"]
+        ):
+            self._set(token)
+
+    async def refresh(self):
+        """Refresh the access token; concurrent callers share one request."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self):
+        with stage("token_refresh"):
+            await self._refresh_token()
+
+    async def _refresh_token(self):
+        token = self._token
+        resp = await self.http.post(
+            self.token_url,
+            data={
+                "client_id": token["client_id"],
+                "client_secret": token["client_secret"],
+                "refresh_token": token["refresh_token"],
+                "grant_type": "refresh_token",
+            },
+        )
+        data = resp.json()
+        if "access_token" not in data:
+            raise HTTPException(status_code=401, detail="Token refresh failed")
+
+        token = {
+            **token,
+            "access_token": data["access_token"],
+            "expires_at": int(time.time()) + data.get("expires_in", 3600),
+        }
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE youtube_connections SET oauth_token = $1::jsonb, last_used_at = NOW()",
+                json.dumps(token),
+            )
+        self.refreshes += 1
+        self._set(token)
+
+    def _set(self, token: dict):
+        if self._token is None or token["access_token"] != self._token["access_token"]:
+            self.generation += 1
+        self._token = token
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self.reload_interval
+            if self._token is not None:
+                until_refresh = self._token["expires_at"] - self.refresh_margin - time.time()
+                delay = min(delay, until_refresh)
+            await asyncio.sleep(max(delay, 5))
+            try:
+                if self._token is None:
+                    await self.reload()
+                elif self._token["expires_at"] - self.refresh_margin <= time.time():
+                    await self.refresh()
+                else:
+                    await self.reload()
+            except Exception as e:
+                print(f"Background token refresh failed: {getattr(e, 'detail', e)}")
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._token is not None,
+            "generation": self.generation,
+            "refreshes": self.refreshes,
+            "expires_in": int(self._token["expires_at"] - time.time()) if self._token else None,
+        }
@@ -0,0 +1,76 @@
+"""
+CrateDig — YTMusic client pool
+Long-lived ytmusicapi clients shared by requests and concurrent seed workers.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from ytmusicapi import YTMusic
+from ytmusicapi.auth.oauth import OAuthCredentials
+from ytmusicapi.auth.oauth.token import Token
+
+from metrics import stage
+
+
+def build_ytmusic(token: dict) -> YTMusic:
+    """Create a YTMusic instance from a token dict (in memory, no temp file)."""
+    auth = {k: token[k] for k in Token.members() if k in token}
+    return YTMusic(auth, oauth_credentials=OAuthCredentials(
+        client_id=token["client_id"],
+        client_secret=token["client_secret"],
+    ))
+
+
+class YTMusicPool:
+    """Up to `size` YTMusic clients, each with its own keep-alive session.
+
+    A client is checked out for the duration of one call. Clients are
+    stamped with the token generation they were last given; on checkout a
+    stale client gets the new access token patched in place instead of
+    being rebuilt.
+    """
+
+    def __init__(self, size: int, factory=build_ytmusic):
+        self.size = size
+        self.factory = factory
+        self._idle: asyncio.Queue[tuple[YTMusic, int]] = asyncio.Queue()
+        self._created = 0
+        self.builds = 0
+        self.token_updates = 0
+
+    @asynccontextmanager
+    async def client(self, token: dict, generation: int):
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                with stage("ytmusic_build"):
+                    yt = await asyncio.to_thread(self.factory, token)
+            except Exception:
+                self._created -= 1
+                raise
+            self.builds += 1
+        else:
+            yt, client_generation = await self._idle.get()
+            if client_generation != generation:
+                self._update_token(yt, token)
+        try:
+            yield yt
+        finally:
+            self._idle.put_nowait((yt, generation))
+
+    def _update_token(self, yt: YTMusic, token: dict):
+        oauth = getattr(yt, "_token", None)
+        if oauth is not None:
+            oauth.access_token = token["access_token"]
+            oauth.expires_at = token["expires_at"]
+        self.token_updates += 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+            "builds": self.builds,
+            "token_updates": self.token_updates,
+        }
@@ -13,114 +13,51 @@ Run:
   .venv/Scripts/python poc.py
 
 Prereqs:
+  - pip install -r requirements.txt (the backend/ modules it borrows are
+    standard library only)
   - oauth.json exists (run setup_auth.py first)
   - data/WUDWUD_app.csv exists (or any CSV with Title + Artist columns)
 """
 
-import csv
-import io
 import json
 import os
 import random
 import sys
-import time
 
 from ytmusicapi import YTMusic
 from ytmusicapi.auth.oauth import OAuthCredentials
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from fuzzy import FuzzyIndex  # noqa: E402
+from csvparse import iter_songs_from_path  # noqa: E402
+from ratelimit import default_limiter, is_rate_limit_error  # noqa: E402
+
 # ── Config ──────────────────────────────────────────────────────────
 
 CSV_PATH = "data/WUDWUD_app.csv"
 OAUTH_PATH = "oauth.json"
 SEED_COUNT = 5
 DESIRED_OUTPUT = 20
-DELAY_BETWEEN_CALLS = 1.5  # seconds
+limiter = default_limiter()  # same buckets as the backend (RATE_*/BURST_* env)
 
 
 # ── CSV Parser (handles quirky DJ software format) ──────────────────
 
 def parse_csv(path: str) -> list[dict]:
     """
+    Load the library with the backend's streaming parser (backend/csvparse.py).
+
     DJ software (WUDWUD etc.) exports CSV where each data row is wrapped
     in outer double-quotes with "" escaping inside. Header is normal.
 
     Example row:
     "1,""Blaxploitation"",""Detroit's Filthiest"",""Original Not Crispy"",218,0,..."
-
-    After stripping outer quotes, the inner content is valid CSV.
     """
-    songs = []
-
-    with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    if not lines:
-        print("ERROR: CSV file is empty")
-        return songs
-
-    # Header is the first line, normal CSV
-    header_line = lines[0].strip()
-    header = next(csv.reader(io.StringIO(header_line)))
-    header = [h.strip().lower() for h in header]
-
-    print(f"CSV columns: {header}")
-
-    # Find column indices
-    title_idx = None
-    artist_idx = None
-    genre_idx = None
-
-    for i, col in enumerate(header):
-        if col == "title":
-            title_idx = i
-        elif col == "artist":
-            artist_idx = i
-        elif col == "genre":
-            genre_idx = i
-
-    if title_idx is None or artist_idx is None:
-        print(f"ERROR: Could not find 'title' and 'artist' columns in: {header}")
-        return songs
-
-    print(f"Mapped: title=col[{title_idx}], artist=col[{artist_idx}], genre=col[{genre_idx}]")
-
-    # Parse data rows
-    for line_num, line in enumerate(lines[1:], start=2):
-        line = line.strip()
-        if not line:
-            continue
-
-        # Strip outer wrapping quotes if present (DJ software format)
-        if line.startswith('"') and line.endswith('"'):
-            inner = line[1:-1]
-            # Inner content has "" as escaped quotes — unescape them first
-            inner = inner.replace('""', '"')
-            # Now it's a normal CSV row with proper quoting
-            try:
-                row = next(csv.reader(io.StringIO(inner)))
-            except StopIteration:
-                continue
-        else:
-            # Normal CSV row
-            try:
-                row = next(csv.reader(io.StringIO(line)))
-            except StopIteration:
-                continue
-
-        if len(row) <= max(title_idx, artist_idx):
-            continue
-
-        title = row[title_idx].strip()
-        artist = row[artist_idx].strip()
-        genre = row[genre_idx].strip() if genre_idx is not None and genre_idx < len(row) else ""
-
-        if title and artist:
-            song = {"title": title, "artist": artist}
-            if genre:
-                song["genre"] = genre
-            songs.append(song)
-
-    return songs
+    try:
+        return list(iter_songs_from_path(path))
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return []
 
 
 # ── Seed Selection ──────────────────────────────────────────────────
@@ -151,6 +88,7 @@ def search_song(yt: YTMusic, artist: str, title: str) -> dict | None:
     """Search YouTube Music for a specific song. Returns first match or None."""
     query = f"{artist} {title}"
     try:
+        limiter.acquire_sync("search")
         results = yt.search(query, filter="songs", limit=3)
         if results:
             hit = results[0]
@@ -160,6 +98,8 @@ def search_song(yt: YTMusic, artist: str, title: str) -> dict | None:
                 "artist": hit["artists"][0]["name"] if hit.get("artists") else "Unknown",
             }
     except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.throttled("search")
         print(f"  Search error for '{query}': {e}")
     return None
 
@@ -167,6 +107,7 @@ def search_song(yt: YTMusic, artist: str, title: str) -> dict | None:
 def get_related_tracks(yt: YTMusic, video_id: str, limit: int = 25) -> list[dict]:
     """Get related tracks using YouTube Music's radio/watch playlist."""
     try:
+        limiter.acquire_sync("watch")
         watch = yt.get_watch_playlist(videoId=video_id, radio=True, limit=limit)
         tracks = []
         for t in watch.get("tracks", [])[1:]:  # skip first (it's the seed song)
@@ -179,6 +120,8 @@ def get_related_tracks(yt: YTMusic, video_id: str, limit: int = 25) -> list[dict
                 })
         return tracks
     except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.throttled("watch")
         print(f"  Related tracks error for {video_id}: {e}")
         return []
 
@@ -193,6 +136,7 @@ def create_playlist_via_api(access_token: str, title: str, video_ids: list[str])
 
     # Step 1: Create empty playlist
     try:
+        limiter.acquire_sync("playlists")
         resp = requests.post(
             "https://www.googleapis.com/youtube/v3/playlists?part=snippet,status",
             headers=headers,
@@ -215,6 +159,7 @@ def create_playlist_via_api(access_token: str, title: str, video_ids: list[str])
     added = 0
     for vid in video_ids:
         try:
+            limiter.acquire_sync("playlist_items")
             resp = requests.post(
                 "https://www.googleapis.com/youtube/v3/playlistItems?part=snippet",
                 headers=headers,
@@ -240,20 +185,19 @@ def create_playlist_via_api(access_token: str, title: str, video_ids: list[str])
 
 def deduplicate(tracks: list[dict], library: list[dict]) -> list[dict]:
     """Remove duplicates by videoId and filter out songs already in user's library."""
-    # Dedup by videoId
+    # Fuzzy artist/title match: remixes, edits and feat. variants count as the same song
+    owned = FuzzyIndex.build((s["artist"], s["title"]) for s in library)
+    picked = FuzzyIndex()
     seen_ids: set[str] = set()
-    unique: list[dict] = []
+    filtered: list[dict] = []
     for t in tracks:
-        if t["videoId"] not in seen_ids:
-            seen_ids.add(t["videoId"])
-            unique.append(t)
-
-    # Filter out library songs (fuzzy: lowercase artist+title match)
-    library_set = {f"{s['artist'].lower()}|{s['title'].lower()}" for s in library}
-    filtered = [
-        t for t in unique
-        if f"{t['artist'].lower()}|{t['title'].lower()}" not in library_set
-    ]
+        if t["videoId"] in seen_ids:
+            continue
+        seen_ids.add(t["videoId"])
+        if owned.match(t["artist"], t["title"]) or picked.match(t["artist"], t["title"]):
+            continue
+        picked.add(t["artist"], t["title"])
+        filtered.append(t)
 
     return filtered
 
@@ -332,7 +276,6 @@ def main():
         print(f"  [{i}/{SEED_COUNT}] Searching: {seed['artist']} — {seed['title']}")
 
         hit = search_song(yt, seed["artist"], seed["title"])
-        time.sleep(DELAY_BETWEEN_CALLS)
 
         if not hit:
             print(f"    NOT FOUND on YouTube Music")
@@ -343,7 +286,6 @@ def main():
         print(f"    Found: {hit['artist']} — {hit['title']} (videoId: {hit['videoId']})")
 
         related = get_related_tracks(yt, hit["videoId"], limit=25)
-        time.sleep(DELAY_BETWEEN_CALLS)
 
         print(f"    Got {len(related)} related tracks")
         all_related.extend(related)
@@ -404,7 +346,8 @@ def main():
     print(f"  1. get_watch_playlist(radio=True) returns tracks? {'YES' if all_related else 'NO'}")
     print(f"  2. create_playlist() works? {'YES' if playlist_id else 'NO'}")
     print(f"  3. Yield per seed: ~{len(all_related)//max(seeds_found,1)} tracks")
-    print(f"  4. Rate limit issues: None (used {DELAY_BETWEEN_CALLS}s delay)")
+    throttled = sum(b["throttled"] for b in limiter.stats().values())
+    print(f"  4. Rate limit issues: {throttled} throttle signals (token-bucket pacing)")
     print(f"  5. Search hit rate: {seeds_found}/{SEED_COUNT} ({100*seeds_found//SEED_COUNT}%)")
     print("-" * 60)
 
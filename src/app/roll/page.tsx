@@ -3,7 +3,7 @@
 import { useState, useEffect, useCallback, useMemo } from "react";
 import { Nav } from "@/components/nav";
 import { VinylRecord } from "@/components/vinyl-record";
-import { rollSeeds, calculateSeedCount } from "@/lib/dice";
+import { calculateSeedCount } from "@/lib/dice";
 import type { Song, DiceMode } from "@/lib/dice";
 
 type Track = {
@@ -13,12 +13,25 @@ type Track = {
   thumbnail: string;
 };
 
-type RollState = "ready" | "rolling" | "preview" | "creating" | "pushed";
+type RollState = "ready" | "rolling" | "preview" | "creating" | "incomplete" | "pushed";
+
+// A /create-playlist push that paused on quota or left items unadded (HTTP 202)
+type PushReport = {
+  push_id: string;
+  status: "done" | "paused" | "failed" | "running" | "pending";
+  playlist_id: string | null;
+  url: string | null;
+  track_count: number;
+  failed_count: number;
+  pending_count: number;
+  error: string | null;
+  resume_after: string | null;
+};
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
 export default function RollPage() {
-  const [library, setLibrary] = useState<Song[]>([]);
+  const [genreList, setGenreList] = useState<Array<{ genre: string; count: number }>>([]);
   const [libraryCount, setLibraryCount] = useState(0);
   const [ytConnected, setYtConnected] = useState(false);
   const [ytEmail, setYtEmail] = useState("");
@@ -29,29 +42,17 @@ export default function RollPage() {
   const [tracks, setTracks] = useState<Track[]>([]);
   const [rollStats, setRollStats] = useState({ seedsUsed: 0, seedsFailed: 0, rawFound: 0 });
   const [playlistUrl, setPlaylistUrl] = useState("");
+  const [push, setPush] = useState<PushReport | null>(null);
   const [playlistName, setPlaylistName] = useState("");
   const [error, setError] = useState("");
   const [genreOpen, setGenreOpen] = useState(false);
   const [selectedGenres, setSelectedGenres] = useState<Set<string>>(new Set());
 
-  // Extract unique genres sorted by count (most songs first)
-  const genreList = useMemo(() => {
-    const counts = new Map<string, number>();
-    for (const s of library) {
-      if (s.genre) {
-        counts.set(s.genre, (counts.get(s.genre) || 0) + 1);
-      }
-    }
-    return Array.from(counts.entries())
-      .sort((a, b) => b[1] - a[1])
-      .map(([genre, count]) => ({ genre, count }));
-  }, [library]);
-
-  // Filtered library based on selected genres
-  const effectiveLibrary = useMemo(() => {
-    if (selectedGenres.size === 0) return library;
-    return library.filter((s) => s.genre && selectedGenres.has(s.genre));
-  }, [library, selectedGenres]);
+  // Songs in the genre-filtered library (or full library if no filter)
+  const effectiveCount = useMemo(() => {
+    if (selectedGenres.size === 0) return libraryCount;
+    return genreList.reduce((sum, g) => sum + (selectedGenres.has(g.genre) ? g.count : 0), 0);
+  }, [libraryCount, genreList, selectedGenres]);
 
   const toggleGenre = (genre: string) => {
     setSelectedGenres((prev) => {
@@ -62,14 +63,16 @@ export default function RollPage() {
     });
   };
 
-  // Load library and YouTube status on mount
+  // Load library stats and YouTube status on mount (seeds are drawn server-side)
   useEffect(() => {
-    fetch("/api/library")
+    fetch(`${API_URL}/library`)
       .then((r) => r.json())
       .then((data) => {
         if (data.library) {
-          setLibrary(data.library.songs);
-          setLibraryCount(data.library.songCount);
+          setLibraryCount(data.library.song_count);
+          fetch(`${API_URL}/library/genres`)
+            .then((r) => r.json())
+            .then((g) => setGenreList(g.genres || []));
         }
       });
 
@@ -88,7 +91,7 @@ export default function RollPage() {
     setPlaylistName(`CrateDig Roll - ${formatted}`);
   }, []);
 
-  const canRoll = effectiveLibrary.length > 0 && ytConnected && state === "ready";
+  const canRoll = effectiveCount > 0 && ytConnected && state === "ready";
 
   const handleRoll = useCallback(async () => {
     if (!canRoll) return;
@@ -97,10 +100,16 @@ export default function RollPage() {
     setError("");
     setTracks([]);
 
-    // Pick seeds from genre-filtered library (or full library if no filter)
-    const seeds = rollSeeds(effectiveLibrary, outputSize, mode);
-
     try {
+      // Draw seeds from genre-filtered library (or full library if no filter)
+      const params = new URLSearchParams({ count: String(calculateSeedCount(outputSize)), mode });
+      selectedGenres.forEach((g) => params.append("genre", g));
+      const seedRes = await fetch(`${API_URL}/library/seeds?${params}`);
+      if (!seedRes.ok) {
+        throw new Error(`Seed draw failed: ${seedRes.status}`);
+      }
+      const seeds: Song[] = (await seedRes.json()).seeds;
+
       const res = await fetch(`${API_URL}/roll`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -127,12 +136,53 @@ export default function RollPage() {
       setError(err instanceof Error ? err.message : "Roll failed");
       setState("ready");
     }
-  }, [canRoll, effectiveLibrary, outputSize, mode]);
+  }, [canRoll, selectedGenres, outputSize, mode]);
 
   const removeTrack = (videoId: string) => {
     setTracks((prev) => prev.filter((t) => t.videoId !== videoId));
   };
 
+  // Save a finished push to history (non-blocking — the playlist already exists)
+  const saveRoll = useCallback(async (data: PushReport) => {
+    try {
+      const historyRes = await fetch("/api/rolls", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          diceMode: mode,
+          outputSize: tracks.length,
+          seedsUsed: rollStats.seedsUsed,
+          seedsFailed: rollStats.seedsFailed,
+          tracksFound: rollStats.rawFound,
+          playlistId: data.playlist_id,
+          playlistUrl: data.url,
+          thumbnailUrl: tracks[0]?.thumbnail || null,
+        }),
+      });
+      if (!historyRes.ok) {
+        console.error("History save failed:", historyRes.status, await historyRes.text());
+      }
+    } catch (historyErr) {
+      console.error("History save error:", historyErr);
+    }
+  }, [tracks, mode, rollStats]);
+
+  // 200 = done; 202 = paused on quota or some items failed (resumable)
+  const handlePushResponse = useCallback(async (res: Response) => {
+    if (!res.ok) {
+      throw new Error(`Playlist creation failed: ${res.status}`);
+    }
+    const data: PushReport = await res.json();
+    setPush(data);
+    setPlaylistUrl(data.url || "");
+    if (data.status !== "done") {
+      setState("incomplete");
+      return;
+    }
+    await saveRoll(data);
+    setState("pushed");
+  }, [saveRoll]);
+
   const handleCreatePlaylist = useCallback(async () => {
     if (tracks.length === 0) return;
 
@@ -148,48 +198,33 @@ export default function RollPage() {
           video_ids: tracks.map((t) => t.videoId),
         }),
       });
+      await handlePushResponse(res);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : "Playlist creation failed");
+      setState("preview");
+    }
+  }, [tracks, playlistName, handlePushResponse]);
 
-      if (!res.ok) {
-        throw new Error(`Playlist creation failed: ${res.status}`);
-      }
+  const handleResumePush = useCallback(async () => {
+    if (!push) return;
 
-      const data = await res.json();
-      setPlaylistUrl(data.url);
-
-      // Save roll to history (non-blocking — playlist is already created)
-      try {
-        const historyRes = await fetch("/api/rolls", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
-            diceMode: mode,
-            outputSize: tracks.length,
-            seedsUsed: rollStats.seedsUsed,
-            seedsFailed: rollStats.seedsFailed,
-            tracksFound: rollStats.rawFound,
-            playlistId: data.playlist_id,
-            playlistUrl: data.url,
-            thumbnailUrl: tracks[0]?.thumbnail || null,
-          }),
-        });
-        if (!historyRes.ok) {
-          console.error("History save failed:", historyRes.status, await historyRes.text());
-        }
-      } catch (historyErr) {
-        console.error("History save error:", historyErr);
-      }
+    setState("creating");
+    setError("");
 
-      setState("pushed");
+    try {
+      const res = await fetch(`${API_URL}/pushes/${push.push_id}/resume`, { method: "POST" });
+      await handlePushResponse(res);
     } catch (err) {
-      setError(err instanceof Error ? err.message : "Playlist creation failed");
-      setState("preview");
+      setError(err instanceof Error ? err.message : "Resuming the playlist failed");
+      setState("incomplete");
     }
-  }, [tracks, playlistName, mode, rollStats]);
+  }, [push, handlePushResponse]);
 
   const handleNewRoll = () => {
     setState("ready");
     setTracks([]);
     setPlaylistUrl("");
+    setPush(null);
     setError("");
   };
 
@@ -216,7 +251,7 @@ export default function RollPage() {
         <p className="text-center text-neutral-500 text-xs font-mono mb-8">
           {libraryCount > 0 ? (
             selectedGenres.size > 0 ? (
-              <><span className="text-orange-500">{effectiveLibrary.length.toLocaleString()}</span>{" of "}{libraryCount.toLocaleString()} songs</>
+              <><span className="text-orange-500">{effectiveCount.toLocaleString()}</span>{" of "}{libraryCount.toLocaleString()} songs</>
             ) : (
               `${libraryCount.toLocaleString()} songs loaded`
             )
@@ -343,7 +378,7 @@ export default function RollPage() {
                 Connect YouTube first →
               </a>
             )}
-            {library.length === 0 && (
+            {libraryCount === 0 && (
               <a
                 href="/library"
                 className="block text-center text-orange-500 text-xs font-mono hover:underline"
@@ -374,7 +409,7 @@ export default function RollPage() {
         )}
 
         {/* Preview tracks */}
-        {(state === "preview" || state === "creating" || state === "pushed") && tracks.length > 0 && (
+        {(state === "preview" || state === "creating" || state === "incomplete" || state === "pushed") && tracks.length > 0 && (
           <div className="mt-6 space-y-4">
             {/* Stats */}
             <div className="flex gap-4 text-[10px] font-mono text-neutral-600">
@@ -438,6 +473,38 @@ export default function RollPage() {
               </p>
             )}
 
+            {/* Paused on quota, or some tracks could not be added */}
+            {state === "incomplete" && push && (
+              <div className="space-y-3 text-center">
+                <p className="text-orange-500 font-mono text-sm">
+                  {push.status === "paused"
+                    ? "YouTube quota used up for today"
+                    : `${push.failed_count} track${push.failed_count === 1 ? "" : "s"} could not be added`}
+                </p>
+                <p className="text-neutral-500 font-mono text-xs">
+                  {push.track_count} of {push.track_count + push.failed_count + push.pending_count} tracks added
+                  {push.status === "paused" && push.resume_after &&
+                    ` · resumes automatically after ${new Date(push.resume_after).toLocaleString()}`}
+                </p>
+                <button
+                  onClick={handleResumePush}
+                  className="w-full py-3 bg-orange-500 text-black font-display text-lg tracking-[3px] hover:bg-orange-600 transition-all"
+                >
+                  {push.status === "paused" ? "RESUME NOW" : "RETRY MISSING TRACKS"}
+                </button>
+                {playlistUrl && (
+                  <a
+                    href={playlistUrl}
+                    target="_blank"
+                    rel="noopener noreferrer"
+                    className="block text-orange-500 text-xs font-mono hover:underline"
+                  >
+                    Open the partial playlist →
+                  </a>
+                )}
+              </div>
+            )}
+
             {/* Pushed state */}
             {state === "pushed" && playlistUrl && (
               <div className="space-y-3 text-center">
@@ -1,4 +1,5 @@
-import { pgTable, uuid, text, jsonb, integer, timestamp } from "drizzle-orm/pg-core";
+import { pgTable, uuid, text, jsonb, integer, smallint, bigint, boolean, date, timestamp, index, primaryKey } from "drizzle-orm/pg-core";
+import { sql } from "drizzle-orm";
 
 export const libraries = pgTable("libraries", {
   id: uuid("id").primaryKey().defaultRandom(),
@@ -37,3 +38,127 @@ export const rolls = pgTable("rolls", {
   thumbnailUrl: text("thumbnail_url"),
   rolledAt: timestamp("rolled_at").defaultNow(),
 });
+
+// Backend-owned: seed search cache (normalized "artist|title" → YouTube videoId, NULL = not found)
+export const seedResolutions = pgTable("seed_resolutions", {
+  key: text("key").primaryKey(),
+  artist: text("artist").notNull(),
+  title: text("title").notNull(),
+  videoId: text("video_id"),
+  resolvedAt: timestamp("resolved_at", { withTimezone: true }).notNull().defaultNow(),
+});
+
+// Backend-owned: radio cache (seed videoId → compact [videoId, title, artist, thumbnail] rows)
+export const radioCache = pgTable("radio_cache", {
+  videoId: text("video_id").primaryKey(),
+  tracks: jsonb("tracks").notNull().$type<Array<[string, string, string, string]>>(),
+  fetchedAt: timestamp("fetched_at", { withTimezone: true }).notNull().defaultNow(),
+});
+
+// Backend-owned: background jobs for rolls and playlist pushes
+export const jobs = pgTable("jobs", {
+  id: uuid("id").primaryKey(),
+  kind: text("kind").notNull(), // 'roll' | 'create_playlist'
+  status: text("status").notNull().default("queued"), // 'queued' | 'running' | 'done' | 'failed'
+  payload: jsonb("payload").notNull(),
+  progress: jsonb("progress"),
+  result: jsonb("result"),
+  error: text("error"),
+  createdAt: timestamp("created_at", { withTimezone: true }).notNull().defaultNow(),
+  startedAt: timestamp("started_at", { withTimezone: true }),
+  finishedAt: timestamp("finished_at", { withTimezone: true }),
+}, (t) => [index("jobs_status_idx").on(t.status, t.createdAt)]);
+
+// Backend-owned: one row per library song with normalized (casefolded, punctuation-free) keys
+export const librarySongs = pgTable("library_songs", {
+  libraryId: uuid("library_id").notNull().references(() => libraries.id, { onDelete: "cascade" }),
+  position: integer("position").notNull(),
+  artist: text("artist").notNull(),
+  title: text("title").notNull(),
+  genre: text("genre"),
+  artistKey: text("artist_key").notNull(),
+  titleKey: text("title_key").notNull(),
+  lastUsedAt: timestamp("last_used_at", { withTimezone: true }), // last drawn as a roll seed
+  keyHash: bigint("key_hash", { mode: "bigint" }), // 64-bit hash of "artist_key|title_key"
+  unresolvable: boolean("unresolvable").notNull().default(false), // no YouTube Music match; skipped by dice draws
+}, (t) => [
+  primaryKey({ columns: [t.libraryId, t.position] }),
+  index("library_songs_artist_idx").on(t.libraryId, t.artistKey.op("text_pattern_ops")),
+  index("library_songs_title_idx").on(t.libraryId, t.titleKey.op("text_pattern_ops")),
+  index("library_songs_genre_idx").on(t.libraryId, t.genre).where(sql`${t.genre} IS NOT NULL`),
+]);
+
+// Backend-owned seed index, rebuilt whenever the library is replaced or its format (version) changes
+export const libraryArtists = pgTable("library_artists", {
+  libraryId: uuid("library_id").notNull().references(() => libraries.id, { onDelete: "cascade" }),
+  artistKey: text("artist_key").notNull(),
+  songCount: integer("song_count").notNull(),
+}, (t) => [primaryKey({ columns: [t.libraryId, t.artistKey] })]);
+
+export const libraryPools = pgTable("library_pools", {
+  libraryId: uuid("library_id").notNull().references(() => libraries.id, { onDelete: "cascade" }),
+  pool: text("pool").notNull(), // 'all' | 'deep' | 'genre:<g>' | 'deep:<g>'
+  size: integer("size").notNull(),
+  version: integer("version").notNull().default(1), // seed index format (backend INDEX_VERSION)
+}, (t) => [primaryKey({ columns: [t.libraryId, t.pool] })]);
+
+export const librarySeedSlots = pgTable("library_seed_slots", {
+  libraryId: uuid("library_id").notNull().references(() => libraries.id, { onDelete: "cascade" }),
+  pool: text("pool").notNull(),
+  rank: integer("rank").notNull(),
+  position: integer("position").notNull(),
+}, (t) => [primaryKey({ columns: [t.libraryId, t.pool, t.rank] })]);
+
+// Backend-owned related-track graph: one edge per radio result, for multi-hop digs
+export const trackNodes = pgTable("track_nodes", {
+  videoId: text("video_id").primaryKey(),
+  title: text("title"),
+  artist: text("artist"),
+  thumbnail: text("thumbnail"),
+  expandedAt: timestamp("expanded_at", { withTimezone: true }), // set once its radio list is stored
+});
+
+export const trackEdges = pgTable("track_edges", {
+  sourceId: text("source_id").notNull(),
+  targetId: text("target_id").notNull(),
+  rank: smallint("rank").notNull(),
+}, (t) => [primaryKey({ columns: [t.sourceId, t.targetId] })]);
+
+// Backend-owned: searches spent per UTC day by background library pre-resolution
+export const resolverUsage = pgTable("resolver_usage", {
+  day: date("day").primaryKey(),
+  searches: integer("searches").notNull(),
+});
+
+// Backend-owned: Data API quota units spent per Pacific day by playlist pushes
+export const youtubeQuota = pgTable("youtube_quota", {
+  day: date("day").primaryKey(),
+  units: integer("units").notNull(),
+});
+
+// Backend-owned: resumable playlist pushes, checkpointed per inserted item
+export const playlistPushes = pgTable("playlist_pushes", {
+  id: uuid("id").primaryKey(),
+  title: text("title").notNull(),
+  playlistId: text("playlist_id"), // set once the playlist exists (up front for sync pushes)
+  sync: boolean("sync").notNull().default(false), // update playlist_id in place instead of creating one
+  status: text("status").notNull().default("pending"), // 'pending' | 'running' | 'paused' | 'done' | 'failed'
+  runs: integer("runs").notNull().default(0),
+  quotaUsed: integer("quota_used").notNull().default(0),
+  reordered: integer("reordered"),
+  deleted: integer("deleted").notNull().default(0),
+  error: text("error"),
+  resumeAfter: timestamp("resume_after", { withTimezone: true }), // next quota reset while paused
+  createdAt: timestamp("created_at", { withTimezone: true }).notNull().defaultNow(),
+  updatedAt: timestamp("updated_at", { withTimezone: true }).notNull().defaultNow(),
+}, (t) => [index("playlist_pushes_status_idx").on(t.status, t.resumeAfter)]);
+
+export const playlistPushItems = pgTable("playlist_push_items", {
+  pushId: uuid("push_id").notNull().references(() => playlistPushes.id, { onDelete: "cascade" }),
+  position: integer("position").notNull(),
+  videoId: text("video_id").notNull(),
+  status: text("status").notNull().default("pending"), // 'pending' | 'added' | 'failed'
+  itemId: text("item_id"),
+  attempts: integer("attempts").notNull().default(0),
+  error: text("error"),
+}, (t) => [primaryKey({ columns: [t.pushId, t.position] })]);